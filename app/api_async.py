@@ -0,0 +1,149 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from .auth import require_login
+from .db import get_async_db
+from .metrics import ORJSONResponse
+from .models import Asset, ChangeRecord, Service
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, apply_filters, keyset, set_next_headers, split_page
+from .schemas import AssetUpdate, ChangeUpdate, ServiceUpdate
+from .serializers import asset_to_dict, change_to_dict, columns, parse_fields, rows_to_dicts, service_to_dict
+from .stats import etag_matches, overview_cache
+from .windows import merge_window
+
+# DB_ASYNC=true 时替换 main.py 中同路径的同步接口，等待数据库期间不占用线程池
+router = APIRouter(dependencies=[Depends(require_login)])
+
+
+@router.get("/api/overview")
+async def api_overview_async(request: Request, db: AsyncSession = Depends(get_async_db)):
+    payload, etag = await db.run_sync(overview_cache.get)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse(payload, headers=headers)
+
+
+@router.get("/api/assets")
+async def list_assets_async(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    environment: Optional[str] = None,
+    status: Optional[str] = None,
+    owner: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，如 id,hostname,ip"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    names = parse_fields(Asset, fields)
+    stmt = apply_filters(select(*columns(Asset, names)), Asset, environment=environment, status=status, owner=owner)
+    rows = (await db.execute(keyset(stmt, Asset.id, limit, cursor, order))).all()
+    rows, next_cursor = split_page(rows, limit, order)
+    response = ORJSONResponse(rows_to_dicts(rows, names))
+    set_next_headers(request, response, next_cursor)
+    return response
+
+
+@router.put("/api/assets/{asset_id}")
+async def update_asset_async(asset_id: int, payload: AssetUpdate, db: AsyncSession = Depends(get_async_db)):
+    asset = await db.get(Asset, asset_id)
+    if not asset:
+        raise HTTPException(status_code=404, detail="asset not found")
+    for key, value in payload.model_dump(exclude_unset=True).items():
+        setattr(asset, key, value)
+    await db.commit()
+    await db.refresh(asset)
+    return asset_to_dict(asset)
+
+
+@router.delete("/api/assets/{asset_id}")
+async def delete_asset_api_async(asset_id: int, db: AsyncSession = Depends(get_async_db)):
+    # 异步会话不能懒加载，级联删除所需的子对象一次性预加载
+    asset = await db.get(Asset, asset_id, options=[selectinload(Asset.services).selectinload(Service.changes)])
+    if not asset:
+        raise HTTPException(status_code=404, detail="asset not found")
+    await db.delete(asset)
+    await db.commit()
+    return {"deleted": True}
+
+
+@router.get("/api/services")
+async def list_services_async(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    asset_id: Optional[int] = None,
+    status: Optional[str] = None,
+    owner: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，如 id,name,status"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    names = parse_fields(Service, fields)
+    stmt = apply_filters(select(*columns(Service, names)), Service, asset_id=asset_id, status=status, owner=owner)
+    rows = (await db.execute(keyset(stmt, Service.id, limit, cursor, order))).all()
+    rows, next_cursor = split_page(rows, limit, order)
+    response = ORJSONResponse(rows_to_dicts(rows, names))
+    set_next_headers(request, response, next_cursor)
+    return response
+
+
+@router.put("/api/services/{service_id}")
+async def update_service_async(service_id: int, payload: ServiceUpdate, db: AsyncSession = Depends(get_async_db)):
+    service = await db.get(Service, service_id)
+    if not service:
+        raise HTTPException(status_code=404, detail="service not found")
+
+    updates = payload.model_dump(exclude_unset=True)
+    if "asset_id" in updates and not await db.get(Asset, updates["asset_id"]):
+        raise HTTPException(status_code=404, detail="asset not found")
+
+    for key, value in updates.items():
+        setattr(service, key, value)
+    await db.commit()
+    await db.refresh(service)
+    return service_to_dict(service)
+
+
+@router.get("/api/changes")
+async def list_changes_async(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    service_id: Optional[int] = None,
+    status: Optional[str] = None,
+    risk_level: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，如 id,title,status"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    names = parse_fields(ChangeRecord, fields)
+    stmt = apply_filters(select(*columns(ChangeRecord, names)), ChangeRecord, service_id=service_id, status=status, risk_level=risk_level)
+    rows = (await db.execute(keyset(stmt, ChangeRecord.id, limit, cursor, order))).all()
+    rows, next_cursor = split_page(rows, limit, order)
+    response = ORJSONResponse(rows_to_dicts(rows, names))
+    set_next_headers(request, response, next_cursor)
+    return response
+
+
+@router.put("/api/changes/{change_id}")
+async def update_change_async(change_id: int, payload: ChangeUpdate, db: AsyncSession = Depends(get_async_db)):
+    change = await db.get(ChangeRecord, change_id)
+    if not change:
+        raise HTTPException(status_code=404, detail="change not found")
+
+    updates = payload.model_dump(exclude_unset=True)
+    if "service_id" in updates and not await db.get(Service, updates["service_id"]):
+        raise HTTPException(status_code=404, detail="service not found")
+    updates.update(await db.run_sync(merge_window, change, updates))
+
+    for key, value in updates.items():
+        setattr(change, key, value)
+    await db.commit()
+    await db.refresh(change)
+    return change_to_dict(change)
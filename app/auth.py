@@ -0,0 +1,223 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import namedtuple
+from contextvars import ContextVar
+from http.cookies import CookieError, SimpleCookie
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal, current_tenant
+from .hooks import WriteEvent, on_commit
+from .models import Role, User
+
+# 首次迁移时创建的超级管理员，上线后应立即修改密码
+DEFAULT_USERNAME = "admin"
+DEFAULT_PASSWORD = "admin"
+
+SESSION_COOKIE = "cmdb_session"
+SESSION_TTL = int(os.getenv("SESSION_TTL", "43200"))
+# 多 worker / 多实例部署必须配置同一个密钥，否则会话只在签发它的进程内有效
+SESSION_SECRET = os.getenv("SESSION_SECRET", "")
+PERMISSION_CACHE_TTL = float(os.getenv("PERMISSION_CACHE_TTL", "30"))
+PASSWORD_HASH_ITERATIONS = 200_000
+
+# 权限为粗粒度的操作类别；角色为权限集合，内置角色在迁移时写入，可通过接口调整
+PERMISSIONS = ("read", "write", "heartbeat", "users", "tenants")
+BUILTIN_ROLES = {
+    "viewer": ("read",),
+    "editor": ("read", "write", "heartbeat"),
+    "admin": ("read", "write", "heartbeat", "users"),
+    "superadmin": PERMISSIONS,
+    # 心跳上报专用账号
+    "agent": ("heartbeat",),
+}
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+logger = logging.getLogger("app.auth")
+
+if not SESSION_SECRET:
+    logger.warning("SESSION_SECRET is not set, using a random per-process secret")
+    SESSION_SECRET = secrets.token_urlsafe(32)
+_secret = SESSION_SECRET.encode()
+
+Principal = namedtuple("Principal", "user_id tenant_id")
+# 当前请求的登录身份，由 SessionMiddleware 从会话令牌解出
+current_principal: ContextVar[Optional[Principal]] = ContextVar("current_principal", default=None)
+
+
+def hash_password(password: str) -> str:
+    salt = secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), PASSWORD_HASH_ITERATIONS).hex()
+    return f"pbkdf2_sha256${PASSWORD_HASH_ITERATIONS}${salt}${digest}"
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    try:
+        _, iterations, salt, digest = encoded.split("$")
+    except ValueError:
+        return False
+    actual = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), int(iterations)).hex()
+    return hmac.compare_digest(actual, digest)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def issue_token(user: User) -> str:
+    # 令牌只携带用户与租户，HMAC 签名；权限不进令牌，角色调整无需等令牌过期
+    payload = _b64encode(orjson.dumps({"uid": user.id, "tid": user.tenant_id, "exp": int(time.time()) + SESSION_TTL}))
+    signature = _b64encode(hmac.new(_secret, payload.encode(), hashlib.sha256).digest())
+    return f"{payload}.{signature}"
+
+
+def decode_token(token: str) -> Optional[Principal]:
+    # 每个请求只做一次 HMAC 校验，不查库
+    payload, _, signature = token.partition(".")
+    expected = _b64encode(hmac.new(_secret, payload.encode(), hashlib.sha256).digest())
+    # 按字节比较：compare_digest 遇到非 ASCII 字符串会抛 TypeError
+    if not signature or not hmac.compare_digest(signature.encode("latin-1", "replace"), expected.encode()):
+        return None
+    try:
+        data = orjson.loads(_b64decode(payload))
+    except (ValueError, orjson.JSONDecodeError):
+        return None
+    if data["exp"] < time.time():
+        return None
+    return Principal(data["uid"], data["tid"])
+
+
+def authenticate(db: Session, username: str, password: str) -> Optional[User]:
+    user = db.execute(select(User).where(User.username == username)).scalar_one_or_none()
+    if user is None or not user.active or not verify_password(password, user.password_hash):
+        return None
+    return user
+
+
+def parse_permissions(value: Optional[str]) -> FrozenSet[str]:
+    return frozenset(name for name in (value or "").split(",") if name)
+
+
+class PermissionCache:
+    # (用户, 租户) -> 权限集合。本进程对 users / roles 的写入提交后整体失效，TTL 兜底其他进程的修改
+    def __init__(self, ttl: float = PERMISSION_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[int, int], Tuple[float, FrozenSet[str]]] = {}
+        self._generation = 0
+
+    def _load(self, principal: Principal) -> FrozenSet[str]:
+        with SessionLocal() as db:
+            row = db.execute(
+                select(User.tenant_id, User.active, Role.permissions)
+                .outerjoin(Role, Role.name == User.role)
+                .where(User.id == principal.user_id)
+            ).first()
+        # 用户被停用、删除或调离租户后，旧令牌立即失去全部权限
+        if row is None or not row.active or row.tenant_id != principal.tenant_id:
+            return frozenset()
+        return parse_permissions(row.permissions)
+
+    def get(self, principal: Principal) -> FrozenSet[str]:
+        entry = self._entries.get(principal)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        generation = self._generation
+        permissions = self._load(principal)
+        with self._lock:
+            # 加载期间有角色变更提交则本次结果不进入缓存
+            if generation == self._generation:
+                self._entries[principal] = (time.monotonic(), permissions)
+        return permissions
+
+    def invalidate(self, events: Optional[List[WriteEvent]] = None):
+        if events is None or any(event.table in ("users", "roles") for event in events):
+            with self._lock:
+                self._generation += 1
+                self._entries = {}
+
+
+permission_cache = PermissionCache()
+on_commit(permission_cache.invalidate)
+
+
+def current_permissions() -> FrozenSet[str]:
+    principal = current_principal.get()
+    return permission_cache.get(principal) if principal is not None else frozenset()
+
+
+def is_logged_in(request: Request) -> bool:
+    return bool(current_permissions())
+
+
+def _check(permission: str):
+    permissions = current_permissions()
+    if not permissions:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="not authenticated")
+    if permission not in permissions:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"permission '{permission}' required")
+
+
+def require_login(request: Request):
+    # 读接口需要 read，其余需要 write；更细的权限用 require_permission
+    _check("read" if request.method in READ_METHODS else "write")
+
+
+def require_permission(permission: str):
+    def dependency():
+        _check(permission)
+
+    return dependency
+
+
+def _session_token(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return token.strip()
+        elif name == b"cookie":
+            try:
+                morsel = SimpleCookie(value.decode("latin-1")).get(SESSION_COOKIE)
+            except CookieError:
+                continue
+            if morsel is not None:
+                return morsel.value
+    return None
+
+
+class SessionMiddleware:
+    # 解出登录身份与租户写入上下文，之后的查询据此按租户过滤；权限在路由依赖中按需检查
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _session_token(scope)
+        principal = decode_token(token) if token else None
+        if principal is None:
+            await self.app(scope, receive, send)
+            return
+        principal_token = current_principal.set(principal)
+        tenant_token = current_tenant.set(principal.tenant_id)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(tenant_token)
+            current_principal.reset(principal_token)
@@ -0,0 +1,97 @@
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, select, update
+from sqlalchemy.orm import Session
+
+from .history import TRACKED, record_rows, snapshot
+from .hooks import record
+from .models import Asset, ChangeRecord, Service
+from .sync import insert_tombstones, stamp
+from .windows import check_conflicts
+
+# 外键字段 -> 被引用模型，批量更新前一次查询校验目标存在
+FOREIGN_KEYS = {
+    Service: {"asset_id": (Asset, "asset")},
+    ChangeRecord: {"service_id": (Service, "service")},
+}
+
+
+def target_clause(model, ids: Optional[List[int]], filters: Optional[dict]):
+    clauses = []
+    if ids is not None:
+        clauses.append(model.id.in_(ids))
+    for key, value in (filters or {}).items():
+        if value is not None:
+            clauses.append(getattr(model, key) == value)
+    if not clauses:
+        raise HTTPException(status_code=400, detail="ids or filter is required")
+    return and_(*clauses)
+
+
+def _check_foreign_keys(db: Session, model, values: dict):
+    for key, (target, name) in FOREIGN_KEYS.get(model, {}).items():
+        # 用 ORM 查询而非裸 EXISTS，目标记录同样按租户过滤，不能挂到其他租户的记录下
+        if key in values and db.scalar(select(target.id).where(target.id == values[key])) is None:
+            raise HTTPException(status_code=404, detail=f"{name} not found")
+
+
+def _check_windows(db: Session, clause):
+    # 在更新后的状态上逐条检测，批量内部互相重叠的变更同样会被发现
+    rows = db.execute(
+        select(ChangeRecord.id, ChangeRecord.service_id, ChangeRecord.window_start, ChangeRecord.window_end, ChangeRecord.status)
+        .where(clause, ChangeRecord.window_start.is_not(None))
+    ).all()
+    for row in rows:
+        check_conflicts(db, row.service_id, row.window_start, row.window_end, row.status, exclude_id=row.id)
+
+
+def update_rows(db: Session, model, clause, values: dict) -> int:
+    # 集合式更新（不提交）：打版本号、记历史、登记写入事件
+    before = snapshot(db, model, clause)
+    updated = db.execute(update(model).where(clause).values(**values, **stamp(db)).execution_options(synchronize_session=False)).rowcount
+    if updated:
+        # 更新为常量，更新后的值直接由快照推出，不必再查一次
+        tracked = {name: value for name, value in values.items() if name in TRACKED[model]}
+        record_rows(db, model, before, {ref_id: {**row, **tracked} for ref_id, row in before.items()})
+        record(db, model.__tablename__, "bulk")
+    return updated
+
+
+def batch_update(db: Session, model, clause, values: dict) -> int:
+    if not values:
+        raise HTTPException(status_code=400, detail="values must not be empty")
+    _check_foreign_keys(db, model, values)
+    updated = update_rows(db, model, clause, values)
+    if model is ChangeRecord and values.keys() & {"service_id", "status"}:
+        try:
+            _check_windows(db, clause)
+        except HTTPException:
+            db.rollback()
+            raise
+    db.commit()
+    return updated
+
+
+def _delete(db: Session, model, clause) -> int:
+    record_rows(db, model, snapshot(db, model, clause), {})
+    insert_tombstones(db, model, clause)
+    return db.execute(delete(model).where(clause).execution_options(synchronize_session=False)).rowcount
+
+
+def batch_delete(db: Session, model, clause) -> Dict[str, int]:
+    # 与 ORM 的 delete-orphan 级联一致：先删变更，再删服务，最后删资产，全部在一个事务内
+    deleted = {}
+    if model is Asset:
+        asset_ids = select(Asset.id).where(clause)
+        service_ids = select(Service.id).where(Service.asset_id.in_(asset_ids))
+        deleted["changes"] = _delete(db, ChangeRecord, ChangeRecord.service_id.in_(service_ids))
+        deleted["services"] = _delete(db, Service, Service.asset_id.in_(asset_ids))
+    elif model is Service:
+        deleted["changes"] = _delete(db, ChangeRecord, ChangeRecord.service_id.in_(select(Service.id).where(clause)))
+    deleted[model.__tablename__] = _delete(db, model, clause)
+    for table, count in deleted.items():
+        if count:
+            record(db, table, "bulk")
+    db.commit()
+    return deleted
@@ -0,0 +1,179 @@
+import json
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import bindparam, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .history import record_rows, snapshot
+from .db import tenant_default
+from .hooks import record
+from .models import Asset
+from .network import ip_fields
+from .schemas import AssetCreate
+from .sync import stamp
+
+IMPORT_BATCH_SIZE = 1000
+
+
+def _dialect_insert(dialect_name: str):
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        return sqlite_insert
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+        return pg_insert
+    return None
+
+
+class InvalidLine(NamedTuple):
+    line: int
+
+
+def iter_ndjson_lines(lines: Iterable[bytes], first_line: int = 1) -> Iterator[Any]:
+    # 无法解析的行不中断导入（之前的批次已经提交），作为该行的错误结果返回，行号从 1 开始
+    for number, line in enumerate(lines, first_line):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            yield InvalidLine(number)
+
+
+class AssetImporter:
+    # 批量导入：每批一次集合查询解决 hostname/ip 冲突，一次 upsert 写入，一个事务提交
+    def __init__(self, db: Session, on_conflict: str = "update"):
+        self.db = db
+        self.on_conflict = on_conflict
+        self.seen_hostnames: set = set()
+        self.seen_ips: set = set()
+        self.index = 0
+        self.summary = {"created": 0, "updated": 0, "skipped": 0, "error": 0}
+
+    def _result(self, index: int, status: str, hostname=None, **extra) -> Dict[str, Any]:
+        self.summary[status] += 1
+        return {"index": index, "status": status, "hostname": hostname, **extra}
+
+    def _validate(self, raw_rows: List[Any]) -> Tuple[List[Tuple[int, AssetCreate]], List[Dict[str, Any]]]:
+        valid, results = [], []
+        for raw in raw_rows:
+            index = self.index
+            self.index += 1
+            if isinstance(raw, InvalidLine):
+                results.append(self._result(index, "error", line=raw.line, error="invalid JSON"))
+                continue
+            try:
+                payload = AssetCreate.model_validate(raw)
+            except ValidationError as exc:
+                results.append(self._result(index, "error", raw.get("hostname") if isinstance(raw, dict) else None, error=exc.errors(include_url=False)[0]["msg"]))
+                continue
+            if payload.hostname in self.seen_hostnames or payload.ip in self.seen_ips:
+                results.append(self._result(index, "error", payload.hostname, error="duplicate hostname or ip in payload"))
+                continue
+            self.seen_hostnames.add(payload.hostname)
+            self.seen_ips.add(payload.ip)
+            valid.append((index, payload))
+        return valid, results
+
+    def _upsert(self, rows: List[AssetCreate], existing: Dict[str, int]):
+        insert_factory = _dialect_insert(self.db.get_bind().dialect.name)
+        groups: Dict[frozenset, List[AssetCreate]] = {}
+        for payload in rows:
+            groups.setdefault(frozenset(payload.model_fields_set), []).append(payload)
+
+        version = stamp(self.db)
+        for fields_set, group in groups.items():
+            values = [{**payload.model_dump(), **ip_fields(payload.ip), **version} for payload in group]
+            update_fields = sorted(fields_set - {"hostname"})
+            if "ip" in update_fields:
+                update_fields += ["ip_version", "ip_key"]
+            if update_fields:
+                update_fields += list(version)
+            if insert_factory is not None:
+                stmt = insert_factory(Asset)
+                if update_fields:
+                    # 主机名全局唯一；并发下被其他租户抢先写入时不覆盖对方的记录
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[Asset.hostname],
+                        set_={name: stmt.excluded[name] for name in update_fields},
+                        where=Asset.tenant_id == stmt.excluded.tenant_id,
+                    )
+                else:
+                    stmt = stmt.on_conflict_do_nothing(index_elements=[Asset.hostname])
+                self.db.execute(stmt, values)
+                continue
+
+            # 其他数据库没有通用 upsert 语法，拆为批量 INSERT + 批量 UPDATE
+            new_values = [v for v in values if v["hostname"] not in existing]
+            if new_values:
+                self.db.execute(insert(Asset), new_values)
+            old_values = [{"_hostname": v["hostname"], **{f: v[f] for f in update_fields}} for v in values if v["hostname"] in existing]
+            if old_values and update_fields:
+                self.db.connection().execute(
+                    update(Asset.__table__).where(Asset.__table__.c.hostname == bindparam("_hostname")),
+                    old_values,
+                )
+
+    def import_batch(self, raw_rows: List[Any]) -> List[Dict[str, Any]]:
+        results = self._import_batch(raw_rows)
+        results.sort(key=lambda r: r["index"])
+        return results
+
+    def _import_batch(self, raw_rows: List[Any]) -> List[Dict[str, Any]]:
+        valid, results = self._validate(raw_rows)
+        if not valid:
+            return results
+
+        hostnames = [payload.hostname for _, payload in valid]
+        ips = [payload.ip for _, payload in valid]
+        # hostname / ip 全局唯一，冲突检查跨租户
+        found = self.db.execute(
+            select(Asset.id, Asset.hostname, Asset.ip, Asset.tenant_id)
+            .where(or_(Asset.hostname.in_(hostnames), Asset.ip.in_(ips)))
+            .execution_options(all_tenants=True)
+        ).all()
+        tenant_id = tenant_default()
+        by_hostname = {row.hostname: row for row in found}
+        by_ip = {row.ip: row for row in found}
+
+        writes: List[Tuple[int, AssetCreate, str]] = []
+        for index, payload in valid:
+            current = by_hostname.get(payload.hostname)
+            ip_owner = by_ip.get(payload.ip)
+            if current is not None and current.tenant_id != tenant_id:
+                results.append(self._result(index, "error", payload.hostname, error="hostname is used by another tenant"))
+            elif ip_owner is not None and ip_owner.tenant_id != tenant_id:
+                results.append(self._result(index, "error", payload.hostname, error="ip is used by another tenant"))
+            elif ip_owner is not None and ip_owner.hostname != payload.hostname:
+                results.append(self._result(index, "error", payload.hostname, error=f"ip already used by {ip_owner.hostname}"))
+            elif current is not None and self.on_conflict == "skip":
+                results.append(self._result(index, "skipped", payload.hostname, id=current.id))
+            else:
+                writes.append((index, payload, "updated" if current is not None else "created"))
+
+        if not writes:
+            return results
+
+        try:
+            written = Asset.hostname.in_([payload.hostname for _, payload, _ in writes])
+            before = snapshot(self.db, Asset, written)
+            self._upsert([payload for _, payload, _ in writes], {h: row.id for h, row in by_hostname.items()})
+            record_rows(self.db, Asset, before, snapshot(self.db, Asset, written))
+            ids = dict(self.db.execute(select(Asset.hostname, Asset.id).where(Asset.hostname.in_([p.hostname for _, p, _ in writes]))).all())
+            record(self.db, "assets", "bulk")
+            self.db.commit()
+        except IntegrityError:
+            # 并发写入导致的冲突：整批回滚并逐行报告，调用方可以重试
+            self.db.rollback()
+            for index, payload, _ in writes:
+                results.append(self._result(index, "error", payload.hostname, error="conflict with concurrent write, retry"))
+            return results
+
+        for index, payload, outcome in writes:
+            results.append(self._result(index, outcome, payload.hostname, id=ids.get(payload.hostname)))
+        return results
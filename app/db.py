@@ -1,14 +1,198 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import logging
 import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import declarative_base, sessionmaker
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./cmdb.db")
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args, future=True)
+# 异步驱动：DB_ASYNC=true 时 API 读写走 AsyncEngine，需要安装对应驱动（aiosqlite / asyncpg / aiomysql）
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "mysql": "mysql+aiomysql"}
+
+# SQLite 在每个新连接上执行的 PRAGMA：WAL 允许读写并发，busy_timeout 代替立即报 "database is locked"
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-65536"),
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT", "5000"),
+    "foreign_keys": "ON",
+}
+
+
+def env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+
+DB_ASYNC = env_bool("DB_ASYNC", "false")
+METRICS_ENABLED = env_bool("METRICS_ENABLED", "true")
+# 超过该耗时（毫秒）的语句连同参数写入 app.slow_query 日志，0 关闭
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+
+slow_query_log = logging.getLogger("app.slow_query")
+# 当前请求的 SQL 计数与耗时，由 metrics 中间件在请求开始时设置
+request_stats: ContextVar[Optional[dict]] = ContextVar("request_stats", default=None)
+# 当前请求的读写版本：min_version 为客户端带来的最近写入版本，version 为本次请求提交的版本
+request_writes: ContextVar[Optional[dict]] = ContextVar("request_writes", default=None)
+# 当前请求所属租户，由登录会话中间件设置；为 None 时（后台线程、迁移、命令行）不做租户过滤
+current_tenant: ContextVar[Optional[int]] = ContextVar("current_tenant", default=None)
+DEFAULT_TENANT_ID = 1
+
+
+def tenant_default() -> int:
+    return current_tenant.get() or DEFAULT_TENANT_ID
+
+
+def engine_options(url: str) -> dict:
+    parsed = make_url(url)
+    options = {"future": True}
+    if parsed.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if parsed.database in (None, "", ":memory:"):
+            return options
+    options.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        pool_pre_ping=env_bool("DB_POOL_PRE_PING", "true"),
+    )
+    return options
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
+_pool_stats = {"checkouts": 0, "peak_checked_out": 0}
+
+
+@event.listens_for(engine, "checkout")
+def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+    _pool_stats["checkouts"] += 1
+    checked_out = getattr(engine.pool, "checkedout", lambda: 0)()
+    if checked_out > _pool_stats["peak_checked_out"]:
+        _pool_stats["peak_checked_out"] = checked_out
+
+
+def _describe_pool(pool) -> dict:
+    status = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    if hasattr(pool, "_max_overflow"):
+        capacity = pool.size() + pool._max_overflow
+        status["max_overflow"] = pool._max_overflow
+        status["timeout"] = pool.timeout()
+        status["saturation"] = round(pool.checkedout() / capacity, 4) if capacity > 0 else 0.0
+    return status
+
+
+_query_totals = {"queries": 0, "slow_queries": 0}
+
+
+def _describe_parameters(parameters, executemany: bool) -> str:
+    # 批量语句只记录首行和行数，单个参数值过长时截断，避免日志被大批量写入撑爆
+    text = f"{parameters[0]!r} ... ({len(parameters)} rows)" if executemany and parameters else repr(parameters)
+    return text if len(text) <= 1000 else text[:1000] + "..."
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    _query_totals["queries"] += 1
+    stats = request_stats.get()
+    if stats is not None:
+        stats["queries"] += 1
+        stats["sql"] += elapsed
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        _query_totals["slow_queries"] += 1
+        slow_query_log.warning("slow query %.1f ms: %s params=%s", elapsed * 1000, statement, _describe_parameters(parameters, executemany))
+
+
+def _discard_query_timer(exception_context):
+    # 语句执行失败时不会触发 after_cursor_execute，弹出对应的计时
+    connection = exception_context.connection
+    if exception_context.execution_context is not None and connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def instrument_engine(target):
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+    event.listen(target, "handle_error", _discard_query_timer)
+
+
+def query_totals() -> dict:
+    return dict(_query_totals)
+
+
+if METRICS_ENABLED or SLOW_QUERY_MS:
+    instrument_engine(engine)
+
+
+def pool_status() -> dict:
+    status = {**_describe_pool(engine.pool), **_pool_stats}
+    if async_engine is not None:
+        status["async"] = _describe_pool(async_engine.pool)
+    return status
+
+
+def make_replica_engine(url: str):
+    replica = create_engine(url, **engine_options(url))
+    if replica.dialect.name == "sqlite":
+        event.listen(replica, "connect", _apply_sqlite_pragmas)
+    if METRICS_ENABLED or SLOW_QUERY_MS:
+        instrument_engine(replica)
+    return replica
+
+
+def async_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS[parsed.get_backend_name()]).render_as_string(hide_password=False)
+
+
+def make_async_engine(url: str = DATABASE_URL):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    options = engine_options(url)
+    if "pool_size" in options:
+        # aiosqlite 方言默认 NullPool，显式使用队列池以便连接复用和池参数生效
+        options["poolclass"] = AsyncAdaptedQueuePool
+    async_engine = create_async_engine(async_url(url), **options)
+    if async_engine.dialect.name == "sqlite":
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    if METRICS_ENABLED or SLOW_QUERY_MS:
+        instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = make_async_engine()
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_db():
     db = SessionLocal()
@@ -16,3 +200,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
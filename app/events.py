@@ -0,0 +1,140 @@
+import asyncio
+import os
+import threading
+from collections import deque
+from typing import AsyncIterator, List, Optional, Set
+
+import orjson
+
+from .db import current_tenant
+from .hooks import WriteEvent, on_commit
+
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "10000"))
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "1000"))
+EVENT_HEARTBEAT = float(os.getenv("EVENT_HEARTBEAT", "15"))
+
+EVENT_ENTITIES = ("assets", "services", "changes")
+
+
+class Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, entities: Set[str], status: Optional[str]):
+        self.loop = loop
+        self.entities = entities
+        self.status = status
+        # 只接收订阅者所属租户的事件；后台线程的 bulk 事件不带租户，照常下发
+        self.tenant_id = current_tenant.get()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.overflowed = False
+
+    def wants(self, event: dict) -> bool:
+        if event["entity"] not in self.entities:
+            return False
+        if self.tenant_id is not None and event["tenant_id"] not in (None, self.tenant_id):
+            return False
+        # bulk 事件不带行数据，状态无法判断，一律下发由客户端重新拉取
+        return self.status is None or event["action"] == "bulk" or event["status"] == self.status
+
+    def offer(self, event: dict):
+        # 在订阅方的事件循环中执行；队列满说明消费过慢，标记溢出并停止投递，
+        # 连接在取完已排队事件后关闭，客户端凭最后的序号重连补齐
+        if self.overflowed:
+            return
+        if self.queue.full():
+            self.overflowed = True
+            return
+        self.queue.put_nowait(event)
+
+
+class EventHub:
+    # 进程内广播：提交后的写入事件编号入环形缓冲，再投递给各订阅者
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._subscribers: Set[Subscriber] = set()
+        self.seq = 0
+
+    def publish(self, events: List[WriteEvent]):
+        with self._lock:
+            published = []
+            for event in events:
+                if event.table not in EVENT_ENTITIES:
+                    continue
+                self.seq += 1
+                row = event.row or {}
+                published.append(
+                    {
+                        "seq": self.seq,
+                        "entity": event.table,
+                        "tenant_id": event.tenant_id,
+                        "action": event.action,
+                        "id": row.get("id"),
+                        "status": row.get("status"),
+                        "row": row or None,
+                    }
+                )
+            self._buffer.extend(published)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            for event in published:
+                if subscriber.wants(event):
+                    try:
+                        subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+                    except RuntimeError:
+                        self.unsubscribe(subscriber)
+                        break
+
+    def subscribe(self, entities: Set[str], status: Optional[str], since: Optional[int]):
+        # 注册与读取缓冲在同一把锁内完成，补发与实时投递之间不丢不重
+        subscriber = Subscriber(asyncio.get_running_loop(), entities, status)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if since is None:
+                return subscriber, [], False
+            oldest = self._buffer[0]["seq"] if self._buffer else self.seq + 1
+            # 序号超出当前值（进程重启）或早于缓冲区，增量无法补齐
+            reset = since > self.seq or since < oldest - 1
+            backlog = [] if reset else [e for e in self._buffer if e["seq"] > since and subscriber.wants(e)]
+        return subscriber, backlog, reset
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+event_hub = EventHub()
+on_commit(event_hub.publish)
+
+
+def format_sse(event: dict) -> bytes:
+    return b"id: %d\nevent: change\ndata: %s\n\n" % (event["seq"], orjson.dumps(event))
+
+
+async def stream_events(
+    entities: Set[str],
+    status: Optional[str] = None,
+    since: Optional[int] = None,
+    heartbeat: float = EVENT_HEARTBEAT,
+) -> AsyncIterator[bytes]:
+    subscriber, backlog, reset = event_hub.subscribe(entities, status, since)
+    try:
+        yield b"retry: 3000\n\n"
+        if reset:
+            yield b"event: reset\ndata: %s\n\n" % orjson.dumps({"seq": event_hub.seq})
+        for event in backlog:
+            yield format_sse(event)
+        while True:
+            if subscriber.overflowed and subscriber.queue.empty():
+                yield b"event: overflow\ndata: {}\n\n"
+                return
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        event_hub.unsubscribe(subscriber)
@@ -0,0 +1,76 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+from typing import Callable, Iterable, Iterator
+
+import orjson
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from .models import Asset, ChangeRecord, Service
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_ENTITIES = {
+    "assets": (Asset, ("id", "hostname", "ip", "environment", "os", "owner", "status", "note", "created_at")),
+    "services": (Service, ("id", "name", "asset_id", "repo_url", "deploy_method", "owner", "status", "note", "created_at")),
+    "changes": (
+        ChangeRecord,
+        ("id", "title", "service_id", "risk_level", "change_window", "window_start", "window_end", "executor", "approver", "status", "rollback_plan", "created_at"),
+    ),
+}
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def iter_batches(entity: str, batch_size: int = EXPORT_BATCH_SIZE, session_factory: Callable[[], Session] = SessionLocal) -> Iterator[list]:
+    # 分块 keyset 扫描：每批只持有 batch_size 行，单独的会话不依赖请求生命周期
+    model, fields = EXPORT_ENTITIES[entity]
+    columns = [getattr(model, name) for name in fields]
+    last_id = 0
+    with session_factory() as db:
+        while True:
+            rows = db.execute(select(*columns).where(model.id > last_id).order_by(model.id).limit(batch_size)).all()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1].id
+
+
+def iter_ndjson(entity: str, session_factory: Callable[[], Session] = SessionLocal) -> Iterator[bytes]:
+    _, fields = EXPORT_ENTITIES[entity]
+    for rows in iter_batches(entity, session_factory=session_factory):
+        yield b"".join(orjson.dumps(dict(zip(fields, row))) + b"\n" for row in rows)
+
+
+def iter_csv(entity: str, session_factory: Callable[[], Session] = SessionLocal) -> Iterator[bytes]:
+    _, fields = EXPORT_ENTITIES[entity]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue().encode()
+    for rows in iter_batches(entity, session_factory=session_factory):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_plain(v) for v in row] for row in rows)
+        yield buffer.getvalue().encode()
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(entity: str, fmt: str, gzip: bool = False, session_factory: Callable[[], Session] = SessionLocal) -> Iterator[bytes]:
+    chunks = iter_ndjson(entity, session_factory) if fmt == "ndjson" else iter_csv(entity, session_factory)
+    return gzip_stream(chunks) if gzip else chunks
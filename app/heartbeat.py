@@ -0,0 +1,186 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, bindparam, select, update
+from sqlalchemy.orm import Session
+
+from .batch import update_rows
+from .db import SessionLocal, current_tenant
+from .metrics import registry
+from .models import Asset, Service
+from .schemas import HeartbeatReport
+
+# agent 上报间隔；连续 HEARTBEAT_MISSED_BEATS 次未上报的主机标记为 unreachable
+HEARTBEAT_INTERVAL = float(os.getenv("HEARTBEAT_INTERVAL", "30"))
+HEARTBEAT_MISSED_BEATS = int(os.getenv("HEARTBEAT_MISSED_BEATS", "3"))
+HEARTBEAT_FLUSH_INTERVAL = float(os.getenv("HEARTBEAT_FLUSH_INTERVAL", "5"))
+# last_seen_at 的写库粒度。需满足 粒度 + 上报间隔 + 刷写间隔 < 上报间隔 × 允许丢失次数，否则在线主机会被误判
+HEARTBEAT_TOUCH_SECONDS = float(os.getenv("HEARTBEAT_TOUCH_SECONDS", "45"))
+HEARTBEAT_MAX_BUFFERED = int(os.getenv("HEARTBEAT_MAX_BUFFERED", "200000"))
+# 单次请求最多携带的上报条数，由 agent 侧或汇聚代理批量发送
+HEARTBEAT_MAX_REPORTS = 5000
+HEARTBEAT_FLUSH_BATCH = 1000
+STALE_AFTER = timedelta(seconds=HEARTBEAT_INTERVAL * HEARTBEAT_MISSED_BEATS)
+UNREACHABLE = "unreachable"
+# 人工维护的状态，心跳只刷新 last_seen_at，不覆盖状态
+FROZEN_STATUSES = ("retired",)
+
+logger = logging.getLogger("app.heartbeat")
+
+
+def _flush_batch(db: Session, batch: Dict[str, dict], written: Dict[str, int]):
+    # 只写真正发生变化的状态；状态更新带条件，多个 worker 同时刷写也只会生效一次
+    # 刷写线程不带租户上下文，按上报方的租户核对主机归属，其他租户的主机视为未知
+    rows = db.execute(
+        select(Asset.id, Asset.hostname, Asset.status, Asset.last_seen_at, Asset.tenant_id).where(Asset.hostname.in_(list(batch)))
+    ).all()
+    rows = [row for row in rows if batch[row.hostname]["tenant_id"] in (None, row.tenant_id)]
+    written["unknown_host"] += len(batch) - len(rows)
+    transitions: Dict[str, List[int]] = {}
+    touched = []
+    reported_services = {}
+    for row in rows:
+        entry = batch[row.hostname]
+        changed = entry["status"] != row.status and row.status not in FROZEN_STATUSES
+        if changed:
+            transitions.setdefault(entry["status"], []).append(row.id)
+        # 状态变化时一并刷新 last_seen_at，避免刚恢复的主机又被判定为失联
+        if changed or row.last_seen_at is None or (entry["seen"] - row.last_seen_at).total_seconds() >= HEARTBEAT_TOUCH_SECONDS:
+            touched.append({"_id": row.id, "seen": entry["seen"]})
+        if entry["services"]:
+            reported_services[row.id] = entry["services"]
+
+    for status, ids in transitions.items():
+        clause = and_(Asset.id.in_(ids), Asset.status != status, Asset.status.not_in(FROZEN_STATUSES))
+        written["status"] += update_rows(db, Asset, clause, {"status": status})
+    if reported_services:
+        service_transitions: Dict[str, List[int]] = {}
+        for service in db.execute(select(Service.id, Service.asset_id, Service.name, Service.status).where(Service.asset_id.in_(list(reported_services)))):
+            status = reported_services[service.asset_id].get(service.name)
+            if status is not None and status != service.status:
+                service_transitions.setdefault(status, []).append(service.id)
+        for status, ids in service_transitions.items():
+            written["service_status"] += update_rows(db, Service, and_(Service.id.in_(ids), Service.status != status), {"status": status})
+    if touched:
+        table = Asset.__table__
+        db.execute(update(table).where(table.c.id == bindparam("_id")).values(last_seen_at=bindparam("seen")), touched)
+        written["last_seen"] += len(touched)
+    db.commit()
+
+
+class HeartbeatBuffer:
+    # 上报先进内存，同一主机在一个刷写周期内的多次上报合并为一条；
+    # 刷写线程按周期分批读出当前状态，只把状态变化与到期的 last_seen_at 批量写库
+    def __init__(self, flush_interval: float = HEARTBEAT_FLUSH_INTERVAL, max_buffered: int = HEARTBEAT_MAX_BUFFERED):
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending: Dict[str, dict] = {}
+        self._flusher: Optional[threading.Thread] = None
+        self._stopped = False
+        self._last_sweep = 0.0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, reports: List[HeartbeatReport]) -> int:
+        now = datetime.utcnow()
+        tenant_id = current_tenant.get()
+        coalesced = 0
+        with self._lock:
+            if len(self._pending) >= self.max_buffered:
+                raise HTTPException(status_code=503, detail="heartbeat buffer is full", headers={"Retry-After": str(int(self.flush_interval) or 1)})
+            for report in reports:
+                entry = self._pending.get(report.hostname)
+                if entry is None:
+                    self._pending[report.hostname] = {"status": report.status, "services": dict(report.services), "seen": now, "tenant_id": tenant_id}
+                    continue
+                coalesced += 1
+                entry["status"] = report.status
+                entry["services"].update(report.services)
+                entry["seen"] = now
+                entry["tenant_id"] = tenant_id
+        registry.inc(registry.heartbeats, ("received",), len(reports))
+        if coalesced:
+            registry.inc(registry.heartbeats, ("coalesced",), coalesced)
+        return len(reports)
+
+    def flush(self) -> Dict[str, int]:
+        written = {"status": 0, "service_status": 0, "last_seen": 0, "unknown_host": 0}
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return written
+            started = time.perf_counter()
+            items = list(pending.items())
+            for start in range(0, len(items), HEARTBEAT_FLUSH_BATCH):
+                try:
+                    with SessionLocal() as db:
+                        _flush_batch(db, dict(items[start : start + HEARTBEAT_FLUSH_BATCH]), written)
+                except Exception:
+                    # 未写入的上报放回缓冲区，下个周期重试；期间收到的新上报优先
+                    with self._lock:
+                        for hostname, entry in items[start:]:
+                            self._pending.setdefault(hostname, entry)
+                    raise
+            registry.observe_value(registry.heartbeat_flush, (), time.perf_counter() - started)
+        registry.inc(registry.heartbeats, ("unknown_host",), written["unknown_host"])
+        for kind in ("status", "service_status", "last_seen"):
+            registry.inc(registry.heartbeat_writes, (kind,), written[kind])
+        return written
+
+    def sweep(self) -> int:
+        # 条件更新可重复执行，多个 worker 各自巡检不会重复标记
+        cutoff = datetime.utcnow() - STALE_AFTER
+        with SessionLocal() as db:
+            clause = and_(Asset.last_seen_at < cutoff, Asset.status.not_in((UNREACHABLE, *FROZEN_STATUSES)))
+            marked = update_rows(db, Asset, clause, {"status": UNREACHABLE})
+            db.commit()
+        if marked:
+            registry.inc(registry.heartbeat_writes, ("unreachable",), marked)
+            logger.info("marked %d host(s) unreachable", marked)
+        return marked
+
+    def start(self):
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._stopped = False
+            self._flusher = threading.Thread(target=self._run, name="cmdb-heartbeat-flusher", daemon=True)
+            self._flusher.start()
+
+    def shutdown(self):
+        with self._lock:
+            self._stopped = True
+            self._wake.set()
+            self._flusher = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("final heartbeat flush failed")
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stopped:
+                return
+            try:
+                self.flush()
+                if time.monotonic() - self._last_sweep >= HEARTBEAT_INTERVAL:
+                    self._last_sweep = time.monotonic()
+                    self.sweep()
+            except Exception:
+                logger.exception("heartbeat flush failed")
+
+
+heartbeat_buffer = HeartbeatBuffer()
+registry.gauge("cmdb_heartbeat_buffered_hosts", "Hosts waiting in the heartbeat buffer.", lambda: len(heartbeat_buffer))
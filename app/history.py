@@ -0,0 +1,228 @@
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import DateTime, delete, event, exists, insert, inspect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from .db import env_bool
+from .models import Asset, ChangeRecord, History, Service
+from .serializers import FIELDS
+from .sync import next_version
+
+# 关闭后不再写入历史（基准对比用），已有历史仍可查询
+HISTORY_ENABLED = env_bool("HISTORY_ENABLED", "true")
+HISTORY_ENTITIES = {"assets": Asset, "services": Service, "changes": ChangeRecord}
+# 记录对外字段、租户与创建时间；ip_key 等派生列、行版本号不记录
+TRACKED = {model: FIELDS[model] + ("tenant_id", "created_at") for model in HISTORY_ENTITIES.values()}
+# 恢复顺序与级联关系：下级记录的外键字段 -> 上级实体
+RESTORE_ORDER = ("assets", "services", "changes")
+PARENTS = {"services": ("asset_id", "assets"), "changes": ("service_id", "services")}
+HISTORY_INSERT_BATCH = 1000
+
+
+def bucket_of(moment: datetime) -> int:
+    return moment.year * 100 + moment.month
+
+
+def _entry(session: Session, entity: str, ref_id: int, action: str, data: dict, now: datetime, tenant_id: int) -> dict:
+    # 租户取自行本身，后台线程（心跳刷写等）写入的历史也归属正确的租户
+    return {
+        "tenant_id": tenant_id,
+        "entity": entity,
+        "ref_id": ref_id,
+        "action": action,
+        "version": next_version(session),
+        "bucket": bucket_of(now),
+        "changed_at": now,
+        "data": orjson.dumps(data).decode(),
+    }
+
+
+def _write(session: Session, entries: List[dict]):
+    conn = session.connection()
+    for start in range(0, len(entries), HISTORY_INSERT_BATCH):
+        conn.execute(insert(History), entries[start : start + HISTORY_INSERT_BATCH])
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session: Session, flush_context):
+    # 与业务写入在同一事务内追加历史，回滚时一并撤销
+    if not HISTORY_ENABLED:
+        return
+    now = datetime.utcnow()
+    created = "restore" if session.info.get("history_restore") else "create"
+    entries = []
+    for obj in session.new:
+        fields = TRACKED.get(type(obj))
+        if fields:
+            state = inspect(obj)
+            entries.append(_entry(session, obj.__tablename__, obj.id, created, {f: state.dict.get(f) for f in fields}, now, obj.tenant_id))
+    for obj in session.dirty:
+        fields = TRACKED.get(type(obj))
+        if not fields:
+            continue
+        state = inspect(obj)
+        diff = {}
+        for name in fields:
+            history = state.attrs[name].history
+            if history.has_changes():
+                old = history.deleted[0] if history.deleted else None
+                new = history.added[0] if history.added else None
+                if old != new:
+                    diff[name] = [old, new]
+        if diff:
+            entries.append(_entry(session, obj.__tablename__, obj.id, "update", diff, now, obj.tenant_id))
+    for obj in session.deleted:
+        fields = TRACKED.get(type(obj))
+        if fields:
+            state = inspect(obj)
+            entries.append(_entry(session, obj.__tablename__, obj.id, "delete", {f: state.dict.get(f) for f in fields}, now, obj.tenant_id))
+    if entries:
+        _write(session, entries)
+
+
+def snapshot(db: Session, model, clause) -> Dict[int, dict]:
+    # 绕过 ORM 的集合写入前后各取一次快照，由 record_rows 比较生成历史
+    if not HISTORY_ENABLED:
+        return {}
+    fields = TRACKED[model]
+    return {row.id: dict(zip(fields, row)) for row in db.execute(select(*[getattr(model, f) for f in fields]).where(clause))}
+
+
+def record_rows(db: Session, model, before: Dict[int, dict], after: Dict[int, dict]):
+    if not HISTORY_ENABLED:
+        return
+    now = datetime.utcnow()
+    entity = model.__tablename__
+    entries = []
+    for ref_id, row in after.items():
+        old = before.get(ref_id)
+        if old is None:
+            entries.append(_entry(db, entity, ref_id, "create", row, now, row["tenant_id"]))
+            continue
+        diff = {name: [old[name], value] for name, value in row.items() if old[name] != value}
+        if diff:
+            entries.append(_entry(db, entity, ref_id, "update", diff, now, row["tenant_id"]))
+    for ref_id, row in before.items():
+        if ref_id not in after:
+            entries.append(_entry(db, entity, ref_id, "delete", row, now, row["tenant_id"]))
+    if entries:
+        _write(db, entries)
+
+
+def entry_to_dict(entry: History) -> dict:
+    return {
+        "id": entry.id,
+        "entity": entry.entity,
+        "ref_id": entry.ref_id,
+        "action": entry.action,
+        "version": entry.version,
+        "changed_at": entry.changed_at,
+        "data": orjson.loads(entry.data),
+    }
+
+
+def as_of(db: Session, entity: str, ref_id: int, at: datetime) -> Optional[dict]:
+    # 从当前行（或删除时的快照）出发，按时间倒序撤销 at 之后的历史
+    model = HISTORY_ENTITIES[entity]
+    fields = TRACKED[model]
+    row = db.execute(select(*[getattr(model, f) for f in fields]).where(model.id == ref_id)).first()
+    state = orjson.loads(orjson.dumps(dict(zip(fields, row)))) if row else None
+    entries = db.execute(
+        select(History.action, History.data)
+        .where(History.entity == entity, History.ref_id == ref_id, History.changed_at > at)
+        .order_by(History.id.desc())
+    ).all()
+    for action, data in entries:
+        data = orjson.loads(data)
+        if action == "update":
+            state = {**(state or {}), **{name: old for name, (old, _) in data.items()}}
+        elif action == "delete":
+            state = data
+        else:
+            state = None
+    return state
+
+
+def trash_query(entity: str):
+    # 已删除且之后没有再恢复的记录；同一行多次删除只取最后一次
+    model = HISTORY_ENTITIES[entity]
+    later = aliased(History)
+    return select(History).where(
+        History.action == "delete",
+        History.entity == entity,
+        ~exists().where(model.id == History.ref_id),
+        ~exists().where(later.entity == History.entity, later.ref_id == History.ref_id, later.id > History.id),
+    )
+
+
+def _from_json(model, data: dict) -> dict:
+    values = dict(data)
+    for column in model.__table__.columns:
+        if isinstance(column.type, DateTime) and isinstance(values.get(column.name), str):
+            values[column.name] = datetime.fromisoformat(values[column.name])
+    return values
+
+
+def restore(db: Session, history_id: int) -> Dict[str, int]:
+    entry = db.get(History, history_id)
+    if entry is None or entry.action != "delete":
+        raise HTTPException(status_code=404, detail="trash entry not found")
+    if db.get(HISTORY_ENTITIES[entry.entity], entry.ref_id) is not None:
+        raise HTTPException(status_code=409, detail=f"{entry.entity} {entry.ref_id} already exists")
+    if entry.entity in PARENTS:
+        key, parent = PARENTS[entry.entity]
+        parent_id = orjson.loads(entry.data)[key]
+        if db.get(HISTORY_ENTITIES[parent], parent_id) is None:
+            raise HTTPException(status_code=409, detail=f"{parent} {parent_id} is deleted, restore it first")
+
+    # 同一事务内被级联删除的下级记录一并恢复
+    group = db.execute(select(History).where(History.version == entry.version, History.action == "delete")).scalars()
+    rows = {entity: {} for entity in RESTORE_ORDER}
+    for item in group:
+        rows[item.entity][item.ref_id] = orjson.loads(item.data)
+    keep = {entry.entity: {entry.ref_id}}
+    for entity in RESTORE_ORDER[RESTORE_ORDER.index(entry.entity) + 1 :]:
+        key, parent = PARENTS[entity]
+        keep[entity] = {ref_id for ref_id, data in rows[entity].items() if data[key] in keep[parent]}
+
+    restored = {}
+    db.info["history_restore"] = True
+    try:
+        for entity, ids in keep.items():
+            model = HISTORY_ENTITIES[entity]
+            for ref_id in ids:
+                db.add(model(**_from_json(model, rows[entity][ref_id])))
+            db.flush()
+            restored[entity] = len(ids)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="restore conflicts with existing rows (hostname, ip or name already in use)")
+    finally:
+        db.info.pop("history_restore", None)
+    return restored
+
+
+def prune(db: Session, keep_months: int) -> int:
+    # 按月整段删除，走 (bucket, id) 索引
+    now = datetime.utcnow()
+    month = now.year * 12 + now.month - 1 - keep_months
+    cutoff = (month // 12) * 100 + month % 12 + 1
+    deleted = db.execute(delete(History).where(History.bucket < cutoff)).rowcount
+    db.commit()
+    return deleted
+
+
+if __name__ == "__main__":
+    from .db import SessionLocal
+
+    parser = argparse.ArgumentParser(prog="python -m app.history")
+    parser.add_argument("--keep-months", type=int, required=True, help="保留当月与之前 N 个整月的历史")
+    args = parser.parse_args()
+    with SessionLocal() as db:
+        print(f"pruned {prune(db, args.keep_months)} history entries")
@@ -0,0 +1,60 @@
+from collections import namedtuple
+from typing import Callable, List, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from .db import current_tenant
+
+# 一次提交内的写入事件：action 为 create / update / delete，
+# 绕过 ORM 的集合写入（批量导入等）记录为 bulk，由监听方自行决定如何失效；
+# tenant_id 取行数据中的租户，bulk 事件取当前请求的租户，后台线程的 bulk 事件为 None
+WriteEvent = namedtuple("WriteEvent", "table action row old tenant_id")
+
+_listeners: List[Callable[[List[WriteEvent]], None]] = []
+
+
+def on_commit(listener: Callable[[List[WriteEvent]], None]):
+    _listeners.append(listener)
+    return listener
+
+
+def record(session: Session, table: str, action: str, row: Optional[dict] = None, old: Optional[dict] = None):
+    tenant_id = row["tenant_id"] if row and "tenant_id" in row else current_tenant.get()
+    session.info.setdefault("write_events", []).append(WriteEvent(table, action, row or {}, old or {}, tenant_id))
+
+
+def _snapshot(state) -> dict:
+    return {attr.key: state.dict.get(attr.key) for attr in state.mapper.column_attrs}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session: Session, flush_context):
+    for obj in session.new:
+        state = inspect(obj)
+        record(session, state.mapper.local_table.name, "create", _snapshot(state))
+    for obj in session.dirty:
+        state = inspect(obj)
+        old = {}
+        for attr in state.mapper.column_attrs:
+            history = state.attrs[attr.key].history
+            if history.has_changes():
+                old[attr.key] = history.deleted[0] if history.deleted else None
+        if old:
+            record(session, state.mapper.local_table.name, "update", _snapshot(state), old)
+    for obj in session.deleted:
+        state = inspect(obj)
+        record(session, state.mapper.local_table.name, "delete", _snapshot(state))
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch(session: Session):
+    events = session.info.pop("write_events", None)
+    if events:
+        for listener in _listeners:
+            listener(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session):
+    session.info.pop("write_events", None)
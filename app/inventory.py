@@ -0,0 +1,138 @@
+import hashlib
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .hooks import WriteEvent
+from .models import Asset, Service
+from .sync import current_version
+from .tenancy import PerTenant
+
+INVENTORY_TABLES = {"assets", "services"}
+# 不同 port / environment 组合各缓存一份渲染结果，超过上限时整体清空
+MAX_RENDERED = 64
+
+
+def group_name(prefix: str, value: str) -> str:
+    return f"{prefix}_{re.sub(r'[^0-9A-Za-z_]', '_', value)}"
+
+
+def _target(ip: str, port: int) -> str:
+    return f"[{ip}]:{port}" if ":" in ip else f"{ip}:{port}"
+
+
+class Inventory:
+    def __init__(self, assets, services):
+        self.hosts: List[dict] = []
+        services_by_asset: Dict[int, list] = {}
+        for s in services:
+            services_by_asset.setdefault(s.asset_id, []).append(s)
+        for a in sorted(assets, key=lambda a: a.hostname):
+            hosted = sorted(services_by_asset.get(a.id, []), key=lambda s: s.name)
+            self.hosts.append(
+                {
+                    "hostname": a.hostname,
+                    "ip": a.ip,
+                    "environment": a.environment,
+                    "os": a.os,
+                    "owner": a.owner,
+                    "status": a.status,
+                    "services": [s.name for s in hosted],
+                    "deploy_methods": sorted({s.deploy_method for s in hosted if s.deploy_method}),
+                }
+            )
+
+    def ansible(self, environment: Optional[str] = None) -> dict:
+        groups: Dict[str, List[str]] = {}
+        hostvars = {}
+        for host in self.hosts:
+            if environment is not None and host["environment"] != environment:
+                continue
+            name = host["hostname"]
+            hostvars[name] = {
+                "ansible_host": host["ip"],
+                "cmdb_environment": host["environment"],
+                "cmdb_os": host["os"],
+                "cmdb_owner": host["owner"],
+                "cmdb_status": host["status"],
+                "cmdb_services": host["services"],
+            }
+            groups.setdefault(group_name("env", host["environment"]), []).append(name)
+            for service in host["services"]:
+                groups.setdefault(group_name("service", service), []).append(name)
+            for method in host["deploy_methods"]:
+                groups.setdefault(group_name("deploy", method), []).append(name)
+        inventory = {name: {"hosts": hosts} for name, hosts in sorted(groups.items())}
+        inventory["all"] = {"children": sorted(groups)}
+        inventory["_meta"] = {"hostvars": hostvars}
+        return inventory
+
+    def prometheus(self, port: int, environment: Optional[str] = None) -> list:
+        # 每台主机一个 target group，服务与部署方式作为逗号分隔标签，避免同一地址被重复抓取
+        return [
+            {
+                "targets": [_target(host["ip"], port)],
+                "labels": {
+                    "environment": host["environment"],
+                    "hostname": host["hostname"],
+                    "os": host["os"],
+                    "owner": host["owner"],
+                    "status": host["status"],
+                    "services": ",".join(host["services"]),
+                    "deploy_methods": ",".join(host["deploy_methods"]),
+                },
+            }
+            for host in self.hosts
+            if environment is None or host["environment"] == environment
+        ]
+
+
+class InventoryCache:
+    # 资产/服务任何写入提交后失效；渲染后的响应体与 ETag 按参数缓存，抓取请求直接从内存返回
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inventory: Optional[Inventory] = None
+        self._rendered: Dict[tuple, Tuple[bytes, str]] = {}
+        self._generation = 0
+        self._version: Optional[int] = None
+
+    def render(self, db: Session, key: tuple, build: Callable[[Inventory], object]) -> Tuple[bytes, str]:
+        # 与拓扑缓存相同，用全局行版本号发现其他 worker 进程的写入
+        version = current_version(db)
+        if version != self._version:
+            self.invalidate()
+        cached = self._rendered.get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            if key in self._rendered:
+                return self._rendered[key]
+            generation = self._generation
+            inventory = self._inventory
+            if inventory is None:
+                assets = db.execute(select(Asset.id, Asset.hostname, Asset.ip, Asset.environment, Asset.os, Asset.owner, Asset.status)).all()
+                services = db.execute(select(Service.name, Service.asset_id, Service.deploy_method)).all()
+                inventory = Inventory(assets, services)
+            body = orjson.dumps(build(inventory), option=orjson.OPT_SORT_KEYS)
+            rendered = (body, f'"{hashlib.sha1(body).hexdigest()}"')
+            # 构建期间有写入提交则本次结果只用于当前请求，不进入缓存
+            if generation == self._generation:
+                self._inventory = inventory
+                self._version = version
+                if len(self._rendered) >= MAX_RENDERED:
+                    self._rendered = {}
+                self._rendered[key] = rendered
+            return rendered
+
+    def invalidate(self, events: Optional[List[WriteEvent]] = None):
+        if events is None or any(event.table in INVENTORY_TABLES for event in events):
+            self._generation += 1
+            self._inventory = None
+            self._rendered = {}
+
+
+inventory_cache = PerTenant(InventoryCache, "invalidate")
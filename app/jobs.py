@@ -0,0 +1,259 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from .batch import batch_delete, batch_update, target_clause
+from .bulk import IMPORT_BATCH_SIZE, AssetImporter
+from .db import SessionLocal
+from .export import EXPORT_BATCH_SIZE, EXPORT_ENTITIES, export_stream
+from .models import Asset, ChangeRecord, Job, Service
+from .schemas import (
+    AssetBatchDelete,
+    AssetBatchUpdate,
+    ChangeBatchDelete,
+    ChangeBatchUpdate,
+    ExportJobParams,
+    ImportAssetsJobParams,
+    ServiceBatchDelete,
+    ServiceBatchUpdate,
+)
+from .tenancy import tenant_scope
+
+# 0 表示本进程只接收任务不执行，由其他进程的 worker 领取
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+# 执行中的任务每个轮询周期续租一次，租约过期的 running 任务由任一进程重新排队
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_EXPORT_DIR = Path(os.getenv("JOB_EXPORT_DIR", "./exports"))
+
+logger = logging.getLogger("app.jobs")
+
+BATCH_SCHEMAS = {
+    "assets": (Asset, AssetBatchUpdate, AssetBatchDelete),
+    "services": (Service, ServiceBatchUpdate, ServiceBatchDelete),
+    "changes": (ChangeRecord, ChangeBatchUpdate, ChangeBatchDelete),
+}
+
+
+def validate_params(kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    # 提交时完成校验并规范化参数，worker 执行时不再处理非法输入
+    try:
+        if kind in ("batch_update", "batch_delete"):
+            entity = params.get("entity")
+            if entity not in BATCH_SCHEMAS:
+                raise HTTPException(status_code=422, detail="params.entity must be one of assets, services, changes")
+            model, update_schema, delete_schema = BATCH_SCHEMAS[entity]
+            schema = update_schema if kind == "batch_update" else delete_schema
+            payload = schema.model_validate({key: value for key, value in params.items() if key != "entity"})
+            filters = payload.filter.model_dump() if payload.filter else None
+            target_clause(model, payload.ids, filters)
+            normalized = {"entity": entity, "ids": payload.ids, "filter": filters}
+            if kind == "batch_update":
+                normalized["values"] = payload.values.model_dump(exclude_unset=True)
+                if not normalized["values"]:
+                    raise HTTPException(status_code=400, detail="values must not be empty")
+            return normalized
+        if kind == "export":
+            return ExportJobParams.model_validate(params).model_dump()
+        return ImportAssetsJobParams.model_validate(params).model_dump()
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors(include_url=False, include_context=False))
+
+
+class JobProgress:
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+
+    def update(self, processed: int, total: Optional[int] = None):
+        values = {"processed": processed}
+        if total is not None:
+            values["total"] = total
+        _set_job(self.job_id, **values)
+
+
+def _set_job(job_id: int, **values):
+    # 进度与状态用独立的短事务写入，不受任务自身事务回滚影响
+    with SessionLocal() as db:
+        db.execute(update(Job).where(Job.id == job_id).values(**values))
+        db.commit()
+
+
+def run_batch_update(db: Session, params: dict, progress: JobProgress) -> dict:
+    model = BATCH_SCHEMAS[params["entity"]][0]
+    updated = batch_update(db, model, target_clause(model, params["ids"], params["filter"]), params["values"])
+    progress.update(updated, updated)
+    return {"updated": updated}
+
+
+def run_batch_delete(db: Session, params: dict, progress: JobProgress) -> dict:
+    model = BATCH_SCHEMAS[params["entity"]][0]
+    deleted = batch_delete(db, model, target_clause(model, params["ids"], params["filter"]))
+    progress.update(sum(deleted.values()), sum(deleted.values()))
+    return {"deleted": deleted}
+
+
+def run_export(db: Session, params: dict, progress: JobProgress) -> dict:
+    model, _ = EXPORT_ENTITIES[params["entity"]]
+    total = db.scalar(select(func.count()).select_from(model))
+    progress.update(0, total)
+    suffix = params["format"] + (".gz" if params["gzip"] else "")
+    JOB_EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    path = JOB_EXPORT_DIR / f"job-{progress.job_id}-{params['entity']}.{suffix}"
+    size = 0
+    with path.open("wb") as output:
+        for count, chunk in enumerate(export_stream(params["entity"], params["format"], params["gzip"]), start=1):
+            output.write(chunk)
+            size += len(chunk)
+            if count % 10 == 0:
+                progress.update(min(count * EXPORT_BATCH_SIZE, total))
+    progress.update(total)
+    return {"file": path.name, "bytes": size, "rows": total}
+
+
+def run_import_assets(db: Session, params: dict, progress: JobProgress) -> dict:
+    rows = params["rows"]
+    importer = AssetImporter(db, on_conflict=params["on_conflict"])
+    errors = []
+    progress.update(0, len(rows))
+    for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+        results = importer.import_batch(rows[start : start + IMPORT_BATCH_SIZE])
+        errors.extend(r for r in results if r["status"] == "error")
+        progress.update(min(start + IMPORT_BATCH_SIZE, len(rows)))
+    return {"summary": importer.summary, "errors": errors}
+
+
+JOB_HANDLERS: Dict[str, Callable[[Session, dict, JobProgress], dict]] = {
+    "batch_update": run_batch_update,
+    "batch_delete": run_batch_delete,
+    "export": run_export,
+    "import_assets": run_import_assets,
+}
+
+
+class JobRunner:
+    # 有界线程池执行任务；轮询线程按空闲容量从 jobs 表领取，领取用条件 UPDATE 保证同一任务只被执行一次，
+    # 多个 worker 进程共用一张 jobs 表也不会重复执行
+    def __init__(self, workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running: Set[int] = set()
+        self._last_renewal = 0.0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._poller: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def start(self):
+        with self._lock:
+            if self._poller is not None or self.workers <= 0:
+                return
+            self._stopped = False
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="cmdb-job")
+            self._poller = threading.Thread(target=self._poll, name="cmdb-job-poller", daemon=True)
+            self._poller.start()
+
+    def shutdown(self):
+        with self._lock:
+            self._stopped = True
+            self._wake.set()
+            if self._executor is not None:
+                # 未开始的任务仍为 queued，执行中的任务租约过期后重新排队
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._poller = None
+
+    def submit(self, db: Session, kind: str, params: dict) -> Job:
+        job = Job(kind=kind, params=json.dumps(params, ensure_ascii=False))
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self.start()
+        self._wake.set()
+        return job
+
+    def _renew_leases(self):
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            with self._lock:
+                running = list(self._running)
+            if running:
+                db.execute(update(Job).where(Job.id.in_(running), Job.status == "running").values(heartbeat_at=now))
+            # 所在进程退出后租约不再续期，重新排队（任务均按 ids / 条件 / hostname 执行，可重复执行）
+            requeued = db.execute(
+                update(Job)
+                .where(Job.status == "running", or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < now - timedelta(seconds=self.lease_seconds)))
+                .values(status="queued")
+            ).rowcount
+            db.commit()
+        if requeued:
+            logger.warning("requeued %d job(s) with expired lease", requeued)
+
+    def _poll(self):
+        while not self._stopped:
+            try:
+                if time.monotonic() - self._last_renewal >= self.poll_interval:
+                    self._last_renewal = time.monotonic()
+                    self._renew_leases()
+                self._dispatch()
+            except Exception:
+                logger.exception("job dispatch failed")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if self._stopped or len(self._running) >= self.workers:
+                    return
+                job_id = self._claim()
+                if job_id is None:
+                    return
+                self._running.add(job_id)
+                self._executor.submit(self._run, job_id)
+
+    def _claim(self) -> Optional[int]:
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            for job_id in db.scalars(select(Job.id).where(Job.status == "queued").order_by(Job.id).limit(self.workers)).all():
+                claimed = db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == "queued")
+                    .values(status="running", started_at=now, heartbeat_at=now, attempts=Job.attempts + 1)
+                ).rowcount
+                db.commit()
+                if claimed:
+                    return job_id
+        return None
+
+    def _run(self, job_id: int):
+        try:
+            with SessionLocal() as db:
+                job = db.get(Job, job_id)
+                # 任务在提交者的租户内执行，查询与写入同样按租户过滤
+                with tenant_scope(job.tenant_id):
+                    result = JOB_HANDLERS[job.kind](db, json.loads(job.params), JobProgress(job_id))
+            _set_job(job_id, status="succeeded", result=json.dumps(result, ensure_ascii=False, default=str), finished_at=datetime.utcnow())
+        except Exception as exc:
+            logger.exception("job %s failed", job_id)
+            detail = exc.detail if isinstance(exc, HTTPException) else str(exc)
+            _set_job(job_id, status="failed", error=str(detail), finished_at=datetime.utcnow())
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+            self._wake.set()
+
+
+job_runner = JobRunner()
@@ -1,20 +1,87 @@
-from fastapi import Depends, FastAPI, Form, HTTPException, Request, status
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import Body, Depends, FastAPI, Form, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+from fastapi.routing import APIRoute
 from fastapi.templating import Jinja2Templates
-from sqlalchemy import func, or_, select
+from sqlalchemy import or_, select
 from sqlalchemy.orm import Session
-
-from .db import Base, engine, get_db
-from .models import Asset, ChangeRecord, Service
+from starlette.concurrency import run_in_threadpool
+
+from .auth import (
+    PERMISSIONS,
+    SESSION_COOKIE,
+    SESSION_TTL,
+    SessionMiddleware,
+    authenticate,
+    current_permissions,
+    current_principal,
+    hash_password,
+    is_logged_in,
+    issue_token,
+    parse_permissions,
+    require_login,
+    require_permission,
+)
+from .batch import batch_delete, batch_update, target_clause
+from .bulk import IMPORT_BATCH_SIZE, AssetImporter, iter_ndjson_lines
+from .db import DB_ASYNC, METRICS_ENABLED, engine, get_db, pool_status
+from .events import EVENT_ENTITIES, stream_events
+from .export import EXPORT_ENTITIES, MEDIA_TYPES, export_stream
+from .heartbeat import HEARTBEAT_MAX_REPORTS, STALE_AFTER, heartbeat_buffer
+from .history import HISTORY_ENTITIES, as_of, entry_to_dict, restore, trash_query
+from .inventory import inventory_cache
+from .jobs import JOB_EXPORT_DIR, job_runner, validate_params
+from .metrics import MetricsMiddleware, ORJSONResponse, instrument_templates, registry
+from .migrations import AUTO_MIGRATE, upgrade
+from .models import Asset, ChangeRecord, History, Job, Role, Service, Tenant, User
+from .network import after_clause, cursor_value, network_bounds, parse_network, parse_range, ranges_clause, subnet_usage
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, apply_filters, decode_cursor, encode_cursor, keyset, set_next_headers, split_page
+from .replicas import ReadYourWritesMiddleware, get_read_db, read_session
 from .schemas import (
+    AssetBatchDelete,
+    AssetBatchUpdate,
     AssetCreate,
     AssetUpdate,
+    ChangeBatchDelete,
+    ChangeBatchUpdate,
     ChangeCreate,
     ChangeUpdate,
+    HeartbeatReport,
+    JobCreate,
+    LoginRequest,
+    RoleUpdate,
+    ServiceBatchDelete,
+    ServiceBatchUpdate,
     ServiceCreate,
     ServiceUpdate,
+    TenantCreate,
+    UserCreate,
+    UserUpdate,
+)
+from .search import SEARCH_ENTITIES, match_clause, search
+from .serializers import (
+    ASSET_FIELDS,
+    CHANGE_FIELDS,
+    SERVICE_FIELDS,
+    asset_to_dict,
+    change_to_dict,
+    columns,
+    job_to_dict,
+    parse_fields,
+    role_to_dict,
+    rows_to_dicts,
+    service_to_dict,
+    user_to_dict,
 )
+from .stats import etag_matches, overview_cache
+from .sync import SYNC_ENTITIES, changes_since
+from .topology import select_nodes, topology_cache
+from .web import FragmentCache, HashedStaticFiles, HTTPCacheMiddleware, precompile_templates
+from .windows import check_conflicts, merge_window, scheduled_clause, to_utc, validate_window, window_cursor
 
 APP_TITLE = "devops-cmdb"
 
@@ -24,9 +91,9 @@ VEOPS_FEATURE_MAP = [
         "items": [
             {"name": "模型设计（模型/属性/分组）", "status": "规划中", "anchor": "veops-plan"},
             {"name": "CI 列表与详情", "status": "已支持", "anchor": "asset-list"},
-            {"name": "关系视图与拓扑", "status": "规划中", "anchor": "veops-plan"},
-            {"name": "批量导入导出", "status": "规划中", "anchor": "veops-plan"},
-            {"name": "回收站与历史审计", "status": "规划中", "anchor": "veops-plan"},
+            {"name": "关系视图与拓扑", "status": "部分支持", "anchor": "api-section"},
+            {"name": "批量导入导出", "status": "已支持", "anchor": "api-section"},
+            {"name": "回收站与历史审计", "status": "已支持", "anchor": "api-section"},
         ],
     },
     {
@@ -44,22 +111,58 @@ VEOPS_FEATURE_MAP = [
         "items": [
             {"name": "资源搜索", "status": "已支持", "anchor": "search-assets"},
             {"name": "统计看板", "status": "已支持", "anchor": "overview"},
-            {"name": "权限与角色（RBAC）", "status": "规划中", "anchor": "veops-plan"},
+            {"name": "权限与角色（RBAC）", "status": "已支持", "anchor": "api-section"},
             {"name": "Webhook / OpenAPI 集成", "status": "部分支持", "anchor": "api-section"},
-            {"name": "多租户与组织隔离", "status": "规划中", "anchor": "veops-plan"},
+            {"name": "多租户与组织隔离", "status": "已支持", "anchor": "api-section"},
         ],
     },
 ]
 
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 多 worker 部署时设置 AUTO_MIGRATE=false，启动前单独执行一次 python -m app.migrations
+    if AUTO_MIGRATE:
+        upgrade(engine)
+    # 开始领取任务（含租约过期的中断任务）；提交任务时也会按需启动
+    job_runner.start()
+    heartbeat_buffer.start()
+    yield
+    heartbeat_buffer.shutdown()
+    job_runner.shutdown()
+
+
 app = FastAPI(
     title=APP_TITLE,
     version="1.0.0",
     description="生产可用的 DevOps CMDB（资产、服务、变更）",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
-Base.metadata.create_all(bind=engine)
 
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+static_files = HashedStaticFiles(directory="app/static")
+app.mount("/static", static_files, name="static")
 templates = Jinja2Templates(directory="app/templates")
+precompile_templates(templates.env)
+templates.env.globals["static_url"] = static_files.url
+# 功能全景、导航与表单等不随数据变化的片段，渲染一次后复用
+fragments = FragmentCache(templates.env, veops_feature_map=VEOPS_FEATURE_MAP)
+templates.env.globals["fragment"] = fragments.render
+
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(SessionMiddleware)
+app.add_middleware(HTTPCacheMiddleware)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_templates(templates)
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="metrics disabled")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.get("/healthz")
@@ -67,18 +170,17 @@ def healthz():
     return {"status": "ok", "service": APP_TITLE}
 
 
-# 生产中应替换为 SSO/OIDC，这里提供可配置默认账号
-DEFAULT_USERNAME = "admin"
-DEFAULT_PASSWORD = "admin"
+DASHBOARD_PAGE_SIZE = 50
 
 
-def is_logged_in(request: Request) -> bool:
-    return request.cookies.get("cmdb_auth") == "1"
-
-
-def require_login(request: Request):
-    if not is_logged_in(request):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="not authenticated")
+def _dashboard_page(db: Session, request: Request, stmt, id_column, cursor: Optional[str], cursor_param: str, anchor: str):
+    rows = db.execute(keyset(stmt, id_column, DASHBOARD_PAGE_SIZE, cursor, "desc")).all()
+    rows, next_cursor = split_page(rows, DASHBOARD_PAGE_SIZE, "desc")
+    return {
+        "rows": rows,
+        "next_url": f"{request.url.include_query_params(**{cursor_param: next_cursor})}#{anchor}" if next_cursor else "",
+        "first_url": f"{request.url.remove_query_params(cursor_param)}#{anchor}" if cursor else "",
+    }
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -86,39 +188,35 @@ def index(
     request: Request,
     q: str = "",
     status_filter: str = "",
-    db: Session = Depends(get_db),
+    asset_cursor: Optional[str] = None,
+    service_cursor: Optional[str] = None,
+    change_cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    primary: Session = Depends(get_db),
 ):
     if not is_logged_in(request):
         return RedirectResponse(url="/login", status_code=303)
 
-    asset_query = select(Asset)
+    asset_query = select(*columns(Asset, ASSET_FIELDS))
     if q:
-        pattern = f"%{q}%"
-        asset_query = asset_query.where(or_(Asset.hostname.like(pattern), Asset.ip.like(pattern), Asset.owner.like(pattern)))
+        asset_query = asset_query.where(match_clause(db, "asset", q))
     if status_filter:
         asset_query = asset_query.where(Asset.status == status_filter)
-
-    assets = db.execute(asset_query.order_by(Asset.id.desc())).scalars().all()
-    services = db.execute(select(Service).order_by(Service.id.desc())).scalars().all()
-    changes = db.execute(select(ChangeRecord).order_by(ChangeRecord.id.desc())).scalars().all()
-
-    total_assets = db.scalar(select(func.count()).select_from(Asset)) or 0
-    total_services = db.scalar(select(func.count()).select_from(Service)) or 0
-    pending_changes = db.scalar(select(func.count()).select_from(ChangeRecord).where(ChangeRecord.status == "pending")) or 0
+    # 总览缓存按提交增量维护，只能基于主库构建
+    overview, _ = overview_cache.get(primary)
 
     return templates.TemplateResponse(
         "index.html",
         {
             "request": request,
-            "assets": assets,
-            "services": services,
-            "changes": changes,
+            "assets": _dashboard_page(db, request, asset_query, Asset.id, asset_cursor, "asset_cursor", "asset-list"),
+            "services": _dashboard_page(db, request, select(*columns(Service, SERVICE_FIELDS)), Service.id, service_cursor, "service_cursor", "service-list"),
+            "changes": _dashboard_page(db, request, select(*columns(ChangeRecord, CHANGE_FIELDS)), ChangeRecord.id, change_cursor, "change_cursor", "change-list"),
             "q": q,
             "status": status_filter,
-            "total_assets": total_assets,
-            "total_services": total_services,
-            "pending_changes": pending_changes,
-            "veops_feature_map": VEOPS_FEATURE_MAP,
+            "total_assets": overview["asset_count"],
+            "total_services": overview["service_count"],
+            "pending_changes": overview["pending_changes"],
         },
     )
 
@@ -131,27 +229,37 @@ def login_page(request: Request):
 
 
 @app.post("/login", response_class=HTMLResponse)
-def login(request: Request, username: str = Form(...), password: str = Form(...)):
-    if username != DEFAULT_USERNAME or password != DEFAULT_PASSWORD:
+def login(request: Request, username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
+    user = authenticate(db, username, password)
+    if user is None:
         return templates.TemplateResponse(
             "login.html",
-            {"request": request, "error": "用户名或密码错误（默认 admin/admin）"},
+            {"request": request, "error": "用户名或密码错误（初始账号 admin/admin）"},
             status_code=400,
         )
 
     response = RedirectResponse(url=request.url_for("index"), status_code=303)
-    response.set_cookie("cmdb_auth", "1", httponly=True, samesite="lax")
+    response.set_cookie(SESSION_COOKIE, issue_token(user), max_age=SESSION_TTL, httponly=True, samesite="lax")
     return response
 
 
 @app.post("/logout")
 def logout(request: Request):
     response = RedirectResponse(url=request.url_for("login_page"), status_code=303)
-    response.delete_cookie("cmdb_auth")
+    response.delete_cookie(SESSION_COOKIE)
     return response
 
 
-@app.post("/assets")
+@app.post("/api/token")
+def create_token(payload: LoginRequest, db: Session = Depends(get_db)):
+    # 脚本与 agent 使用：Authorization: Bearer <access_token>
+    user = authenticate(db, payload.username, payload.password)
+    if user is None:
+        raise HTTPException(status_code=401, detail="invalid username or password")
+    return {"access_token": issue_token(user), "token_type": "bearer", "expires_in": SESSION_TTL}
+
+
+@app.post("/assets", dependencies=[Depends(require_login)])
 def create_asset(
     request: Request,
     hostname: str = Form(...),
@@ -164,7 +272,10 @@ def create_asset(
     db: Session = Depends(get_db),
 ):
     payload = AssetCreate(hostname=hostname, ip=ip, environment=environment, os=os, owner=owner, status=status, note=note)
-    duplicated = db.execute(select(Asset).where(or_(Asset.hostname == payload.hostname, Asset.ip == payload.ip))).scalar_one_or_none()
+    # hostname / ip / 服务名全局唯一，重复检查跨租户
+    duplicated = db.execute(
+        select(Asset.id).where(or_(Asset.hostname == payload.hostname, Asset.ip == payload.ip)).limit(1).execution_options(all_tenants=True)
+    ).first()
     if duplicated:
         raise HTTPException(status_code=400, detail="hostname or ip already exists")
 
@@ -174,7 +285,7 @@ def create_asset(
     return RedirectResponse(url=request.url_for("index"), status_code=303)
 
 
-@app.post("/services")
+@app.post("/services", dependencies=[Depends(require_login)])
 def create_service(
     request: Request,
     name: str = Form(...),
@@ -198,7 +309,7 @@ def create_service(
     if not db.get(Asset, payload.asset_id):
         raise HTTPException(status_code=404, detail="asset not found")
 
-    duplicated = db.execute(select(Service).where(Service.name == payload.name)).scalar_one_or_none()
+    duplicated = db.execute(select(Service.id).where(Service.name == payload.name).execution_options(all_tenants=True)).first()
     if duplicated:
         raise HTTPException(status_code=400, detail="service already exists")
 
@@ -208,13 +319,15 @@ def create_service(
     return RedirectResponse(url=request.url_for("index"), status_code=303)
 
 
-@app.post("/changes")
+@app.post("/changes", dependencies=[Depends(require_login)])
 def create_change(
     request: Request,
     title: str = Form(...),
     service_id: int = Form(...),
     risk_level: str = Form("medium"),
     change_window: str = Form(""),
+    window_start: str = Form(""),
+    window_end: str = Form(""),
     executor: str = Form(""),
     approver: str = Form(""),
     status: str = Form("pending"),
@@ -226,6 +339,8 @@ def create_change(
         service_id=service_id,
         risk_level=risk_level,
         change_window=change_window,
+        window_start=window_start or None,
+        window_end=window_end or None,
         executor=executor,
         approver=approver,
         status=status,
@@ -234,6 +349,8 @@ def create_change(
 
     if not db.get(Service, payload.service_id):
         raise HTTPException(status_code=404, detail="service not found")
+    payload.window_start, payload.window_end = validate_window(payload.window_start, payload.window_end)
+    check_conflicts(db, payload.service_id, payload.window_start, payload.window_end, payload.status)
 
     change = ChangeRecord(**payload.model_dump())
     db.add(change)
@@ -241,7 +358,7 @@ def create_change(
     return RedirectResponse(url=request.url_for("index"), status_code=303)
 
 
-@app.post("/assets/{asset_id}/delete")
+@app.post("/assets/{asset_id}/delete", dependencies=[Depends(require_login)])
 def delete_asset(request: Request, asset_id: int, db: Session = Depends(get_db)):
     asset = db.get(Asset, asset_id)
     if not asset:
@@ -251,7 +368,7 @@ def delete_asset(request: Request, asset_id: int, db: Session = Depends(get_db))
     return RedirectResponse(url=request.url_for("index"), status_code=303)
 
 
-@app.post("/services/{service_id}/delete")
+@app.post("/services/{service_id}/delete", dependencies=[Depends(require_login)])
 def delete_service(request: Request, service_id: int, db: Session = Depends(get_db)):
     service = db.get(Service, service_id)
     if not service:
@@ -261,7 +378,7 @@ def delete_service(request: Request, service_id: int, db: Session = Depends(get_
     return RedirectResponse(url=request.url_for("index"), status_code=303)
 
 
-@app.post("/changes/{change_id}/delete")
+@app.post("/changes/{change_id}/delete", dependencies=[Depends(require_login)])
 def delete_change(request: Request, change_id: int, db: Session = Depends(get_db)):
     change = db.get(ChangeRecord, change_id)
     if not change:
@@ -271,59 +388,119 @@ def delete_change(request: Request, change_id: int, db: Session = Depends(get_db
     return RedirectResponse(url=request.url_for("index"), status_code=303)
 
 
-def _asset_to_dict(a: Asset):
-    return {
-        "id": a.id,
-        "hostname": a.hostname,
-        "ip": a.ip,
-        "environment": a.environment,
-        "os": a.os,
-        "owner": a.owner,
-        "status": a.status,
-        "note": a.note,
-    }
+@app.get("/api/overview", dependencies=[Depends(require_login)])
+def api_overview(request: Request, db: Session = Depends(get_db)):
+    payload, etag = overview_cache.get(db)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse(payload, headers=headers)
 
 
-def _service_to_dict(s: Service):
-    return {
-        "id": s.id,
-        "name": s.name,
-        "asset_id": s.asset_id,
-        "repo_url": s.repo_url,
-        "deploy_method": s.deploy_method,
-        "owner": s.owner,
-        "status": s.status,
-        "note": s.note,
-    }
+@app.get("/api/pool", dependencies=[Depends(require_login)])
+def api_pool():
+    return pool_status()
 
 
-def _change_to_dict(c: ChangeRecord):
-    return {
-        "id": c.id,
-        "title": c.title,
-        "service_id": c.service_id,
-        "risk_level": c.risk_level,
-        "change_window": c.change_window,
-        "executor": c.executor,
-        "approver": c.approver,
-        "status": c.status,
-        "rollback_plan": c.rollback_plan,
-    }
+@app.get("/api/assets", dependencies=[Depends(require_login)])
+def list_assets(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    environment: Optional[str] = None,
+    status: Optional[str] = None,
+    owner: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，如 id,hostname,ip"),
+    db: Session = Depends(get_read_db),
+):
+    names = parse_fields(Asset, fields)
+    stmt = apply_filters(select(*columns(Asset, names)), Asset, environment=environment, status=status, owner=owner)
+    rows = db.execute(keyset(stmt, Asset.id, limit, cursor, order)).all()
+    rows, next_cursor = split_page(rows, limit, order)
+    response = ORJSONResponse(rows_to_dicts(rows, names))
+    set_next_headers(request, response, next_cursor)
+    return response
 
 
-@app.get("/api/overview", dependencies=[Depends(require_login)])
-def api_overview(db: Session = Depends(get_db)):
-    return {
-        "asset_count": db.scalar(select(func.count()).select_from(Asset)) or 0,
-        "service_count": db.scalar(select(func.count()).select_from(Service)) or 0,
-        "change_count": db.scalar(select(func.count()).select_from(ChangeRecord)) or 0,
-    }
+@app.get("/api/assets/by-network", dependencies=[Depends(require_login)])
+def list_assets_by_network(
+    request: Request,
+    cidr: List[str] = Query([]),
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，如 id,hostname,ip"),
+    db: Session = Depends(get_read_db),
+):
+    bounds = [network_bounds(parse_network(value)) for value in cidr]
+    if start or end:
+        if not (start and end):
+            raise HTTPException(status_code=400, detail="start and end must be given together")
+        bounds.append(parse_range(start, end))
+    if not bounds:
+        raise HTTPException(status_code=400, detail="cidr or start/end is required")
+
+    # 结果按 IP 数值排序，游标为上一页最后一个 (ip_version, ip_key)
+    names = parse_fields(Asset, fields)
+    stmt = select(*columns(Asset, names), Asset.ip_version, Asset.ip_key).where(ranges_clause(bounds))
+    if cursor:
+        stmt = stmt.where(after_clause(decode_cursor(cursor, "ip", str)))
+    rows = db.execute(stmt.order_by(Asset.ip_version, Asset.ip_key).limit(limit + 1)).all()
+    rows, next_cursor = split_page(rows, limit, "ip", id_of=cursor_value)
+    response = ORJSONResponse(rows_to_dicts(rows, names))
+    set_next_headers(request, response, next_cursor)
+    return response
 
 
-@app.get("/api/assets", dependencies=[Depends(require_login)])
-def list_assets(db: Session = Depends(get_db)):
-    assets = db.execute(select(Asset).order_by(Asset.id.desc())).scalars().all()
-    return [_asset_to_dict(a) for a in assets]
+@app.get("/api/subnets/usage", dependencies=[Depends(require_login)])
+def subnets_usage(
+    cidr: List[str] = Query(..., min_length=1),
+    split: Optional[int] = Query(None, ge=0, le=128),
+    db: Session = Depends(get_read_db),
+):
+    return [subnet_usage(db, parse_network(value), split) for value in cidr]
+
+
+@app.post("/api/assets/bulk", dependencies=[Depends(require_login)])
+async def bulk_import_assets(
+    request: Request,
+    on_conflict: str = Query("update", pattern="^(update|skip)$"),
+    report: str = Query("full", pattern="^(full|errors)$"),
+    db: Session = Depends(get_db),
+):
+    importer = AssetImporter(db, on_conflict=on_conflict)
+    results = []
+
+    async def flush(batch):
+        rows = await run_in_threadpool(importer.import_batch, batch)
+        results.extend(r for r in rows if report == "full" or r["status"] == "error")
+
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        # NDJSON 边接收边入库，不需要把整个请求体读入内存
+        batch, pending, line = [], b"", 1
+        async for chunk in request.stream():
+            *lines, pending = (pending + chunk).split(b"\n")
+            batch.extend(iter_ndjson_lines(lines, line))
+            line += len(lines)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush(batch)
+                batch = []
+        batch.extend(iter_ndjson_lines([pending], line))
+        if batch:
+            await flush(batch)
+    else:
+        try:
+            rows = json.loads(await request.body())
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="invalid JSON body")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="expected a JSON array of assets")
+        for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+            await flush(rows[start : start + IMPORT_BATCH_SIZE])
+
+    return {"summary": importer.summary, "results": results}
 
 
 @app.put("/api/assets/{asset_id}", dependencies=[Depends(require_login)])
@@ -335,7 +512,7 @@ def update_asset(asset_id: int, payload: AssetUpdate, db: Session = Depends(get_
         setattr(asset, key, value)
     db.commit()
     db.refresh(asset)
-    return _asset_to_dict(asset)
+    return asset_to_dict(asset)
 
 
 @app.delete("/api/assets/{asset_id}", dependencies=[Depends(require_login)])
@@ -348,10 +525,37 @@ def delete_asset_api(asset_id: int, db: Session = Depends(get_db)):
     return {"deleted": True}
 
 
+@app.patch("/api/assets", dependencies=[Depends(require_login)])
+def batch_update_assets(payload: AssetBatchUpdate, db: Session = Depends(get_db)):
+    clause = target_clause(Asset, payload.ids, payload.filter and payload.filter.model_dump())
+    return {"updated": batch_update(db, Asset, clause, payload.values.model_dump(exclude_unset=True))}
+
+
+@app.post("/api/assets/batch-delete", dependencies=[Depends(require_login)])
+def batch_delete_assets(payload: AssetBatchDelete, db: Session = Depends(get_db)):
+    clause = target_clause(Asset, payload.ids, payload.filter and payload.filter.model_dump())
+    return {"deleted": batch_delete(db, Asset, clause)}
+
+
 @app.get("/api/services", dependencies=[Depends(require_login)])
-def list_services(db: Session = Depends(get_db)):
-    services = db.execute(select(Service).order_by(Service.id.desc())).scalars().all()
-    return [_service_to_dict(s) for s in services]
+def list_services(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    asset_id: Optional[int] = None,
+    status: Optional[str] = None,
+    owner: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，如 id,name,status"),
+    db: Session = Depends(get_read_db),
+):
+    names = parse_fields(Service, fields)
+    stmt = apply_filters(select(*columns(Service, names)), Service, asset_id=asset_id, status=status, owner=owner)
+    rows = db.execute(keyset(stmt, Service.id, limit, cursor, order)).all()
+    rows, next_cursor = split_page(rows, limit, order)
+    response = ORJSONResponse(rows_to_dicts(rows, names))
+    set_next_headers(request, response, next_cursor)
+    return response
 
 
 @app.put("/api/services/{service_id}", dependencies=[Depends(require_login)])
@@ -368,13 +572,68 @@ def update_service(service_id: int, payload: ServiceUpdate, db: Session = Depend
         setattr(service, key, value)
     db.commit()
     db.refresh(service)
-    return _service_to_dict(service)
+    return service_to_dict(service)
+
+
+@app.patch("/api/services", dependencies=[Depends(require_login)])
+def batch_update_services(payload: ServiceBatchUpdate, db: Session = Depends(get_db)):
+    clause = target_clause(Service, payload.ids, payload.filter and payload.filter.model_dump())
+    return {"updated": batch_update(db, Service, clause, payload.values.model_dump(exclude_unset=True))}
+
+
+@app.post("/api/services/batch-delete", dependencies=[Depends(require_login)])
+def batch_delete_services(payload: ServiceBatchDelete, db: Session = Depends(get_db)):
+    clause = target_clause(Service, payload.ids, payload.filter and payload.filter.model_dump())
+    return {"deleted": batch_delete(db, Service, clause)}
 
 
 @app.get("/api/changes", dependencies=[Depends(require_login)])
-def list_changes(db: Session = Depends(get_db)):
-    changes = db.execute(select(ChangeRecord).order_by(ChangeRecord.id.desc())).scalars().all()
-    return [_change_to_dict(c) for c in changes]
+def list_changes(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    service_id: Optional[int] = None,
+    status: Optional[str] = None,
+    risk_level: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，如 id,title,status"),
+    db: Session = Depends(get_read_db),
+):
+    names = parse_fields(ChangeRecord, fields)
+    stmt = apply_filters(select(*columns(ChangeRecord, names)), ChangeRecord, service_id=service_id, status=status, risk_level=risk_level)
+    rows = db.execute(keyset(stmt, ChangeRecord.id, limit, cursor, order)).all()
+    rows, next_cursor = split_page(rows, limit, order)
+    response = ORJSONResponse(rows_to_dicts(rows, names))
+    set_next_headers(request, response, next_cursor)
+    return response
+
+
+@app.get("/api/changes/scheduled", dependencies=[Depends(require_login)])
+def list_scheduled_changes(
+    request: Request,
+    start: Optional[datetime] = Query(None, description="默认当前时间（UTC）"),
+    end: Optional[datetime] = Query(None, description="默认 start 之后 24 小时"),
+    service_id: Optional[int] = None,
+    status: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，如 id,title,window_start"),
+    db: Session = Depends(get_read_db),
+):
+    # 与 [start, end) 有重叠的变更窗口，按开始时间排序
+    start = to_utc(start) or datetime.utcnow()
+    end = to_utc(end) or start + timedelta(hours=24)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    names = parse_fields(ChangeRecord, fields)
+    after = decode_cursor(cursor, "window", str) if cursor else None
+    stmt = select(*columns(ChangeRecord, names), ChangeRecord.window_start).where(scheduled_clause(start, end, after))
+    stmt = apply_filters(stmt, ChangeRecord, service_id=service_id, status=status)
+    rows = db.execute(stmt.order_by(ChangeRecord.window_start, ChangeRecord.id).limit(limit + 1)).all()
+    rows, next_cursor = split_page(rows, limit, "window", id_of=window_cursor)
+    response = ORJSONResponse(rows_to_dicts(rows, names))
+    set_next_headers(request, response, next_cursor)
+    return response
 
 
 @app.put("/api/changes/{change_id}", dependencies=[Depends(require_login)])
@@ -386,9 +645,382 @@ def update_change(change_id: int, payload: ChangeUpdate, db: Session = Depends(g
     updates = payload.model_dump(exclude_unset=True)
     if "service_id" in updates and not db.get(Service, updates["service_id"]):
         raise HTTPException(status_code=404, detail="service not found")
+    updates.update(merge_window(db, change, updates))
 
     for key, value in updates.items():
         setattr(change, key, value)
     db.commit()
     db.refresh(change)
-    return _change_to_dict(change)
+    return change_to_dict(change)
+
+
+@app.patch("/api/changes", dependencies=[Depends(require_login)])
+def batch_update_changes(payload: ChangeBatchUpdate, db: Session = Depends(get_db)):
+    clause = target_clause(ChangeRecord, payload.ids, payload.filter and payload.filter.model_dump())
+    return {"updated": batch_update(db, ChangeRecord, clause, payload.values.model_dump(exclude_unset=True))}
+
+
+@app.post("/api/changes/batch-delete", dependencies=[Depends(require_login)])
+def batch_delete_changes(payload: ChangeBatchDelete, db: Session = Depends(get_db)):
+    clause = target_clause(ChangeRecord, payload.ids, payload.filter and payload.filter.model_dump())
+    return {"deleted": batch_delete(db, ChangeRecord, clause)}
+
+
+@app.get("/api/export/{entity}", dependencies=[Depends(require_login)])
+def export_entity(
+    entity: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+):
+    if entity not in EXPORT_ENTITIES:
+        raise HTTPException(status_code=404, detail="unknown export entity")
+
+    filename = f"cmdb-{entity}-{datetime.utcnow():%Y%m%d%H%M%S}.{format}"
+    media_type = MEDIA_TYPES[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        export_stream(entity, format, gzip, session_factory=read_session),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _cached_json(request: Request, body: bytes, etag: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/inventory/ansible", dependencies=[Depends(require_login)])
+def inventory_ansible(request: Request, environment: Optional[str] = None, db: Session = Depends(get_db)):
+    body, etag = inventory_cache.render(db, ("ansible", environment), lambda inventory: inventory.ansible(environment))
+    return _cached_json(request, body, etag)
+
+
+@app.get("/api/inventory/prometheus", dependencies=[Depends(require_login)])
+def inventory_prometheus(
+    request: Request,
+    port: int = Query(9100, ge=1, le=65535),
+    environment: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    body, etag = inventory_cache.render(db, ("prometheus", port, environment), lambda inventory: inventory.prometheus(port, environment))
+    return _cached_json(request, body, etag)
+
+
+@app.get("/api/sync", dependencies=[Depends(require_login)])
+def api_sync(
+    since: Optional[str] = None,
+    entity: List[str] = Query([name for name, _, _ in SYNC_ENTITIES]),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE * 10),
+    db: Session = Depends(get_db),
+):
+    unknown = set(entity) - {name for name, _, _ in SYNC_ENTITIES}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown entity: {', '.join(sorted(unknown))}")
+    return changes_since(db, since, entity, limit)
+
+
+@app.post("/api/jobs", status_code=202, dependencies=[Depends(require_login)])
+def create_job(payload: JobCreate, db: Session = Depends(get_db)):
+    job = job_runner.submit(db, payload.kind, validate_params(payload.kind, payload.params))
+    return ORJSONResponse(job_to_dict(job), status_code=202, headers={"Location": f"/api/jobs/{job.id}"})
+
+
+@app.get("/api/jobs", dependencies=[Depends(require_login)])
+def list_jobs(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    kind: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    stmt = apply_filters(select(Job), Job, status=status, kind=kind)
+    jobs = db.scalars(keyset(stmt, Job.id, limit, cursor, "desc")).all()
+    jobs, next_cursor = split_page(jobs, limit, "desc")
+    response = ORJSONResponse([job_to_dict(j) for j in jobs])
+    set_next_headers(request, response, next_cursor)
+    return response
+
+
+@app.get("/api/jobs/{job_id}", dependencies=[Depends(require_login)])
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job_to_dict(job)
+
+
+@app.get("/api/jobs/{job_id}/download", dependencies=[Depends(require_login)])
+def download_job_result(job_id: int, db: Session = Depends(get_db)):
+    job = db.get(Job, job_id)
+    if not job or job.kind != "export":
+        raise HTTPException(status_code=404, detail="export job not found")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"job is {job.status}")
+    name = json.loads(job.result)["file"]
+    path = JOB_EXPORT_DIR / name
+    if not path.exists():
+        raise HTTPException(status_code=410, detail="export file has been removed")
+    params = json.loads(job.params)
+    media_type = "application/gzip" if params["gzip"] else MEDIA_TYPES[params["format"]]
+    return FileResponse(path, media_type=media_type, filename=name)
+
+
+@app.post("/api/heartbeats", status_code=202, dependencies=[Depends(require_permission("heartbeat"))])
+async def ingest_heartbeats(reports: List[HeartbeatReport] = Body(..., max_length=HEARTBEAT_MAX_REPORTS)):
+    # 只写入内存缓冲区，由刷写线程合并后批量落库
+    return {"accepted": heartbeat_buffer.add(reports)}
+
+
+@app.get("/api/heartbeats/stale", dependencies=[Depends(require_login)])
+def list_stale_hosts(
+    request: Request,
+    seconds: Optional[float] = Query(None, gt=0, description="默认 上报间隔 × 允许丢失次数"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    # 超时未上报的主机（从未上报过的不在其中）
+    cutoff = datetime.utcnow() - (timedelta(seconds=seconds) if seconds else STALE_AFTER)
+    stmt = select(Asset.id, Asset.hostname, Asset.ip, Asset.status, Asset.last_seen_at).where(Asset.last_seen_at < cutoff)
+    rows = db.execute(keyset(stmt, Asset.id, limit, cursor, "desc")).all()
+    rows, next_cursor = split_page(rows, limit, "desc")
+    response = ORJSONResponse([row._asdict() for row in rows])
+    set_next_headers(request, response, next_cursor)
+    return response
+
+
+def history_entity(entity: str):
+    if entity not in HISTORY_ENTITIES:
+        raise HTTPException(status_code=404, detail="unknown entity")
+    return entity
+
+
+@app.get("/api/history/{entity}/{ref_id}", dependencies=[Depends(require_login)])
+def list_history(
+    request: Request,
+    entity: str,
+    ref_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    stmt = select(History).where(History.entity == history_entity(entity), History.ref_id == ref_id)
+    entries = db.scalars(keyset(stmt, History.id, limit, cursor, "desc")).all()
+    entries, next_cursor = split_page(entries, limit, "desc")
+    response = ORJSONResponse([entry_to_dict(e) for e in entries])
+    set_next_headers(request, response, next_cursor)
+    return response
+
+
+@app.get("/api/history/{entity}/{ref_id}/as-of", dependencies=[Depends(require_login)])
+def get_as_of(entity: str, ref_id: int, at: datetime = Query(..., description="时间点（UTC）"), db: Session = Depends(get_read_db)):
+    state = as_of(db, history_entity(entity), ref_id, to_utc(at))
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"{entity} {ref_id} did not exist at {at.isoformat()}")
+    return state
+
+
+@app.get("/api/trash", dependencies=[Depends(require_login)])
+def list_trash(
+    request: Request,
+    entity: str = "assets",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    entries = db.scalars(keyset(trash_query(history_entity(entity)), History.id, limit, cursor, "desc")).all()
+    entries, next_cursor = split_page(entries, limit, "desc")
+    response = ORJSONResponse([entry_to_dict(e) for e in entries])
+    set_next_headers(request, response, next_cursor)
+    return response
+
+
+@app.post("/api/trash/{history_id}/restore", dependencies=[Depends(require_login)])
+def restore_from_trash(history_id: int, db: Session = Depends(get_db)):
+    return {"restored": restore(db, history_id)}
+
+
+@app.get("/api/events", dependencies=[Depends(require_login)])
+async def api_events(
+    request: Request,
+    entity: List[str] = Query(list(EVENT_ENTITIES)),
+    status: Optional[str] = None,
+    since: Optional[int] = Query(None, ge=0),
+):
+    unknown = set(entity) - set(EVENT_ENTITIES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown entity: {', '.join(sorted(unknown))}")
+    # EventSource 断线重连时自动携带 Last-Event-ID
+    last_event_id = request.headers.get("last-event-id", "")
+    if since is None and last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(
+        stream_events(set(entity), status=status, since=since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/search", dependencies=[Depends(require_login)])
+def api_search(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1),
+    kind: List[str] = Query(list(SEARCH_ENTITIES)),
+    limit: int = Query(20, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    unknown = set(kind) - set(SEARCH_ENTITIES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown search kind: {', '.join(sorted(unknown))}")
+
+    offset = decode_cursor(cursor, "rank") if cursor else 0
+    hits = search(db, q.strip(), kind, limit + 1, offset)
+    next_cursor = encode_cursor(offset + limit, "rank") if len(hits) > limit else None
+    set_next_headers(request, response, next_cursor)
+    return hits[:limit]
+
+
+@app.get("/api/topology", dependencies=[Depends(require_login)])
+def api_topology(
+    environment: Optional[str] = None,
+    owner: Optional[str] = None,
+    root: Optional[str] = Query(None, pattern=r"^(asset|service|change):\d+$"),
+    depth: int = Query(2, ge=0, le=10),
+    include_changes: bool = True,
+    db: Session = Depends(get_db),
+):
+    graph = topology_cache.get(db)
+    if root is not None and root not in graph.nodes:
+        raise HTTPException(status_code=404, detail="root node not found")
+    keys = select_nodes(graph, environment=environment, owner=owner, root=root, depth=depth)
+    # 节点只含 JSON 原生类型，直接序列化，跳过 jsonable_encoder 的逐字段遍历
+    return ORJSONResponse(graph.subgraph(keys, include_changes=include_changes))
+
+
+@app.get("/api/me", dependencies=[Depends(require_login)])
+def api_me(db: Session = Depends(get_db)):
+    principal = current_principal.get()
+    user = db.get(User, principal.user_id)
+    return {**user_to_dict(user), "permissions": sorted(current_permissions())}
+
+
+def _check_role(db: Session, name: str):
+    # 只能授予自己已有的权限，管理员不能把账号提升为超级管理员
+    role = db.execute(select(Role).where(Role.name == name)).scalar_one_or_none()
+    if role is None:
+        raise HTTPException(status_code=400, detail=f"unknown role: {name}")
+    if not parse_permissions(role.permissions) <= current_permissions():
+        raise HTTPException(status_code=403, detail=f"cannot grant role {name}")
+
+
+def _tenant_user(db: Session, user_id: int) -> User:
+    user = db.get(User, user_id)
+    if user is None or user.tenant_id != current_principal.get().tenant_id:
+        raise HTTPException(status_code=404, detail="user not found")
+    return user
+
+
+@app.get("/api/users", dependencies=[Depends(require_permission("users"))])
+def list_users(db: Session = Depends(get_db)):
+    users = db.scalars(select(User).where(User.tenant_id == current_principal.get().tenant_id).order_by(User.id))
+    return [user_to_dict(u) for u in users]
+
+
+@app.post("/api/users", status_code=201, dependencies=[Depends(require_permission("users"))])
+def create_user(payload: UserCreate, db: Session = Depends(get_db)):
+    tenant_id = payload.tenant_id or current_principal.get().tenant_id
+    if tenant_id != current_principal.get().tenant_id:
+        if "tenants" not in current_permissions():
+            raise HTTPException(status_code=403, detail="permission 'tenants' required")
+        if db.get(Tenant, tenant_id) is None:
+            raise HTTPException(status_code=404, detail="tenant not found")
+    _check_role(db, payload.role)
+    if db.execute(select(User.id).where(User.username == payload.username)).first():
+        raise HTTPException(status_code=400, detail="username already exists")
+    user = User(username=payload.username, password_hash=hash_password(payload.password), tenant_id=tenant_id, role=payload.role)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user_to_dict(user)
+
+
+@app.put("/api/users/{user_id}", dependencies=[Depends(require_permission("users"))])
+def update_user(user_id: int, payload: UserUpdate, db: Session = Depends(get_db)):
+    user = _tenant_user(db, user_id)
+    updates = payload.model_dump(exclude_unset=True)
+    if "role" in updates:
+        _check_role(db, updates["role"])
+    if "password" in updates:
+        updates["password_hash"] = hash_password(updates.pop("password"))
+    for key, value in updates.items():
+        setattr(user, key, value)
+    user.updated_at = datetime.utcnow()
+    # 提交后本进程的权限缓存立即失效，其他进程在 PERMISSION_CACHE_TTL 内生效
+    db.commit()
+    db.refresh(user)
+    return user_to_dict(user)
+
+
+@app.get("/api/roles", dependencies=[Depends(require_login)])
+def list_roles(db: Session = Depends(get_db)):
+    return [role_to_dict(r) for r in db.scalars(select(Role).order_by(Role.name))]
+
+
+@app.put("/api/roles/{name}", dependencies=[Depends(require_permission("tenants"))])
+def update_role(name: str, payload: RoleUpdate, db: Session = Depends(get_db)):
+    # 角色为全局定义，影响所有租户，只有超级管理员可以修改
+    unknown = set(payload.permissions) - set(PERMISSIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown permission: {', '.join(sorted(unknown))}")
+    if name == "superadmin":
+        raise HTTPException(status_code=400, detail="superadmin role cannot be changed")
+    role = db.execute(select(Role).where(Role.name == name)).scalar_one_or_none()
+    if role is None:
+        role = Role(name=name)
+        db.add(role)
+    role.permissions = ",".join(p for p in PERMISSIONS if p in payload.permissions)
+    role.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(role)
+    return role_to_dict(role)
+
+
+@app.get("/api/tenants", dependencies=[Depends(require_permission("tenants"))])
+def list_tenants(db: Session = Depends(get_db)):
+    return [{"id": t.id, "name": t.name, "created_at": t.created_at} for t in db.scalars(select(Tenant).order_by(Tenant.id))]
+
+
+@app.post("/api/tenants", status_code=201, dependencies=[Depends(require_permission("tenants"))])
+def create_tenant(payload: TenantCreate, db: Session = Depends(get_db)):
+    if db.execute(select(Tenant.id).where(Tenant.name == payload.name)).first():
+        raise HTTPException(status_code=400, detail="tenant already exists")
+    tenant = Tenant(name=payload.name)
+    db.add(tenant)
+    db.commit()
+    db.refresh(tenant)
+    return {"id": tenant.id, "name": tenant.name, "created_at": tenant.created_at}
+
+
+def use_async_api():
+    # 用 api_async 中的异步实现替换同路径、同方法的同步接口
+    from .api_async import router as async_router
+
+    replaced = {(route.path, method) for route in async_router.routes for method in route.methods}
+    app.router.routes = [
+        route
+        for route in app.router.routes
+        if not (isinstance(route, APIRoute) and any((route.path, method) in replaced for method in route.methods))
+    ]
+    app.include_router(async_router)
+
+
+if DB_ASYNC:
+    use_async_api()
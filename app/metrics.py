@@ -0,0 +1,200 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence
+
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+
+from .db import pool_status, query_totals, request_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+PHASES = ("sql", "serialize", "template")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.series: Dict[tuple, float] = {}
+
+    def inc(self, labels: tuple, amount: float = 1.0):
+        self.series[labels] = self.series.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # labels -> [每个桶的计数..., sum, count]
+        self.series: Dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float):
+        state = self.series.get(labels)
+        if state is None:
+            state = self.series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[i] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        bucket_names = self.label_names + ("le",)
+        for labels, state in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, state):
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_names, labels + (bound,))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(bucket_names, labels + ('+Inf',))} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter("cmdb_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+        self.latency = Histogram("cmdb_http_request_duration_seconds", "HTTP request latency.", ("method", "route"), LATENCY_BUCKETS)
+        self.queries = Histogram("cmdb_db_queries_per_request", "SQL statements executed per request.", ("method", "route"), QUERY_BUCKETS)
+        self.phases = Counter("cmdb_request_phase_seconds_total", "Time spent per request phase.", ("method", "route", "phase"))
+        self.heartbeats = Counter("cmdb_heartbeat_reports_total", "Heartbeat reports by outcome.", ("outcome",))
+        self.heartbeat_writes = Counter("cmdb_heartbeat_rows_written_total", "Rows written by heartbeat flushes and staleness sweeps.", ("kind",))
+        self.heartbeat_flush = Histogram("cmdb_heartbeat_flush_duration_seconds", "Heartbeat buffer flush latency.", (), LATENCY_BUCKETS)
+        self.response_bytes = Counter("cmdb_http_response_bytes_total", "Compressible response body bytes before and after encoding.", ("stage",))
+        self._gauges: Dict[str, tuple] = {}
+
+    def inc(self, counter: Counter, labels: tuple, amount: float = 1.0):
+        with self._lock:
+            counter.inc(labels, amount)
+
+    def observe_value(self, histogram: Histogram, labels: tuple, value: float):
+        with self._lock:
+            histogram.observe(labels, value)
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]):
+        self._gauges[name] = (help_text, read)
+
+    def observe(self, method: str, route: str, status: int, elapsed: float, stats: dict):
+        with self._lock:
+            self.requests.inc((method, route, str(status)))
+            self.latency.observe((method, route), elapsed)
+            self.queries.observe((method, route), stats["queries"])
+            for phase in PHASES:
+                if stats[phase]:
+                    self.phases.inc((method, route, phase), stats[phase])
+
+    def render(self) -> str:
+        with self._lock:
+            lines = self.requests.render() + self.latency.render() + self.queries.render() + self.phases.render()
+            lines += self.heartbeats.render() + self.heartbeat_writes.render() + self.heartbeat_flush.render()
+            lines += self.response_bytes.render()
+        for name, (help_text, read) in self._gauges.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {_format_value(read())}"]
+        totals = query_totals()
+        lines += [
+            "# HELP cmdb_db_queries_total SQL statements executed.",
+            "# TYPE cmdb_db_queries_total counter",
+            f"cmdb_db_queries_total {totals['queries']}",
+            "# HELP cmdb_db_slow_queries_total SQL statements slower than SLOW_QUERY_MS.",
+            "# TYPE cmdb_db_slow_queries_total counter",
+            f"cmdb_db_slow_queries_total {totals['slow_queries']}",
+        ]
+        pool = pool_status()
+        for key in ("size", "checkedout", "overflow"):
+            if key in pool:
+                lines += [f"# TYPE cmdb_db_pool_{key} gauge", f"cmdb_db_pool_{key} {pool[key]}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def _new_stats() -> dict:
+    return {"queries": 0, **{phase: 0.0 for phase in PHASES}}
+
+
+@contextmanager
+def phase(name: str):
+    stats = request_stats.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats[name] += time.perf_counter() - started
+
+
+class ORJSONResponse(_ORJSONResponse):
+    # 与 fastapi 的 ORJSONResponse 相同，额外把序列化耗时计入当前请求
+    def render(self, content) -> bytes:
+        with phase("serialize"):
+            return super().render(content)
+
+
+def instrument_templates(templates):
+    template_response = templates.TemplateResponse
+
+    def timed_template_response(*args, **kwargs):
+        with phase("template"):
+            return template_response(*args, **kwargs)
+
+    templates.TemplateResponse = timed_template_response
+
+
+def _route_label(scope) -> str:
+    # 用路由模板而不是原始路径做标签，避免 /api/assets/123 之类的高基数
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    return "/static" if scope["path"].startswith("/static/") else "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = _new_stats()
+        token = request_stats.set(stats)
+        status: List[int] = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stats.reset(token)
+            registry.observe(scope["method"], _route_label(scope), status[0], time.perf_counter() - started, stats)
+
@@ -0,0 +1,130 @@
+from sqlalchemy import bindparam, func, insert, inspect, select, text, update
+from sqlalchemy.engine import Engine
+
+from . import search
+from .auth import BUILTIN_ROLES, DEFAULT_PASSWORD, DEFAULT_USERNAME, hash_password
+from .db import DEFAULT_TENANT_ID, Base, env_bool
+from .models import Asset, Role, SyncCounter, Tenant, User
+from .network import ip_fields
+from .sync import VERSIONED
+
+BACKFILL_BATCH_SIZE = 1000
+# 应用启动时自动执行迁移；多 worker / 多实例部署应关闭，改为发布前单独执行
+AUTO_MIGRATE = env_bool("AUTO_MIGRATE", "true")
+# 引入租户后被以 tenant_id 开头的复合索引取代
+OBSOLETE_INDEXES = {
+    "assets": ("ix_assets_ip_numeric", "ix_assets_row_version", "ix_assets_environment_status", "ix_assets_status", "ix_assets_owner"),
+    "services": ("ix_services_row_version", "ix_services_status", "ix_services_owner"),
+    "changes": ("ix_changes_row_version", "ix_changes_status", "ix_changes_risk_level", "ix_changes_window"),
+    "tombstones": ("ix_tombstones_row_version",),
+    "history": ("ix_history_trash",),
+}
+
+
+def _add_missing_columns(engine: Engine):
+    # create_all 不会修改已存在的表，这里补齐新增字段（只追加可空列或带默认值的列）
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                conn.execute(text(ddl))
+
+
+def _create_missing_indexes(engine: Engine):
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def _drop_obsolete_indexes(engine: Engine):
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, names in OBSOLETE_INDEXES.items():
+            existing = {index["name"] for index in inspector.get_indexes(table)}
+            for name in names:
+                if name in existing:
+                    conn.execute(text(f"DROP INDEX {name}"))
+
+
+def _seed_accounts(engine: Engine):
+    # 默认租户（已有数据迁移后归入其中）、内置角色与初始管理员；已存在的不覆盖
+    with engine.begin() as conn:
+        if conn.scalar(select(Tenant.id).where(Tenant.id == DEFAULT_TENANT_ID)) is None:
+            conn.execute(insert(Tenant).values(id=DEFAULT_TENANT_ID, name="default"))
+        existing = set(conn.scalars(select(Role.name)))
+        roles = [{"name": name, "permissions": ",".join(permissions)} for name, permissions in BUILTIN_ROLES.items() if name not in existing]
+        if roles:
+            conn.execute(insert(Role), roles)
+        if not conn.scalar(select(func.count()).select_from(User)):
+            conn.execute(
+                insert(User).values(
+                    username=DEFAULT_USERNAME,
+                    password_hash=hash_password(DEFAULT_PASSWORD),
+                    tenant_id=DEFAULT_TENANT_ID,
+                    role="superadmin",
+                )
+            )
+
+
+def _backfill_ip_fields(engine: Engine):
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(Asset.id, Asset.ip)
+                .where(Asset.id > last_id, Asset.ip_version.is_(None))
+                .order_by(Asset.id)
+                .limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not rows:
+                return
+            values = [{"_id": row.id, **ip_fields(row.ip)} for row in rows]
+            values = [v for v in values if v["ip_version"] is not None]
+            if values:
+                conn.execute(update(Asset.__table__).where(Asset.__table__.c.id == bindparam("_id")), values)
+            last_id = rows[-1].id
+
+
+def _backfill_row_versions(engine: Engine):
+    # 升级前已有的行统一记为一个版本，首次全量同步即可拿到
+    with engine.begin() as conn:
+        if conn.scalar(select(SyncCounter.version).where(SyncCounter.id == 1)) is None:
+            conn.execute(insert(SyncCounter).values(id=1, version=0))
+        if not any(conn.scalar(select(func.count()).where(model.row_version.is_(None))) for model in VERSIONED):
+            return
+        conn.execute(update(SyncCounter).where(SyncCounter.id == 1).values(version=SyncCounter.version + 1))
+        version = conn.scalar(select(SyncCounter.version).where(SyncCounter.id == 1))
+        for model in VERSIONED:
+            conn.execute(
+                update(model.__table__)
+                .where(model.__table__.c.row_version.is_(None))
+                .values(row_version=version, updated_at=model.__table__.c.created_at)
+            )
+
+
+def upgrade(engine: Engine):
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns(engine)
+    _create_missing_indexes(engine)
+    _drop_obsolete_indexes(engine)
+    _seed_accounts(engine)
+    _backfill_ip_fields(engine)
+    _backfill_row_versions(engine)
+    search.install(engine)
+    if engine.dialect.name == "sqlite":
+        # 新建索引后刷新统计信息，查询规划器才能在多个候选索引间正确选择
+        with engine.begin() as conn:
+            conn.execute(text("PRAGMA optimize"))
+
+
+if __name__ == "__main__":
+    from .db import engine
+
+    upgrade(engine)
@@ -1,14 +1,62 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import BigInteger, Boolean, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from .db import Base
+from .db import Base, tenant_default
 
 
-class Asset(Base):
+class TenantScoped:
+    # 按租户隔离的表：查询由 tenancy.py 统一追加 tenant_id 条件，写入默认取当前请求的租户；
+    # 已有数据迁移后归入默认租户
+    tenant_id: Mapped[int] = mapped_column(Integer, default=tenant_default, server_default="1")
+
+
+class Tenant(Base):
+    __tablename__ = "tenants"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class Role(Base):
+    # 角色为全局定义，permissions 为逗号分隔的权限名，见 auth.py
+    __tablename__ = "roles"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(50), unique=True)
+    permissions: Mapped[str] = mapped_column(String(300), default="")
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class User(Base):
+    __tablename__ = "users"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    username: Mapped[str] = mapped_column(String(100), unique=True)
+    password_hash: Mapped[str] = mapped_column(String(200))
+    tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id"), index=True)
+    role: Mapped[str] = mapped_column(String(50), default="viewer")
+    active: Mapped[bool] = mapped_column(Boolean, default=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class Asset(TenantScoped, Base):
     __tablename__ = "assets"
+    __table_args__ = (
+        # 请求内的查询都带 tenant_id 等值条件，复合索引以 tenant_id 开头
+        Index("ix_assets_tenant_ip_numeric", "tenant_id", "ip_version", "ip_key"),
+        Index("ix_assets_tenant_row_version", "tenant_id", "row_version", "id"),
+        # 列表筛选为等值条件 + ORDER BY id，复合索引末列放 id，翻页无需排序
+        Index("ix_assets_tenant_environment_status", "tenant_id", "environment", "status", "id"),
+        Index("ix_assets_tenant_status", "tenant_id", "status", "id"),
+        Index("ix_assets_tenant_owner", "tenant_id", "owner", "id"),
+        Index("ix_assets_tenant", "tenant_id", "id"),
+        Index("ix_assets_last_seen", "last_seen_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     hostname: Mapped[str] = mapped_column(String(100), unique=True, index=True)
@@ -19,12 +67,26 @@ class Asset(Base):
     status: Mapped[str] = mapped_column(String(30), default="active")
     note: Mapped[str] = mapped_column(Text, default="")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # 由 ip 归一化得到，见 network.py，用于 CIDR / 区间的索引范围扫描
+    ip_version: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    ip_key: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    # 每次写入取全局递增版本号，见 sync.py，用于增量同步
+    row_version: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # 最近一次心跳时间，见 heartbeat.py；按粒度合并写入，不打行版本号
+    last_seen_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     services: Mapped[List["Service"]] = relationship(back_populates="asset", cascade="all, delete-orphan")
 
 
-class Service(Base):
+class Service(TenantScoped, Base):
     __tablename__ = "services"
+    __table_args__ = (
+        Index("ix_services_tenant_row_version", "tenant_id", "row_version", "id"),
+        Index("ix_services_tenant_status", "tenant_id", "status", "id"),
+        Index("ix_services_tenant_owner", "tenant_id", "owner", "id"),
+        Index("ix_services_tenant", "tenant_id", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(100), unique=True, index=True)
@@ -35,23 +97,100 @@ class Service(Base):
     status: Mapped[str] = mapped_column(String(30), default="running")
     note: Mapped[str] = mapped_column(Text, default="")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    row_version: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     asset: Mapped[Asset] = relationship(back_populates="services")
     changes: Mapped[List["ChangeRecord"]] = relationship(back_populates="service", cascade="all, delete-orphan")
 
 
-class ChangeRecord(Base):
+class ChangeRecord(TenantScoped, Base):
     __tablename__ = "changes"
+    __table_args__ = (
+        Index("ix_changes_tenant_row_version", "tenant_id", "row_version", "id"),
+        Index("ix_changes_tenant_status", "tenant_id", "status", "id"),
+        Index("ix_changes_tenant_risk_level", "tenant_id", "risk_level", "id"),
+        Index("ix_changes_tenant", "tenant_id", "id"),
+        # 冲突检测按服务查窗口，时间段查询按开始时间范围扫描
+        Index("ix_changes_service_window", "service_id", "window_start"),
+        Index("ix_changes_tenant_window", "tenant_id", "window_start", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     title: Mapped[str] = mapped_column(String(150), index=True)
     service_id: Mapped[int] = mapped_column(ForeignKey("services.id", ondelete="CASCADE"), index=True)
     risk_level: Mapped[str] = mapped_column(String(20), default="medium")
     change_window: Mapped[str] = mapped_column(String(100), default="")
+    window_start: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    window_end: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     executor: Mapped[str] = mapped_column(String(100), default="")
     approver: Mapped[str] = mapped_column(String(100), default="")
     status: Mapped[str] = mapped_column(String(30), default="pending")
     rollback_plan: Mapped[str] = mapped_column(Text, default="")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    row_version: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     service: Mapped[Service] = relationship(back_populates="changes")
+
+
+class SyncCounter(Base):
+    # 单行计数器：写事务内自增并持有行锁到提交，版本号顺序即提交顺序
+    __tablename__ = "sync_counter"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
+class Tombstone(TenantScoped, Base):
+    __tablename__ = "tombstones"
+    __table_args__ = (Index("ix_tombstones_tenant_row_version", "tenant_id", "row_version", "id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    entity: Mapped[str] = mapped_column(String(30))
+    ref_id: Mapped[int] = mapped_column(Integer)
+    row_version: Mapped[int] = mapped_column(BigInteger)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class Job(TenantScoped, Base):
+    # 后台任务：参数与结果为 JSON 文本；queued -> running -> succeeded / failed
+    __tablename__ = "jobs"
+    # 领取任务不分租户，按 (status, id)；列表按租户
+    __table_args__ = (Index("ix_jobs_status", "status", "id"), Index("ix_jobs_tenant_status", "tenant_id", "status", "id"))
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(50))
+    status: Mapped[str] = mapped_column(String(20), default="queued")
+    params: Mapped[str] = mapped_column(Text, default="{}")
+    processed: Mapped[int] = mapped_column(Integer, default=0)
+    total: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    result: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # 执行中的任务由所在进程定期续租，超过 JOB_LEASE_SECONDS 未续租视为进程已退出
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class History(TenantScoped, Base):
+    # 只追加的变更历史：create / restore 为整行，update 为 {字段: [旧值, 新值]}，delete 为删除前整行；
+    # bucket 为年月（YYYYMM），按月整段清理，PostgreSQL 上可作为分区键
+    __tablename__ = "history"
+    __table_args__ = (
+        Index("ix_history_ref", "entity", "ref_id", "id"),
+        Index("ix_history_version", "version", "id"),
+        Index("ix_history_bucket", "bucket", "id"),
+        Index("ix_history_tenant_trash", "tenant_id", "action", "entity", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    entity: Mapped[str] = mapped_column(String(30))
+    ref_id: Mapped[int] = mapped_column(Integer)
+    action: Mapped[str] = mapped_column(String(10))
+    version: Mapped[int] = mapped_column(BigInteger)
+    bucket: Mapped[int] = mapped_column(Integer)
+    changed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    data: Mapped[str] = mapped_column(Text, default="{}")
@@ -0,0 +1,110 @@
+import ipaddress
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, event, func, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from .models import Asset
+
+# ip_key 为 32 位定长十六进制，字典序即数值序，IPv4 与 IPv6 用 ip_version 区分
+KEY_WIDTH = 32
+MAX_SUBNET_BREAKDOWN = 4096
+
+
+def ip_key(value: int) -> str:
+    return format(value, f"0{KEY_WIDTH}x")
+
+
+def ip_fields(ip: Optional[str]) -> Dict[str, Optional[object]]:
+    try:
+        address = ipaddress.ip_address((ip or "").strip())
+    except ValueError:
+        return {"ip_version": None, "ip_key": None}
+    return {"ip_version": address.version, "ip_key": ip_key(int(address))}
+
+
+@event.listens_for(Asset, "before_insert")
+@event.listens_for(Asset, "before_update")
+def _sync_ip_fields(mapper, connection, target: Asset):
+    fields = ip_fields(target.ip)
+    if target.ip_key != fields["ip_key"]:
+        target.ip_version = fields["ip_version"]
+        target.ip_key = fields["ip_key"]
+
+
+def parse_network(value: str):
+    try:
+        return ipaddress.ip_network(value.strip(), strict=False)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"invalid cidr: {value}")
+
+
+def parse_range(start: str, end: str) -> Tuple[int, int, int]:
+    try:
+        low, high = ipaddress.ip_address(start.strip()), ipaddress.ip_address(end.strip())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid ip range")
+    if low.version != high.version or int(low) > int(high):
+        raise HTTPException(status_code=400, detail="invalid ip range")
+    return low.version, int(low), int(high)
+
+
+def network_bounds(network) -> Tuple[int, int, int]:
+    return network.version, int(network.network_address), int(network.broadcast_address)
+
+
+def range_clause(version: int, low: int, high: int):
+    return and_(Asset.ip_version == version, Asset.ip_key.between(ip_key(low), ip_key(high)))
+
+
+def ranges_clause(bounds: Iterable[Tuple[int, int, int]]):
+    return or_(*(range_clause(*b) for b in bounds))
+
+
+def after_clause(cursor_value: str):
+    version, _, key = cursor_value.partition(":")
+    if version not in ("4", "6") or len(key) != KEY_WIDTH:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return tuple_(Asset.ip_version, Asset.ip_key) > tuple_(int(version), key)
+
+
+def cursor_value(asset) -> str:
+    return f"{asset.ip_version}:{asset.ip_key}"
+
+
+def subnet_usage(db: Session, network, split: Optional[int] = None) -> dict:
+    version, low, high = network_bounds(network)
+    used = db.scalar(select(func.count()).select_from(Asset).where(range_clause(version, low, high))) or 0
+    usage = {
+        "cidr": str(network),
+        "size": network.num_addresses,
+        "used": used,
+        "utilization": round(used / network.num_addresses, 6),
+    }
+    if split is None:
+        return usage
+    if split < network.prefixlen or split > network.max_prefixlen:
+        raise HTTPException(status_code=400, detail="split must be between the cidr prefix and the address length")
+
+    # 只读 ip_key 列做索引范围扫描，在内存中按子网前缀归并
+    shift = network.max_prefixlen - split
+    counts: Dict[int, int] = {}
+    keys = db.scalars(select(Asset.ip_key).where(range_clause(version, low, high)).order_by(Asset.ip_key))
+    for key in keys:
+        prefix = int(key, 16) >> shift
+        counts[prefix] = counts.get(prefix, 0) + 1
+        if len(counts) > MAX_SUBNET_BREAKDOWN:
+            raise HTTPException(status_code=400, detail="too many non-empty subnets, use a smaller split")
+    subnet_size = 1 << shift
+    network_class = ipaddress.IPv4Network if version == 4 else ipaddress.IPv6Network
+    usage["subnets"] = [
+        {
+            "cidr": str(network_class((prefix << shift, split))),
+            "size": subnet_size,
+            "used": count,
+            "utilization": round(count / subnet_size, 6),
+        }
+        for prefix, count in sorted(counts.items())
+    ]
+    return usage
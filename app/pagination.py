@@ -0,0 +1,56 @@
+import base64
+import binascii
+import json
+from typing import Any, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, Response
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(last_id, order: str) -> str:
+    raw = json.dumps({"id": last_id, "o": order}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, order: str, kind=int):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id, cursor_order = kind(data["id"]), data["o"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if cursor_order != order:
+        raise HTTPException(status_code=400, detail="cursor does not match order")
+    return last_id
+
+
+def keyset(stmt, id_column, limit: int, cursor: Optional[str], order: str = "desc"):
+    # 按主键做 keyset 翻页：WHERE id < :last ORDER BY id DESC LIMIT n+1，深翻页与首页代价相同
+    if cursor:
+        last_id = decode_cursor(cursor, order)
+        stmt = stmt.where(id_column < last_id if order == "desc" else id_column > last_id)
+    ordering = id_column.desc() if order == "desc" else id_column.asc()
+    return stmt.order_by(ordering).limit(limit + 1)
+
+
+def split_page(rows: Sequence[Any], limit: int, order: str, id_of=lambda row: row.id) -> Tuple[Sequence[Any], Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(id_of(rows[-1]), order)
+
+
+def apply_filters(stmt, model, **filters):
+    for name, value in filters.items():
+        if value is not None and value != "":
+            stmt = stmt.where(getattr(model, name) == value)
+    return stmt
+
+
+def set_next_headers(request: Request, response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
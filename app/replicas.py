@@ -0,0 +1,93 @@
+import itertools
+import os
+from http.cookies import CookieError, SimpleCookie
+from typing import List, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker
+
+from .db import SessionLocal, make_replica_engine, request_writes
+from .sync import current_version
+
+# 逗号分隔的只读副本连接串；为空时所有读请求走主库
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+# 写入后该时长内，读请求先确认副本已追上客户端最近一次写入的版本
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "30"))
+READ_YOUR_WRITES_COOKIE = "cmdb_rv"
+
+
+class ReplicaRouter:
+    # 读会话按轮询分配到副本；副本落后于 min_version 或不可用时回退主库
+    def __init__(self, urls: List[str]):
+        self.engines = [make_replica_engine(url) for url in urls]
+        self._sessions = [sessionmaker(bind=e, autoflush=False, autocommit=False, future=True) for e in self.engines]
+        self._next = itertools.cycle(self._sessions)
+
+    def __bool__(self) -> bool:
+        return bool(self._sessions)
+
+    def session(self, min_version: Optional[int] = None) -> Session:
+        if not self._sessions:
+            return SessionLocal()
+        db = next(self._next)()
+        try:
+            if min_version and current_version(db) < min_version:
+                db.close()
+                return SessionLocal()
+        except SQLAlchemyError:
+            db.close()
+            return SessionLocal()
+        return db
+
+
+replica_router = ReplicaRouter(REPLICA_DATABASE_URLS)
+
+
+def read_session() -> Session:
+    state = request_writes.get()
+    return replica_router.session(state["min_version"] if state else None)
+
+
+def get_read_db():
+    # 只读接口使用；依赖写后立即一致的缓存构建与增量同步仍使用 get_db
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _cookie_version(scope) -> Optional[int]:
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            try:
+                morsel = SimpleCookie(value.decode("latin-1")).get(READ_YOUR_WRITES_COOKIE)
+            except CookieError:
+                return None
+            if morsel is not None and morsel.value.isdigit():
+                return int(morsel.value)
+    return None
+
+
+class ReadYourWritesMiddleware:
+    # 请求内有写入提交时，把提交后的版本号写入 cookie；后续读请求凭它判断副本是否已追上
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not replica_router:
+            await self.app(scope, receive, send)
+            return
+        state = {"min_version": _cookie_version(scope), "version": None}
+        token = request_writes.set(state)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state["version"]:
+                cookie = f"{READ_YOUR_WRITES_COOKIE}={state['version']}; Max-Age={REPLICA_STICKY_SECONDS}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_writes.reset(token)
@@ -1,6 +1,9 @@
-from typing import Optional
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+MAX_BATCH_IDS = 10000
 
 
 class AssetCreate(BaseModel):
@@ -48,6 +51,8 @@ class ChangeCreate(BaseModel):
     service_id: int
     risk_level: str = "medium"
     change_window: str = ""
+    window_start: Optional[datetime] = None
+    window_end: Optional[datetime] = None
     executor: str = ""
     approver: str = ""
     status: str = "pending"
@@ -59,7 +64,157 @@ class ChangeUpdate(BaseModel):
     service_id: Optional[int] = None
     risk_level: Optional[str] = None
     change_window: Optional[str] = None
+    window_start: Optional[datetime] = None
+    window_end: Optional[datetime] = None
+    executor: Optional[str] = None
+    approver: Optional[str] = None
+    status: Optional[str] = None
+    rollback_plan: Optional[str] = None
+
+
+# 批量更新/删除：ids 与 filter 至少给出一个，同时给出时取交集；
+# filter 不接受未知字段，避免拼写错误把范围扩大到整表
+class AssetFilter(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    environment: Optional[str] = None
+    status: Optional[str] = None
+    owner: Optional[str] = None
+
+
+class ServiceFilter(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    asset_id: Optional[int] = None
+    status: Optional[str] = None
+    owner: Optional[str] = None
+
+
+class ChangeFilter(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    service_id: Optional[int] = None
+    status: Optional[str] = None
+    risk_level: Optional[str] = None
+
+
+# 唯一列（hostname、ip、name）不能批量设置为同一个值，不出现在批量更新字段中
+class AssetBatchValues(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    environment: Optional[str] = None
+    os: Optional[str] = None
+    owner: Optional[str] = None
+    status: Optional[str] = None
+    note: Optional[str] = None
+
+
+class ServiceBatchValues(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    asset_id: Optional[int] = None
+    repo_url: Optional[str] = None
+    deploy_method: Optional[str] = None
+    owner: Optional[str] = None
+    status: Optional[str] = None
+    note: Optional[str] = None
+
+
+# 变更窗口（含旧的文本窗口 change_window）不支持批量设置；批量修改服务或状态后逐条做冲突检测
+class ChangeBatchValues(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    title: Optional[str] = None
+    service_id: Optional[int] = None
+    risk_level: Optional[str] = None
     executor: Optional[str] = None
     approver: Optional[str] = None
     status: Optional[str] = None
     rollback_plan: Optional[str] = None
+
+
+class AssetBatchUpdate(BaseModel):
+    ids: Optional[List[int]] = Field(None, max_length=MAX_BATCH_IDS)
+    filter: Optional[AssetFilter] = None
+    values: AssetBatchValues
+
+
+class ServiceBatchUpdate(BaseModel):
+    ids: Optional[List[int]] = Field(None, max_length=MAX_BATCH_IDS)
+    filter: Optional[ServiceFilter] = None
+    values: ServiceBatchValues
+
+
+class ChangeBatchUpdate(BaseModel):
+    ids: Optional[List[int]] = Field(None, max_length=MAX_BATCH_IDS)
+    filter: Optional[ChangeFilter] = None
+    values: ChangeBatchValues
+
+
+class AssetBatchDelete(BaseModel):
+    ids: Optional[List[int]] = Field(None, max_length=MAX_BATCH_IDS)
+    filter: Optional[AssetFilter] = None
+
+
+class ServiceBatchDelete(BaseModel):
+    ids: Optional[List[int]] = Field(None, max_length=MAX_BATCH_IDS)
+    filter: Optional[ServiceFilter] = None
+
+
+class ChangeBatchDelete(BaseModel):
+    ids: Optional[List[int]] = Field(None, max_length=MAX_BATCH_IDS)
+    filter: Optional[ChangeFilter] = None
+
+
+class HeartbeatReport(BaseModel):
+    hostname: str = Field(min_length=1, max_length=100)
+    status: str = Field("active", min_length=1, max_length=30)
+    # 服务名 -> 状态，只更新属于该主机的服务
+    services: Dict[str, str] = Field(default_factory=dict)
+
+
+class JobCreate(BaseModel):
+    kind: Literal["batch_update", "batch_delete", "export", "import_assets"]
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+
+class ExportJobParams(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    entity: Literal["assets", "services", "changes"]
+    format: Literal["ndjson", "csv"] = "ndjson"
+    gzip: bool = False
+
+
+class ImportAssetsJobParams(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    rows: List[Any]
+    on_conflict: Literal["update", "skip"] = "update"
+
+
+class LoginRequest(BaseModel):
+    username: str = Field(min_length=1)
+    password: str = Field(min_length=1)
+
+
+class UserCreate(BaseModel):
+    username: str = Field(min_length=1, max_length=100)
+    password: str = Field(min_length=8)
+    role: str = "viewer"
+    # 只有具备 tenants 权限的账号可以在其他租户下创建用户
+    tenant_id: Optional[int] = None
+
+
+class UserUpdate(BaseModel):
+    password: Optional[str] = Field(None, min_length=8)
+    role: Optional[str] = None
+    active: Optional[bool] = None
+
+
+class RoleUpdate(BaseModel):
+    permissions: List[str]
+
+
+class TenantCreate(BaseModel):
+    name: str = Field(min_length=1, max_length=100)
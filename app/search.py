@@ -0,0 +1,183 @@
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Integer, column, or_, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .db import current_tenant
+from .models import Asset, ChangeRecord, Service
+
+# 每类实体参与检索的字段：title 权重高于 body
+SEARCH_ENTITIES = {
+    "asset": (Asset, "assets", 1, ("hostname", "ip"), ("owner", "note")),
+    "service": (Service, "services", 2, ("name",), ("repo_url", "owner", "note")),
+    "change": (ChangeRecord, "changes", 3, ("title",), ("rollback_plan", "executor")),
+}
+
+# trigram 分词器要求每个词至少 3 个字符，更短的查询退回 LIKE
+MIN_TERM_LENGTH = 3
+
+
+def _concat(prefix: str, fields) -> str:
+    return " || ' ' || ".join(f"coalesce({prefix}{name}, '')" for name in fields)
+
+
+def _sqlite_ddl() -> List[str]:
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index "
+        "USING fts5(kind UNINDEXED, ref_id UNINDEXED, tenant_id UNINDEXED, title, body, tokenize='trigram')"
+    ]
+    for kind, (_, table, code, title, body) in SEARCH_ENTITIES.items():
+        # rowid = id * 4 + code，更新和删除按 rowid 定位，不扫描索引表
+        insert = (
+            f"INSERT INTO search_index(rowid, kind, ref_id, tenant_id, title, body) "
+            f"VALUES (new.id * 4 + {code}, '{kind}', new.id, new.tenant_id, {_concat('new.', title)}, {_concat('new.', body)});"
+        )
+        delete = f"DELETE FROM search_index WHERE rowid = old.id * 4 + {code};"
+        columns = ", ".join(("tenant_id",) + title + body)
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_au AFTER UPDATE OF {columns} ON {table} BEGIN {delete} {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        ]
+    return statements
+
+
+def _sqlite_backfill() -> List[str]:
+    return [
+        f"INSERT INTO search_index(rowid, kind, ref_id, tenant_id, title, body) "
+        f"SELECT id * 4 + {code}, '{kind}', id, tenant_id, {_concat('', title)}, {_concat('', body)} FROM {table}"
+        for kind, (_, table, code, title, body) in SEARCH_ENTITIES.items()
+    ]
+
+
+def _postgres_ddl() -> List[str]:
+    statements = []
+    for _, (_, table, _, title, body) in SEARCH_ENTITIES.items():
+        statements += [
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_search_tsv ON {table} "
+            f"USING gin (to_tsvector('simple', {_concat('', title + body)}))",
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_search_trgm ON {table} USING gin (({_concat('', title)}) gin_trgm_ops)",
+        ]
+    return statements
+
+
+def install(engine: Engine):
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "sqlite":
+            ddl = conn.scalar(text("SELECT sql FROM sqlite_master WHERE name = 'search_index'"))
+            if ddl is not None and "tenant_id" not in ddl:
+                # 旧版索引没有租户列，连同触发器重建
+                conn.execute(text("DROP TABLE search_index"))
+                for _, table, _, _, _ in SEARCH_ENTITIES.values():
+                    for suffix in ("ai", "au", "ad"):
+                        conn.execute(text(f"DROP TRIGGER IF EXISTS search_{table}_{suffix}"))
+                ddl = None
+            for statement in _sqlite_ddl():
+                conn.execute(text(statement))
+            if ddl is None:
+                for statement in _sqlite_backfill():
+                    conn.execute(text(statement))
+        elif dialect == "postgresql":
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for statement in _postgres_ddl():
+                conn.execute(text(statement))
+
+
+def _fts_query(q: str) -> Optional[str]:
+    terms = q.split()
+    if not terms or any(len(term) < MIN_TERM_LENGTH for term in terms):
+        return None
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _like_clause(kind: str, q: str):
+    model, _, _, title, body = SEARCH_ENTITIES[kind]
+    pattern = f"%{q}%"
+    return or_(*(getattr(model, name).like(pattern) for name in title + body))
+
+
+def match_clause(db: Session, kind: str, q: str):
+    # 供列表查询拼接的 WHERE 条件：id 命中全文索引
+    model, table, _, title, body = SEARCH_ENTITIES[kind]
+    dialect = db.get_bind().dialect.name
+    fts_q = _fts_query(q)
+    if dialect == "sqlite" and fts_q:
+        matches = text("SELECT ref_id FROM search_index WHERE search_index MATCH :fts_q AND kind = :fts_kind").bindparams(
+            fts_q=fts_q, fts_kind=kind
+        )
+        return model.id.in_(matches.columns(column("ref_id", Integer)))
+    if dialect == "postgresql":
+        matches = text(
+            f"SELECT id FROM {table} WHERE to_tsvector('simple', {_concat('', title + body)}) @@ plainto_tsquery('simple', :ts_q) "
+            f"OR ({_concat('', title)}) ILIKE :ts_like"
+        ).bindparams(ts_q=q, ts_like=f"%{q}%")
+        return model.id.in_(matches.columns(column("id", Integer)))
+    return _like_clause(kind, q)
+
+
+def _tenant_filter() -> str:
+    # 原生 SQL 不经过 ORM 的租户过滤，排序分页前手动限定租户
+    return " AND tenant_id = :tenant_id" if current_tenant.get() is not None else ""
+
+
+def _ranked_sqlite(db: Session, fts_q: str, kinds: List[str], limit: int, offset: int) -> List[Tuple[str, int, float]]:
+    kind_filter = " AND kind IN ({})".format(", ".join(f"'{k}'" for k in kinds)) if len(kinds) < len(SEARCH_ENTITIES) else ""
+    rows = db.execute(
+        text(
+            "SELECT kind, ref_id, bm25(search_index, 0, 0, 0, 10.0, 1.0) AS score FROM search_index "
+            f"WHERE search_index MATCH :q{kind_filter}{_tenant_filter()} ORDER BY score LIMIT :limit OFFSET :offset"
+        ),
+        {"q": fts_q, "tenant_id": current_tenant.get(), "limit": limit, "offset": offset},
+    ).all()
+    # bm25 越小越相关，对外统一为越大越相关
+    return [(kind, ref_id, -score) for kind, ref_id, score in rows]
+
+
+def _ranked_postgres(db: Session, q: str, kinds: List[str], limit: int, offset: int) -> List[Tuple[str, int, float]]:
+    parts = []
+    for kind in kinds:
+        _, table, _, title, body = SEARCH_ENTITIES[kind]
+        vector = f"to_tsvector('simple', {_concat('', title + body)})"
+        parts.append(
+            f"SELECT '{kind}' AS kind, id AS ref_id, ts_rank({vector}, plainto_tsquery('simple', :q)) + similarity({_concat('', title)}, :q) AS score "
+            f"FROM {table} WHERE ({vector} @@ plainto_tsquery('simple', :q) OR ({_concat('', title)}) ILIKE :like){_tenant_filter()}"
+        )
+    sql = " UNION ALL ".join(parts) + " ORDER BY score DESC LIMIT :limit OFFSET :offset"
+    params = {"q": q, "like": f"%{q}%", "tenant_id": current_tenant.get(), "limit": limit, "offset": offset}
+    return [tuple(row) for row in db.execute(text(sql), params)]
+
+
+def _ranked_like(db: Session, q: str, kinds: List[str], limit: int, offset: int) -> List[Tuple[str, int, float]]:
+    hits = []
+    for kind in kinds:
+        model = SEARCH_ENTITIES[kind][0]
+        ids = db.scalars(select(model.id).where(_like_clause(kind, q)).order_by(model.id.desc()).limit(limit + offset)).all()
+        hits += [(kind, ref_id, 0.0) for ref_id in ids]
+    return hits[offset : offset + limit]
+
+
+def search(db: Session, q: str, kinds: List[str], limit: int, offset: int) -> List[dict]:
+    dialect = db.get_bind().dialect.name
+    fts_q = _fts_query(q)
+    if dialect == "sqlite" and fts_q:
+        hits = _ranked_sqlite(db, fts_q, kinds, limit, offset)
+    elif dialect == "postgresql":
+        hits = _ranked_postgres(db, q, kinds, limit, offset)
+    else:
+        hits = _ranked_like(db, q, kinds, limit, offset)
+
+    # 按实体类型各一次 IN 查询回填展示字段
+    records = {}
+    for kind in {kind for kind, _, _ in hits}:
+        model, _, _, title, body = SEARCH_ENTITIES[kind]
+        ids = [ref_id for k, ref_id, _ in hits if k == kind]
+        fields = ("id",) + title + body
+        for row in db.execute(select(*(getattr(model, name) for name in fields)).where(model.id.in_(ids))):
+            records[(kind, row.id)] = dict(zip(fields, row))
+    return [
+        {"kind": kind, "id": ref_id, "score": round(score, 4), "record": records[(kind, ref_id)]}
+        for kind, ref_id, score in hits
+        if (kind, ref_id) in records
+    ]
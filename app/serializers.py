@@ -0,0 +1,79 @@
+import json
+from typing import Iterable, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from .models import Asset, ChangeRecord, Job, Role, Service, User
+
+# 对外字段与顺序；列表接口只查询这些列，按行元组直接组装响应，不实例化 ORM 对象
+ASSET_FIELDS = ("id", "hostname", "ip", "environment", "os", "owner", "status", "note")
+SERVICE_FIELDS = ("id", "name", "asset_id", "repo_url", "deploy_method", "owner", "status", "note")
+CHANGE_FIELDS = ("id", "title", "service_id", "risk_level", "change_window", "window_start", "window_end", "executor", "approver", "status", "rollback_plan")
+
+FIELDS = {Asset: ASSET_FIELDS, Service: SERVICE_FIELDS, ChangeRecord: CHANGE_FIELDS}
+
+
+def parse_fields(model, fields: Optional[str]) -> Tuple[str, ...]:
+    allowed = FIELDS[model]
+    if not fields:
+        return allowed
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown fields: {', '.join(sorted(unknown))}")
+    # id 始终返回，keyset 游标依赖它
+    return tuple(name for name in allowed if name == "id" or name in requested)
+
+
+def columns(model, names: Sequence[str]):
+    return [getattr(model, name) for name in names]
+
+
+def rows_to_dicts(rows: Iterable, names: Sequence[str]):
+    return [dict(zip(names, row)) for row in rows]
+
+
+def asset_to_dict(a: Asset):
+    return {name: getattr(a, name) for name in ASSET_FIELDS}
+
+
+def service_to_dict(s: Service):
+    return {name: getattr(s, name) for name in SERVICE_FIELDS}
+
+
+def change_to_dict(c: ChangeRecord):
+    return {name: getattr(c, name) for name in CHANGE_FIELDS}
+
+
+def job_to_dict(j: Job):
+    progress = round(j.processed * 100 / j.total, 1) if j.total else (100.0 if j.status == "succeeded" else 0.0)
+    return {
+        "id": j.id,
+        "kind": j.kind,
+        "status": j.status,
+        "processed": j.processed,
+        "total": j.total,
+        "progress": progress,
+        "attempts": j.attempts,
+        "result": json.loads(j.result) if j.result else None,
+        "error": j.error,
+        "created_at": j.created_at,
+        "started_at": j.started_at,
+        "finished_at": j.finished_at,
+    }
+
+
+def user_to_dict(u: User):
+    return {
+        "id": u.id,
+        "username": u.username,
+        "tenant_id": u.tenant_id,
+        "role": u.role,
+        "active": u.active,
+        "created_at": u.created_at,
+        "updated_at": u.updated_at,
+    }
+
+
+def role_to_dict(r: Role):
+    return {"name": r.name, "permissions": sorted(name for name in r.permissions.split(",") if name), "updated_at": r.updated_at}
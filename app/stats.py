@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .hooks import WriteEvent
+from .models import Asset, ChangeRecord, Service
+from .tenancy import PerTenant
+
+OVERVIEW_CACHE_TTL = float(os.getenv("OVERVIEW_CACHE_TTL", "30"))
+
+
+class OverviewCache:
+    # 总览统计缓存：本进程的写入按事件增量更新，TTL 兜底其他进程或直接改库的写入
+    def __init__(self, ttl: float = OVERVIEW_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._counters: Optional[dict] = None
+        self._loaded_at = 0.0
+        self._payload: Optional[dict] = None
+        self._etag = ""
+
+    def _load(self, db: Session):
+        counters = {name: Counter() for name in ("asset_status", "asset_environment", "service_status", "change_status")}
+        for status, environment, count in db.execute(select(Asset.status, Asset.environment, func.count()).group_by(Asset.status, Asset.environment)):
+            counters["asset_status"][status] += count
+            counters["asset_environment"][environment] += count
+        counters["service_status"].update(dict(db.execute(select(Service.status, func.count()).group_by(Service.status)).all()))
+        counters["change_status"].update(dict(db.execute(select(ChangeRecord.status, func.count()).group_by(ChangeRecord.status)).all()))
+        self._counters = counters
+        self._loaded_at = time.monotonic()
+        self._render()
+
+    def _render(self):
+        counters = self._counters
+        payload = {
+            "asset_count": sum(counters["asset_status"].values()),
+            "service_count": sum(counters["service_status"].values()),
+            "change_count": sum(counters["change_status"].values()),
+            "pending_changes": counters["change_status"]["pending"],
+            "assets_by_status": {k: v for k, v in sorted(counters["asset_status"].items()) if v},
+            "assets_by_environment": {k: v for k, v in sorted(counters["asset_environment"].items()) if v},
+            "services_by_status": {k: v for k, v in sorted(counters["service_status"].items()) if v},
+            "changes_by_status": {k: v for k, v in sorted(counters["change_status"].items()) if v},
+        }
+        self._payload = payload
+        digest = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:20]
+        self._etag = f'"{digest}"'
+
+    def get(self, db: Session) -> Tuple[dict, str]:
+        with self._lock:
+            if self._counters is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._load(db)
+            return self._payload, self._etag
+
+    def invalidate(self):
+        with self._lock:
+            self._counters = None
+
+    def apply(self, events: List[WriteEvent]):
+        with self._lock:
+            if self._counters is None:
+                return
+            for event in events:
+                if event.action == "bulk":
+                    if event.table in ("assets", "services", "changes"):
+                        self._counters = None
+                        return
+                    continue
+                if event.table == "assets":
+                    self._move(event, ("asset_status", "status"), ("asset_environment", "environment"))
+                elif event.table == "services":
+                    self._move(event, ("service_status", "status"))
+                elif event.table == "changes":
+                    self._move(event, ("change_status", "status"))
+            self._render()
+
+    def _move(self, event: WriteEvent, *buckets):
+        for counter_name, column in buckets:
+            counter = self._counters[counter_name]
+            if event.action == "create":
+                counter[event.row[column]] += 1
+            elif event.action == "delete":
+                counter[event.row[column]] -= 1
+            elif column in event.old:
+                counter[event.old[column]] -= 1
+                counter[event.row[column]] += 1
+
+
+overview_cache = PerTenant(OverviewCache, "apply")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
@@ -0,0 +1,149 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, event, insert, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from .db import request_writes
+from .models import Asset, ChangeRecord, Service, SyncCounter, Tombstone
+from .serializers import ASSET_FIELDS, CHANGE_FIELDS, SERVICE_FIELDS
+from .tenancy import tenant_clause
+
+# 同步顺序：同一版本内依次输出资产、服务、变更，最后是删除记录
+SYNC_ENTITIES = (
+    ("assets", Asset, ASSET_FIELDS),
+    ("services", Service, SERVICE_FIELDS),
+    ("changes", ChangeRecord, CHANGE_FIELDS),
+)
+VERSIONED = tuple(model for _, model, _ in SYNC_ENTITIES)
+TOMBSTONE_STAGE = len(SYNC_ENTITIES)
+END_STAGE = TOMBSTONE_STAGE + 1
+
+
+def next_version(session: Session) -> int:
+    # 一个事务只取一次版本号；计数器行的写锁持有到提交，并发写事务按提交顺序拿到递增版本
+    version = session.info.get("row_version")
+    if version is None:
+        conn = session.connection()
+        conn.execute(update(SyncCounter).where(SyncCounter.id == 1).values(version=SyncCounter.version + 1))
+        version = conn.scalar(select(SyncCounter.version).where(SyncCounter.id == 1))
+        session.info["row_version"] = version
+    return version
+
+
+def current_version(db: Session) -> int:
+    return db.scalar(select(SyncCounter.version).where(SyncCounter.id == 1)) or 0
+
+
+def stamp(session: Session) -> dict:
+    return {"row_version": next_version(session), "updated_at": datetime.utcnow()}
+
+
+def insert_tombstones(session: Session, model, clause):
+    # 集合删除前按同一 WHERE 条件写入删除记录
+    version = next_version(session)
+    rows = select(literal(model.__tablename__), model.id, literal(version), literal(datetime.utcnow()), model.tenant_id).where(clause, tenant_clause(model))
+    session.execute(insert(Tombstone).from_select(["entity", "ref_id", "row_version", "deleted_at", "tenant_id"], rows))
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_versions(session: Session, flush_context, instances):
+    touched = [obj for obj in session.new if isinstance(obj, VERSIONED)]
+    touched += [obj for obj in session.dirty if isinstance(obj, VERSIONED) and session.is_modified(obj)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, VERSIONED)]
+    if not touched and not deleted:
+        return
+    values = stamp(session)
+    for obj in touched:
+        obj.row_version = values["row_version"]
+        obj.updated_at = values["updated_at"]
+    for obj in deleted:
+        session.add(Tombstone(entity=obj.__tablename__, ref_id=obj.id, row_version=values["row_version"], deleted_at=values["updated_at"], tenant_id=obj.tenant_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _note_committed_version(session: Session):
+    # 请求内提交的版本号交给读写分离中间件，写回客户端 cookie
+    version = session.info.pop("row_version", None)
+    state = request_writes.get()
+    if version is not None and state is not None:
+        state["version"] = max(version, state["version"] or 0)
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_version(session: Session):
+    session.info.pop("row_version", None)
+
+
+def encode_token(version: int, stage: int, last_id: int) -> str:
+    raw = json.dumps({"v": version, "s": stage, "id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token: str) -> Tuple[int, int, int]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        position = int(data["v"]), int(data["s"]), int(data["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="invalid sync token")
+    if not 0 <= position[1] <= END_STAGE:
+        raise HTTPException(status_code=400, detail="invalid sync token")
+    return position
+
+
+def _after(version_column, id_column, stage: int, position: Tuple[int, int, int], upper: int):
+    # 全局顺序为 (row_version, stage, id)，每个阶段单独走 (row_version, id) 索引
+    version, last_stage, last_id = position
+    if stage < last_stage:
+        lower = version_column > version
+    elif stage == last_stage:
+        lower = or_(version_column > version, and_(version_column == version, id_column > last_id))
+    else:
+        lower = version_column >= version
+    return and_(lower, version_column <= upper)
+
+
+def changes_since(db: Session, token: Optional[str], entities: Sequence[str], limit: int) -> dict:
+    position = decode_token(token) if token else (0, 0, 0)
+    upper = current_version(db)
+    if position[0] > upper:
+        raise HTTPException(status_code=410, detail="sync token is ahead of the database, full resync required")
+    if position[1] == END_STAGE and position[0] == upper:
+        # 没有新版本：只读一次计数器即返回
+        return {"items": [], "next": token, "has_more": False, "version": upper}
+
+    candidates: List[Tuple[tuple, dict]] = []
+    for stage, (entity, model, fields) in enumerate(SYNC_ENTITIES):
+        if entity not in entities:
+            continue
+        names = fields + ("row_version", "updated_at")
+        rows = db.execute(
+            select(*[getattr(model, name) for name in names])
+            .where(_after(model.row_version, model.id, stage, position, upper))
+            .order_by(model.row_version, model.id)
+            .limit(limit + 1)
+        ).all()
+        for row in rows:
+            item = {"entity": entity, "op": "upsert", "id": row.id, "row_version": row.row_version, "row": dict(zip(names, row))}
+            candidates.append(((row.row_version, stage, row.id), item))
+
+    tombstones = db.execute(
+        select(Tombstone)
+        .where(Tombstone.entity.in_(entities), _after(Tombstone.row_version, Tombstone.id, TOMBSTONE_STAGE, position, upper))
+        .order_by(Tombstone.row_version, Tombstone.id)
+        .limit(limit + 1)
+    ).scalars()
+    for tombstone in tombstones:
+        item = {"entity": tombstone.entity, "op": "delete", "id": tombstone.ref_id, "row_version": tombstone.row_version}
+        candidates.append(((tombstone.row_version, TOMBSTONE_STAGE, tombstone.id), item))
+
+    candidates.sort(key=lambda candidate: candidate[0])
+    has_more = len(candidates) > limit
+    page = candidates[:limit]
+    next_token = encode_token(*page[-1][0]) if has_more else encode_token(upper, END_STAGE, 0)
+    return {"items": [item for _, item in page], "next": next_token, "has_more": has_more, "version": upper}
@@ -0,0 +1,82 @@
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event, true
+from sqlalchemy.orm import ORMExecuteState, Session, with_loader_criteria
+
+from .db import current_tenant
+from .hooks import WriteEvent, on_commit
+from .models import TenantScoped
+
+# 需要跨租户查询时（全局唯一性校验等）在语句上设置 execution_options(all_tenants=True)
+ALL_TENANTS = "all_tenants"
+
+
+_criteria: Dict[int, Any] = {}
+
+
+def _tenant_criteria(tenant_id: int):
+    # 每个租户只构造一次；lambda 中的租户值作为绑定参数，语句编译缓存在租户之间共用，
+    # 每次请求重新构造 lambda 条件的开销与查询本身相当
+    option = _criteria.get(tenant_id)
+    if option is None:
+        option = _criteria.setdefault(tenant_id, with_loader_criteria(TenantScoped, lambda cls: cls.tenant_id == tenant_id, include_aliases=True))
+    return option
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _scope_to_tenant(state: ORMExecuteState):
+    # 所有 ORM 查询、UPDATE、DELETE 统一追加 tenant_id = 当前租户，包括子查询与别名
+    tenant_id = current_tenant.get()
+    if tenant_id is None or state.is_column_load or state.is_relationship_load or state.execution_options.get(ALL_TENANTS):
+        return
+    if state.is_select or state.is_update or state.is_delete:
+        state.statement = state.statement.options(_tenant_criteria(tenant_id))
+
+
+def tenant_clause(model):
+    # INSERT ... SELECT 等不经过上面监听器的语句手动追加
+    tenant_id = current_tenant.get()
+    return model.tenant_id == tenant_id if tenant_id is not None else true()
+
+
+@contextmanager
+def tenant_scope(tenant_id: Optional[int]):
+    token = current_tenant.set(tenant_id)
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+
+
+class PerTenant:
+    # 每个租户一份缓存实例，调用方式与单实例相同；提交后的写入事件按租户分发，
+    # 不带租户的事件（后台线程的批量写入）分发给所有实例
+    def __init__(self, factory: Callable[[], Any], listener: Optional[str] = None):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._instances: Dict[Optional[int], Any] = {}
+        if listener is not None:
+            on_commit(lambda events: self._dispatch(listener, events))
+
+    def current(self):
+        tenant_id = current_tenant.get()
+        instance = self._instances.get(tenant_id)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.setdefault(tenant_id, self._factory())
+        return instance
+
+    def __getattr__(self, name: str):
+        return getattr(self.current(), name)
+
+    def invalidate(self):
+        for instance in list(self._instances.values()):
+            instance.invalidate()
+
+    def _dispatch(self, method: str, events: List[WriteEvent]):
+        for tenant_id, instance in list(self._instances.items()):
+            matching = events if tenant_id is None else [e for e in events if e.tenant_id in (None, tenant_id)]
+            if matching:
+                getattr(instance, method)(matching)
@@ -0,0 +1,151 @@
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .hooks import WriteEvent
+from .models import Asset, ChangeRecord, Service
+from .sync import current_version
+from .tenancy import PerTenant
+
+GRAPH_TABLES = {"assets", "services", "changes"}
+
+
+class Graph:
+    def __init__(self, assets, services, changes):
+        self.nodes: Dict[str, dict] = {}
+        self.adjacency: Dict[str, Set[str]] = {}
+        for a in assets:
+            self._add_node(f"asset:{a.id}", "asset", a)
+        for s in services:
+            self._add_node(f"service:{s.id}", "service", s)
+            self._link(f"asset:{s.asset_id}", f"service:{s.id}")
+        for c in changes:
+            self._add_node(f"change:{c.id}", "change", c)
+            self._link(f"service:{c.service_id}", f"change:{c.id}")
+
+    def _add_node(self, key: str, kind: str, row):
+        self.nodes[key] = {**row._asdict(), "id": key, "type": kind, "ref_id": row.id}
+        self.adjacency.setdefault(key, set())
+
+    def _link(self, parent: str, child: str):
+        if parent in self.nodes:
+            self.adjacency[parent].add(child)
+            self.adjacency[child].add(parent)
+
+    def children(self, key: str) -> List[str]:
+        kind = self.nodes[key]["type"]
+        child_kind = {"asset": "service", "service": "change"}.get(kind)
+        return [k for k in self.adjacency[key] if self.nodes[k]["type"] == child_kind]
+
+    def parent(self, key: str) -> Optional[str]:
+        kind = self.nodes[key]["type"]
+        parent_kind = {"service": "asset", "change": "service"}.get(kind)
+        return next((k for k in self.adjacency[key] if self.nodes[k]["type"] == parent_kind), None)
+
+    def neighbourhood(self, root: str, depth: int) -> Set[str]:
+        seen = {root}
+        queue = deque([(root, 0)])
+        while queue:
+            key, distance = queue.popleft()
+            if distance == depth:
+                continue
+            for neighbour in self.adjacency[key]:
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    queue.append((neighbour, distance + 1))
+        return seen
+
+    def subgraph(self, keys: Set[str], include_changes: bool = True) -> dict:
+        if not include_changes:
+            keys = {k for k in keys if self.nodes[k]["type"] != "change"}
+        ordered = sorted(keys, key=lambda k: (self.nodes[k]["type"], self.nodes[k]["ref_id"]))
+        edges = []
+        for key in ordered:
+            for child in self.children(key):
+                if child in keys:
+                    edges.append({"source": key, "target": child, "type": "hosts" if self.nodes[key]["type"] == "asset" else "changes"})
+        return {"nodes": [self.nodes[k] for k in ordered], "edges": edges}
+
+
+class TopologyCache:
+    # 全量拓扑常驻内存，三次列投影查询构建；资产/服务/变更表任何写入提交后失效
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._graph: Optional[Graph] = None
+        self._generation = 0
+        self._version: Optional[int] = None
+
+    def get(self, db: Session) -> Graph:
+        # 其他 worker 进程的提交不会触发本进程的回调，按全局行版本号判断缓存是否仍然有效
+        version = current_version(db)
+        if version != self._version:
+            self.invalidate()
+        graph = self._graph
+        if graph is not None:
+            return graph
+        with self._lock:
+            if self._graph is None:
+                generation = self._generation
+                assets = db.execute(
+                    select(Asset.id, Asset.hostname, Asset.ip, Asset.environment, Asset.owner, Asset.status)
+                ).all()
+                services = db.execute(
+                    select(Service.id, Service.name, Service.asset_id, Service.deploy_method, Service.owner, Service.status)
+                ).all()
+                changes = db.execute(
+                    select(ChangeRecord.id, ChangeRecord.title, ChangeRecord.service_id, ChangeRecord.risk_level, ChangeRecord.status)
+                ).all()
+                graph = Graph(assets, services, changes)
+                # 构建期间有写入提交则本次结果只用于当前请求，不进入缓存
+                if generation == self._generation:
+                    self._graph = graph
+                    self._version = version
+                return graph
+            return self._graph
+
+    def invalidate(self, events: Optional[List[WriteEvent]] = None):
+        if events is None or any(event.table in GRAPH_TABLES for event in events):
+            self._generation += 1
+            self._graph = None
+
+
+topology_cache = PerTenant(TopologyCache, "invalidate")
+
+
+def select_nodes(
+    graph: Graph,
+    environment: Optional[str] = None,
+    owner: Optional[str] = None,
+    root: Optional[str] = None,
+    depth: int = 2,
+) -> Set[str]:
+    if root is not None:
+        return graph.neighbourhood(root, depth)
+
+    if environment is None and owner is None:
+        return set(graph.nodes)
+
+    selected: Set[str] = set()
+    for key, node in graph.nodes.items():
+        if node["type"] == "change":
+            continue
+        host = key if node["type"] == "asset" else graph.parent(key)
+        host_node = graph.nodes.get(host) if host else None
+        if environment is not None and (host_node is None or host_node["environment"] != environment):
+            continue
+        if owner is not None and node["owner"] != owner:
+            continue
+        # 命中的节点连同下游全部子节点，以及服务所在的主机
+        selected.add(key)
+        if host:
+            selected.add(host)
+        pending = [key]
+        while pending:
+            for child in graph.children(pending.pop()):
+                if child not in selected:
+                    selected.add(child)
+                    pending.append(child)
+    return selected
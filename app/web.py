@@ -0,0 +1,235 @@
+import hashlib
+import os
+import re
+import zlib
+from typing import Dict, Optional, Tuple
+
+from jinja2 import Environment
+from markupsafe import Markup
+from starlette.datastructures import MutableHeaders
+from starlette.staticfiles import StaticFiles
+
+from .db import env_bool
+from .metrics import registry
+from .stats import etag_matches
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，未安装时只提供 gzip
+    brotli = None
+
+# 小于该字节数的响应不压缩，压缩收益抵不过 CPU 与额外头部
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# 动态响应每次都要压缩，brotli 取较低质量，压缩率仍优于 gzip 6
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+# text/event-stream 逐条推送，压缩会把事件攒在压缩器里，不参与压缩
+COMPRESSIBLE_TYPES = (
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/csv",
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+    "image/svg+xml",
+)
+# 开发时设为 true：模板修改后自动重新编译，片段缓存随之关闭
+TEMPLATE_AUTO_RELOAD = env_bool("TEMPLATE_AUTO_RELOAD", "false")
+STATIC_MAX_AGE = 365 * 24 * 3600
+HASHED_NAME = re.compile(r"^(?P<stem>.+)\.(?P<digest>[0-9a-f]{12})(?P<suffix>\.[A-Za-z0-9]+)$")
+
+
+def _accepted_encoding(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name != b"accept-encoding":
+            continue
+        accepted = {}
+        for part in value.decode("latin-1").split(","):
+            coding, _, params = part.partition(";")
+            quality = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[coding.strip().lower()] = quality
+        if brotli is not None and accepted.get("br", 0) > 0:
+            return "br"
+        if accepted.get("gzip", 0) > 0:
+            return "gzip"
+    return None
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress, self.finish = self._compressor.process, self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.compress, self.finish = self._compressor.compress, self._compressor.flush
+
+
+def _compressible(headers: MutableHeaders) -> bool:
+    content_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+    return content_type in COMPRESSIBLE_TYPES and "content-encoding" not in headers
+
+
+def _weaken_etag(headers: MutableHeaders):
+    # 压缩后的字节与未压缩表示不同，强 ETag 改为弱 ETag；比较时 etag_matches 会忽略 W/ 前缀
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["etag"] = f"W/{etag}"
+
+
+class HTTPCacheMiddleware:
+    # 完整响应（非流式）的 GET 在路由未给出 ETag 时按响应体生成，命中 If-None-Match 返回 304；
+    # 可压缩类型超过 COMPRESS_MIN_SIZE 时按 Accept-Encoding 选择 br / gzip，流式响应边发送边压缩
+    def __init__(self, app, min_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _accepted_encoding(scope)
+        conditional = scope["method"] == "GET"
+        if encoding is None and not conditional:
+            await self.app(scope, receive, send)
+            return
+        if_none_match = next((value.decode("latin-1") for name, value in scope["headers"] if name == b"if-none-match"), None)
+        pending: Dict[str, dict] = {}
+        streaming: Dict[str, Optional[_Encoder]] = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # 等到第一段响应体再决定：只有这时才知道是否为完整响应、有多大
+                pending["start"] = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            if "encoder" in streaming:
+                encoder = streaming["encoder"]
+                if encoder is not None:
+                    more_body = message.get("more_body", False)
+                    chunk = message.get("body", b"")
+                    body = encoder.compress(chunk) + (b"" if more_body else encoder.finish())
+                    registry.inc(registry.response_bytes, ("original",), len(chunk))
+                    registry.inc(registry.response_bytes, ("sent",), len(body))
+                    message = {"type": "http.response.body", "body": body, "more_body": more_body}
+                await send(message)
+                return
+
+            start = pending.pop("start")
+            headers = MutableHeaders(raw=list(start["headers"]))
+            body = message.get("body", b"")
+            compressible = _compressible(headers)
+            if compressible and encoding is not None:
+                headers.add_vary_header("Accept-Encoding")
+
+            if message.get("more_body", False):
+                encoder = _Encoder(encoding) if compressible and encoding is not None else None
+                streaming["encoder"] = encoder
+                if encoder is not None:
+                    del headers["content-length"]
+                    headers["content-encoding"] = encoding
+                    _weaken_etag(headers)
+                    registry.inc(registry.response_bytes, ("original",), len(body))
+                    body = encoder.compress(body)
+                    registry.inc(registry.response_bytes, ("sent",), len(body))
+                await send({**start, "headers": headers.raw})
+                await send({"type": "http.response.body", "body": body, "more_body": True})
+                return
+
+            if conditional and start["status"] == 200 and "etag" not in headers:
+                headers["etag"] = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+                if "cache-control" not in headers:
+                    headers["cache-control"] = "private, no-cache"
+            if conditional and start["status"] == 200 and etag_matches(if_none_match, headers["etag"]):
+                del headers["content-length"]
+                del headers["content-type"]
+                await send({**start, "status": 304, "headers": headers.raw})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            if compressible and encoding is not None and len(body) >= self.min_size:
+                encoder = _Encoder(encoding)
+                registry.inc(registry.response_bytes, ("original",), len(body))
+                body = encoder.compress(body) + encoder.finish()
+                registry.inc(registry.response_bytes, ("sent",), len(body))
+                headers["content-encoding"] = encoding
+                headers["content-length"] = str(len(body))
+                _weaken_etag(headers)
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class HashedStaticFiles(StaticFiles):
+    # 页面引用带内容哈希的文件名（style.<hash>.css），内容变化即换 URL，可以长期强缓存；
+    # 不带哈希或哈希已过期的旧 URL 照常返回当前文件，走 ETag / Last-Modified 协商
+    def __init__(self, *, directory: str, prefix: str = "/static"):
+        super().__init__(directory=directory)
+        self.prefix = prefix
+        self._digests: Dict[str, Tuple[Tuple[float, int], str]] = {}
+
+    def digest(self, path: str) -> Optional[str]:
+        full_path, stat = self.lookup_path(path)
+        if stat is None:
+            return None
+        key = (stat.st_mtime, stat.st_size)
+        cached = self._digests.get(path)
+        if cached is None or cached[0] != key:
+            with open(full_path, "rb") as f:
+                cached = (key, hashlib.sha1(f.read()).hexdigest()[:12])
+            self._digests[path] = cached
+        return cached[1]
+
+    def url(self, path: str) -> str:
+        digest = self.digest(path)
+        if digest is None:
+            return f"{self.prefix}/{path}"
+        stem, dot, suffix = path.rpartition(".")
+        return f"{self.prefix}/{stem}.{digest}.{suffix}" if dot else f"{self.prefix}/{path}"
+
+    async def get_response(self, path: str, scope):
+        match = HASHED_NAME.match(path)
+        if match is None or self.lookup_path(path)[1] is not None:
+            response = await super().get_response(path, scope)
+            response.headers.setdefault("cache-control", "no-cache")
+            return response
+        original = match["stem"] + match["suffix"]
+        response = await super().get_response(original, scope)
+        if match["digest"] == self.digest(original):
+            response.headers["cache-control"] = f"public, max-age={STATIC_MAX_AGE}, immutable"
+        else:
+            response.headers.setdefault("cache-control", "no-cache")
+        return response
+
+
+class FragmentCache:
+    # 不随数据和请求变化的模板片段（功能全景、导航等）只渲染一次，页面中直接嵌入渲染结果
+    def __init__(self, env: Environment, **context):
+        self.env = env
+        self.context = context
+        self.enabled = not env.auto_reload
+        self._rendered: Dict[str, Markup] = {}
+
+    def render(self, name: str) -> Markup:
+        html = self._rendered.get(name) if self.enabled else None
+        if html is None:
+            html = Markup(self.env.get_template(name).render(self.context))
+            if self.enabled:
+                self._rendered[name] = html
+        return html
+
+
+def precompile_templates(env: Environment):
+    # 启动时编译全部模板，首个请求不承担编译开销；关闭自动重载后渲染时不再检查模板文件的修改时间
+    env.auto_reload = TEMPLATE_AUTO_RELOAD
+    for name in env.list_templates(extensions=("html",)):
+        env.get_template(name)
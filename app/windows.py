@@ -0,0 +1,101 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import and_, select, tuple_
+from sqlalchemy.orm import Session
+
+from .models import ChangeRecord, Service
+from .sync import next_version
+
+# 变更窗口最长时长。索引只建在 (service_id, window_start) 上，
+# 与 [start, end) 重叠的窗口必然满足 start - 最长时长 < window_start < end，重叠查询因此是有界的索引范围扫描
+CHANGE_WINDOW_MAX_HOURS = float(os.getenv("CHANGE_WINDOW_MAX_HOURS", "72"))
+MAX_WINDOW = timedelta(hours=CHANGE_WINDOW_MAX_HOURS)
+# 已结束的变更不参与冲突检测
+CLOSED_CHANGE_STATUSES = ("done", "cancelled", "rejected")
+MAX_CONFLICTS_REPORTED = 20
+
+WINDOW_FIELDS = ("id", "title", "service_id", "status", "window_start", "window_end")
+
+
+def to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # 库内统一存 UTC 无时区时间，与 created_at 一致
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def validate_window(start: Optional[datetime], end: Optional[datetime]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    start, end = to_utc(start), to_utc(end)
+    if (start is None) != (end is None):
+        raise HTTPException(status_code=400, detail="window_start and window_end must be given together")
+    if start is not None:
+        if end <= start:
+            raise HTTPException(status_code=400, detail="window_end must be after window_start")
+        if end - start > MAX_WINDOW:
+            raise HTTPException(status_code=400, detail=f"change window must not exceed {CHANGE_WINDOW_MAX_HOURS:g} hours")
+    return start, end
+
+
+def overlap_clause(start: datetime, end: datetime):
+    return and_(
+        ChangeRecord.window_start > start - MAX_WINDOW,
+        ChangeRecord.window_start < end,
+        ChangeRecord.window_end > start,
+    )
+
+
+def conflicts_query(service_id: int, start: datetime, end: datetime, exclude_id: Optional[int] = None):
+    # 同一服务以及同一主机上其他服务的未结束变更
+    asset_id = select(Service.asset_id).where(Service.id == service_id).scalar_subquery()
+    siblings = select(Service.id).where(Service.asset_id == asset_id)
+    stmt = (
+        select(*[getattr(ChangeRecord, name) for name in WINDOW_FIELDS])
+        .where(ChangeRecord.service_id.in_(siblings), overlap_clause(start, end), ChangeRecord.status.not_in(CLOSED_CHANGE_STATUSES))
+        .order_by(ChangeRecord.window_start, ChangeRecord.id)
+        .limit(MAX_CONFLICTS_REPORTED)
+    )
+    if exclude_id is not None:
+        stmt = stmt.where(ChangeRecord.id != exclude_id)
+    return stmt
+
+
+def find_conflicts(db: Session, service_id: int, start: datetime, end: datetime, exclude_id: Optional[int] = None) -> List[dict]:
+    return [dict(zip(WINDOW_FIELDS, row)) for row in db.execute(conflicts_query(service_id, start, end, exclude_id))]
+
+
+def check_conflicts(db: Session, service_id: int, start: Optional[datetime], end: Optional[datetime], status: str, exclude_id: Optional[int] = None):
+    if start is None or status in CLOSED_CHANGE_STATUSES:
+        return
+    # 先取本事务的行版本号：计数器行锁让并发写入串行化，两个重叠的变更不会同时通过检测
+    next_version(db)
+    conflicts = find_conflicts(db, service_id, start, end, exclude_id)
+    if conflicts:
+        raise HTTPException(status_code=409, detail={"message": "change window overlaps other changes", "conflicts": jsonable_encoder(conflicts)})
+
+
+def merge_window(db: Session, change: ChangeRecord, updates: dict) -> dict:
+    # 部分更新时与已有窗口合并后校验；窗口、服务或状态有变化才重新做冲突检测
+    start, end = validate_window(updates.get("window_start", change.window_start), updates.get("window_end", change.window_end))
+    if updates.keys() & {"window_start", "window_end", "service_id", "status"}:
+        check_conflicts(db, updates.get("service_id", change.service_id), start, end, updates.get("status", change.status), exclude_id=change.id)
+    return {name: value for name, value in (("window_start", start), ("window_end", end)) if name in updates}
+
+
+def scheduled_clause(start: datetime, end: datetime, after: Optional[str] = None):
+    # 按 (window_start, id) 排序翻页，游标值为上一页最后一条的 "开始时间|id"
+    clause = overlap_clause(start, end)
+    if after:
+        value, _, last_id = after.rpartition("|")
+        try:
+            clause = and_(clause, tuple_(ChangeRecord.window_start, ChangeRecord.id) > tuple_(datetime.fromisoformat(value), int(last_id)))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="invalid cursor")
+    return clause
+
+
+def window_cursor(row) -> str:
+    return f"{row.window_start.isoformat()}|{row.id}"
@@ -0,0 +1,112 @@
+# 用法：python -m benchmarks.bench_async [并发数] [请求总数]
+# 分别以 DB_ASYNC=false / true 启动 uvicorn，高并发压测列表接口，对比 p50 / p99 延迟与吞吐。
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+from sqlalchemy import create_engine, insert
+
+DB_PATH = Path(tempfile.gettempdir()) / "cmdb_bench_async.db"
+DATABASE_URL = f"sqlite:///{DB_PATH}"
+PORT = 8765
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+REQUESTS = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+ROWS = 10_000
+
+
+def seed():
+    if DB_PATH.exists():
+        DB_PATH.unlink()
+    os.environ["DATABASE_URL"] = DATABASE_URL
+    from app.db import Base
+    from app.models import Asset
+
+    engine = create_engine(DATABASE_URL)
+    Base.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Asset),
+            [
+                {
+                    "hostname": f"node{i}",
+                    "ip": f"172.{16 + i // 65536}.{i // 256 % 256}.{i % 256}",
+                    "environment": ("prod", "staging", "dev")[i % 3],
+                    "os": "linux",
+                    "owner": f"team-{i % 20}",
+                    "status": "active",
+                    "note": "",
+                    "created_at": now,
+                }
+                for i in range(ROWS)
+            ],
+        )
+    engine.dispose()
+
+
+async def wait_ready(client: httpx.AsyncClient):
+    for _ in range(100):
+        try:
+            await client.get("/healthz")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def load(mode: str):
+    env = {**os.environ, "DATABASE_URL": DATABASE_URL, "DB_ASYNC": mode, "DB_POOL_SIZE": "20", "DB_MAX_OVERFLOW": "20"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT), "--log-level", "warning", "--timeout-keep-alive", "120"],
+        env=env,
+    )
+    try:
+        limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=60) as client:
+            await wait_ready(client)
+            await client.post("/login", data={"username": "admin", "password": "admin"})
+            latencies = []
+            queue = asyncio.Queue()
+            for i in range(REQUESTS):
+                queue.put_nowait(i)
+
+            async def worker():
+                while not queue.empty():
+                    i = queue.get_nowait()
+                    started = time.perf_counter()
+                    resp = await client.get("/api/assets", params={"limit": 50, "environment": ("prod", "staging", "dev")[i % 3]})
+                    resp.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+            elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{'async' if mode == 'true' else 'sync':<6} {REQUESTS / elapsed:>10.0f} {p50:>10.1f} {p99:>10.1f}")
+
+
+def main():
+    seed()
+    print(f"{ROWS} assets, concurrency {CONCURRENCY}, {REQUESTS} requests")
+    print(f"{'mode':<6} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for mode in ("false", "true"):
+        asyncio.run(load(mode))
+    for path in DB_PATH.parent.glob(DB_PATH.name + "*"):
+        path.unlink()
+
+
+if __name__ == "__main__":
+    main()
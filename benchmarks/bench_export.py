@@ -0,0 +1,82 @@
+# 用法：python -m benchmarks.bench_export
+# 对比流式导出与一次性物化全部 ORM 对象的首字节时间和峰值内存。
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+DB_PATH = Path(tempfile.gettempdir()) / "cmdb_bench_export.db"
+if DB_PATH.exists():
+    DB_PATH.unlink()
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.db import SessionLocal, engine  # noqa: E402
+from app.export import export_stream  # noqa: E402
+from app.serializers import asset_to_dict  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+from app.models import Asset  # noqa: E402
+
+ROWS = 200_000
+
+
+def seed():
+    upgrade(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Asset),
+            [
+                {
+                    "hostname": f"node{i}",
+                    "ip": f"172.{16 + i // 65536}.{i // 256 % 256}.{i % 256}",
+                    "environment": "prod",
+                    "os": "linux",
+                    "owner": f"team-{i % 20}",
+                    "status": "active",
+                    "note": "x" * 64,
+                    "created_at": now,
+                }
+                for i in range(ROWS)
+            ],
+        )
+
+
+def measure(label, produce):
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    for chunk in produce():
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        size += len(chunk)
+    total = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<16} first byte {first_byte * 1000:8.1f} ms  total {total:6.2f} s  peak {peak / 2**20:7.1f} MiB  {size / 2**20:7.1f} MiB out")
+
+
+def materialized():
+    import json
+
+    with SessionLocal() as db:
+        assets = db.execute(select(Asset).order_by(Asset.id)).scalars().all()
+        yield json.dumps([asset_to_dict(a) for a in assets]).encode()
+
+
+def main():
+    seed()
+    print(f"{ROWS} assets")
+    measure("materialized", materialized)
+    measure("stream ndjson", lambda: export_stream("assets", "ndjson"))
+    measure("stream csv", lambda: export_stream("assets", "csv"))
+    measure("stream csv.gz", lambda: export_stream("assets", "csv", gzip=True))
+    DB_PATH.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# 用法：python -m benchmarks.bench_heartbeat
+# 对比逐台 PUT /api/assets/{id} 与 /api/heartbeats 批量上报 + 合并刷写的吞吐。
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+DB_PATH = Path(tempfile.gettempdir()) / "cmdb_bench_heartbeat.db"
+if DB_PATH.exists():
+    DB_PATH.unlink()
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.db import engine  # noqa: E402
+from app.heartbeat import HEARTBEAT_MAX_REPORTS, heartbeat_buffer  # noqa: E402
+from app.main import app  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+
+HOSTS = 50_000
+SINGLE_UPDATES = 1_000
+ROUNDS = 3
+
+
+def main():
+    upgrade(engine)
+    client = TestClient(app)
+    client.post("/login", data={"username": "admin", "password": "admin"}, follow_redirects=False)
+    rows = [{"ip": f"10.{i // 65536}.{i // 256 % 256}.{i % 256}", "hostname": f"hb{i}"} for i in range(HOSTS)]
+    client.post("/api/assets/bulk", params={"report": "errors"}, content=json.dumps(rows), headers={"content-type": "application/json"})
+
+    started = time.perf_counter()
+    for i in range(SINGLE_UPDATES):
+        client.put(f"/api/assets/{i + 1}", json={"status": "active"})
+    elapsed = time.perf_counter() - started
+    print(f"per-host PUT        : {SINGLE_UPDATES / elapsed:10.0f} reports/s  (~{HOSTS / (SINGLE_UPDATES / elapsed):.0f} s per round of {HOSTS})")
+
+    for round_no in range(ROUNDS):
+        # 每轮 1% 的主机状态变化
+        reports = [{"hostname": f"hb{i}", "status": "degraded" if i % 100 == round_no else "active"} for i in range(HOSTS)]
+        started = time.perf_counter()
+        for start in range(0, HOSTS, HEARTBEAT_MAX_REPORTS):
+            client.post("/api/heartbeats", json=reports[start : start + HEARTBEAT_MAX_REPORTS])
+        ingest = time.perf_counter() - started
+        started = time.perf_counter()
+        written = heartbeat_buffer.flush()
+        flush = time.perf_counter() - started
+        print(f"heartbeat round {round_no}   : ingest {HOSTS / ingest:10.0f} reports/s, flush {flush:.2f} s  {written}")
+
+    DB_PATH.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# 用法：python -m benchmarks.bench_history
+# 对比开启 / 关闭历史审计时的写入吞吐：逐条 PUT、批量 PATCH、批量导入。
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+DB_PATH = Path(tempfile.gettempdir()) / "cmdb_bench_history.db"
+if DB_PATH.exists():
+    DB_PATH.unlink()
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import history  # noqa: E402
+from app.db import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+
+IMPORT_ROWS = 20_000
+SINGLE_UPDATES = 1_000
+
+
+def hosts(prefix: str, count: int, offset: int):
+    return [{"ip": f"10.{(i + offset) // 65536}.{(i + offset) // 256 % 256}.{(i + offset) % 256}", "hostname": f"{prefix}{i}", "owner": prefix} for i in range(count)]
+
+
+def run(client: TestClient, enabled: bool, offset: int):
+    history.HISTORY_ENABLED = enabled
+    label = "on " if enabled else "off"
+    prefix = f"hist{int(enabled)}-"
+
+    payload = json.dumps(hosts(prefix, IMPORT_ROWS, offset))
+    started = time.perf_counter()
+    client.post("/api/assets/bulk", params={"report": "errors"}, content=payload, headers={"content-type": "application/json"})
+    elapsed = time.perf_counter() - started
+    print(f"[history {label}] bulk import   : {IMPORT_ROWS / elapsed:10.0f} rows/s")
+
+    ids = [a["id"] for a in client.get("/api/assets", params={"owner": prefix, "limit": 500, "fields": "id"}).json()]
+    started = time.perf_counter()
+    for i in range(SINGLE_UPDATES):
+        client.put(f"/api/assets/{ids[i % len(ids)]}", json={"note": f"n{i}"})
+    elapsed = time.perf_counter() - started
+    print(f"[history {label}] per-row PUT   : {SINGLE_UPDATES / elapsed:10.0f} req/s")
+
+    started = time.perf_counter()
+    resp = client.patch("/api/assets", json={"filter": {"owner": prefix}, "values": {"status": "retired"}})
+    elapsed = time.perf_counter() - started
+    print(f"[history {label}] batch PATCH   : {resp.json()['updated'] / elapsed:10.0f} rows/s")
+
+
+def main():
+    upgrade(engine)
+    client = TestClient(app)
+    client.post("/login", data={"username": "admin", "password": "admin"}, follow_redirects=False)
+    run(client, False, 0)
+    run(client, True, IMPORT_ROWS)
+    with engine.connect() as conn:
+        size = conn.exec_driver_sql("SELECT count(*), sum(length(data)) FROM history").one()
+    print(f"history rows: {size[0]}, payload bytes: {size[1]}")
+    DB_PATH.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# 用法：python -m benchmarks.bench_serialization
+# 对比 ORM 对象 + _to_dict + jsonable_encoder 与列投影 + orjson 的列表序列化耗时。
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+DB_PATH = Path(tempfile.gettempdir()) / "cmdb_bench_serialization.db"
+if DB_PATH.exists():
+    DB_PATH.unlink()
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import json  # noqa: E402
+
+import orjson  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.db import SessionLocal, engine  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+from app.models import Asset  # noqa: E402
+from app.serializers import ASSET_FIELDS, asset_to_dict, columns, rows_to_dicts  # noqa: E402
+
+ROWS = 50_000
+PAGE = 1000
+ROUNDS = 20
+
+
+def seed():
+    upgrade(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Asset),
+            [
+                {
+                    "hostname": f"node{i}",
+                    "ip": f"172.{16 + i // 65536}.{i // 256 % 256}.{i % 256}",
+                    "environment": "prod",
+                    "os": "linux",
+                    "owner": f"team-{i % 20}",
+                    "status": "active",
+                    "note": "x" * 64,
+                    "created_at": now,
+                }
+                for i in range(ROWS)
+            ],
+        )
+
+
+def orm_page():
+    with SessionLocal() as db:
+        assets = db.execute(select(Asset).order_by(Asset.id.desc()).limit(PAGE)).scalars().all()
+        return json.dumps(jsonable_encoder([asset_to_dict(a) for a in assets])).encode()
+
+
+def column_page():
+    with SessionLocal() as db:
+        rows = db.execute(select(*columns(Asset, ASSET_FIELDS)).order_by(Asset.id.desc()).limit(PAGE)).all()
+        return orjson.dumps(rows_to_dicts(rows, ASSET_FIELDS))
+
+
+def measure(label, produce):
+    produce()
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        body = produce()
+    per_page = (time.perf_counter() - started) / ROUNDS
+    print(f"{label:<24} {per_page * 1000:8.2f} ms / {PAGE} rows  {len(body) / 1024:7.1f} KiB")
+
+
+def main():
+    seed()
+    print(f"{ROWS} assets, page size {PAGE}")
+    measure("orm + jsonable_encoder", orm_page)
+    measure("columns + orjson", column_page)
+    DB_PATH.unlink()
+
+
+if __name__ == "__main__":
+    main()
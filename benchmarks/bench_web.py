@@ -0,0 +1,70 @@
+# 用法：python -m benchmarks.bench_web
+# 大规模资产下首页与列表接口的传输字节数（不压缩 / gzip / 条件请求 304）与首页渲染耗时（片段缓存开 / 关）。
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+DB_PATH = Path(tempfile.gettempdir()) / "cmdb_bench_web.db"
+if DB_PATH.exists():
+    DB_PATH.unlink()
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.db import engine  # noqa: E402
+from app.main import app, fragments  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+
+HOSTS = 100_000
+REQUESTS = 300
+
+
+def timed(client: TestClient, path: str, **kwargs):
+    timings = []
+    for _ in range(REQUESTS):
+        started = time.perf_counter()
+        resp = client.get(path, **kwargs)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return resp, statistics.median(timings) * 1000, timings[int(len(timings) * 0.99)] * 1000
+
+
+def main():
+    upgrade(engine)
+    client = TestClient(app)
+    client.post("/login", data={"username": "admin", "password": "admin"}, follow_redirects=False)
+    rows = [
+        {"ip": f"10.{i // 65536}.{i // 256 % 256}.{i % 256}", "hostname": f"host-{i}", "owner": f"team-{i % 40}", "status": "active" if i % 10 else "inactive"}
+        for i in range(HOSTS)
+    ]
+    client.post("/api/assets/bulk", params={"report": "errors"}, content=json.dumps(rows), headers={"content-type": "application/json"})
+    print(f"{HOSTS} assets")
+
+    for label, path in (("GET /", "/"), ("GET /api/assets?limit=200", "/api/assets?limit=200")):
+        identity = client.get(path, headers={"Accept-Encoding": "identity"})
+        # httpx 会透明解压，传输字节数以 content-length 为准
+        gzip = client.get(path, headers={"Accept-Encoding": "gzip"})
+        revalidated = client.get(path, headers={"If-None-Match": gzip.headers["etag"]})
+        print(
+            f"{label:26}: identity {int(identity.headers['content-length']):8d} B  "
+            f"gzip {int(gzip.headers['content-length']):7d} B  304 {revalidated.status_code} {len(revalidated.content)} B"
+        )
+
+    for enabled in (False, True):
+        fragments.enabled = enabled
+        _, p50, p99 = timed(client, "/", headers={"Accept-Encoding": "identity"})
+        print(f"GET / fragment cache {'on ' if enabled else 'off'}  : p50 {p50:6.2f} ms  p99 {p99:6.2f} ms")
+    _, p50, p99 = timed(client, "/")
+    print(f"GET / gzip                : p50 {p50:6.2f} ms  p99 {p99:6.2f} ms")
+    etag = client.get("/").headers["etag"]
+    _, p50, p99 = timed(client, "/", headers={"If-None-Match": etag})
+    print(f"GET / 304                 : p50 {p50:6.2f} ms  p99 {p99:6.2f} ms")
+
+    DB_PATH.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+# 用法：
+#   python -m benchmarks.suite seed --size 100k --db /tmp/cmdb_100k.db
+#   python -m benchmarks.suite run --db /tmp/cmdb_100k.db --concurrency 16 --requests 500 --out before.json
+#   python -m benchmarks.suite compare before.json after.json --threshold 0.1
+# seed 按 1.json 的主机命名规律生成资产，并按固定比例生成服务（每 2 台资产 1 个）和变更（每个服务 3 条）；
+# run 用进程内 ASGI 客户端并发压测首页、列表、检索、总览与写接口，输出 JSON；
+# compare 对比两次结果，p50 / p99 变慢或吞吐下降超过阈值时以非零状态退出。
+import argparse
+import asyncio
+import ipaddress
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+SEED_BATCH_SIZE = 10_000
+SERVICES_PER_ASSET = 0.5
+CHANGES_PER_SERVICE = 3
+RANDOM_SEED = 42
+# 6:3:1 的环境分布
+ENVIRONMENTS = ("prod",) * 6 + ("staging",) * 3 + ("dev",)
+
+
+def parse_size(value: str) -> int:
+    return SIZES[value.lower()] if value.lower() in SIZES else int(value)
+
+
+def use_database(db_path: str):
+    # 必须在导入 app 之前设置
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(db_path).resolve()}"
+
+
+def _asset_rows(start: int, stop: int, now: datetime):
+    for i in range(start, stop):
+        yield {
+            "id": i + 1,
+            "hostname": f"node{i}",
+            "ip": str(ipaddress.IPv4Address(0x0A000000 + i)),
+            "environment": ENVIRONMENTS[i % len(ENVIRONMENTS)],
+            "os": "windows" if i % 25 == 0 else "linux",
+            "owner": f"team-{i % 50}",
+            "status": "maintenance" if i % 20 == 0 else "inactive" if i % 33 == 0 else "active",
+            "note": f"rack-{i // 40} slot-{i % 40}",
+            "created_at": now,
+        }
+
+
+def seed(size: int, db_path: str):
+    if Path(db_path).exists():
+        sys.exit(f"{db_path} already exists, remove it or pick another path")
+    use_database(db_path)
+    # 批量写入必然超过慢查询阈值，生成数据时不记录
+    os.environ.setdefault("SLOW_QUERY_MS", "0")
+    from sqlalchemy import insert
+
+    from app.db import engine
+    from app.migrations import upgrade
+    from app.models import Asset, ChangeRecord, Service
+    from app.network import ip_fields
+
+    upgrade(engine)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+    services = int(size * SERVICES_PER_ASSET)
+    with engine.begin() as conn:
+        for start in range(0, size, SEED_BATCH_SIZE):
+            rows = [{**row, **ip_fields(row["ip"])} for row in _asset_rows(start, min(start + SEED_BATCH_SIZE, size), now)]
+            conn.execute(insert(Asset), rows)
+        for start in range(0, services, SEED_BATCH_SIZE):
+            conn.execute(
+                insert(Service),
+                [
+                    {
+                        "id": j + 1,
+                        "name": f"svc-{j}",
+                        "asset_id": j * 2 + 1,
+                        "repo_url": f"https://git.example.com/team-{j % 50}/svc-{j}",
+                        "deploy_method": ("ansible", "k8s", "docker")[j % 3],
+                        "owner": f"team-{j % 50}",
+                        "status": "stopped" if j % 15 == 0 else "running",
+                        "note": "",
+                        "created_at": now,
+                    }
+                    for j in range(start, min(start + SEED_BATCH_SIZE, services))
+                ],
+            )
+        changes = services * CHANGES_PER_SERVICE
+        for start in range(0, changes, SEED_BATCH_SIZE):
+            conn.execute(
+                insert(ChangeRecord),
+                [
+                    {
+                        "id": k + 1,
+                        "title": f"deploy svc-{k // CHANGES_PER_SERVICE} v1.{k % CHANGES_PER_SERVICE}",
+                        "service_id": k // CHANGES_PER_SERVICE + 1,
+                        "risk_level": ("low", "medium", "high")[k % 3],
+                        "change_window": "Sat 02:00-04:00",
+                        "executor": f"user-{k % 30}",
+                        "approver": f"lead-{k % 7}",
+                        "status": ("done", "done", "approved", "pending")[k % 4],
+                        "rollback_plan": "redeploy previous tag",
+                        "created_at": now,
+                    }
+                    for k in range(start, min(start + SEED_BATCH_SIZE, changes))
+                ],
+            )
+    # 再跑一次迁移，为刚写入的行分配初始版本号
+    upgrade(engine)
+    print(f"seeded {size} assets, {services} services, {services * CHANGES_PER_SERVICE} changes in {time.perf_counter() - started:.1f}s")
+
+
+def scenarios(size: int, rng: random.Random):
+    # 写场景的主机名与 IP 带上本次运行的编号，重复压测同一个库不会冲突
+    run_id = int(time.time()) % 1000
+
+    def any_id():
+        return rng.randint(1, size)
+
+    return {
+        "index": lambda n: ("GET", "/", None),
+        "list_assets": lambda n: ("GET", "/api/assets?limit=100", None),
+        "list_assets_filtered": lambda n: ("GET", f"/api/assets?limit=100&environment=staging&owner=team-{n % 50}", None),
+        "list_changes": lambda n: ("GET", "/api/changes?limit=100&status=pending", None),
+        "search": lambda n: ("GET", f"/api/search?q=svc-{rng.randint(0, max(size // 2 - 1, 0))}&limit=20", None),
+        "overview": lambda n: ("GET", "/api/overview", None),
+        "update_asset": lambda n: ("PUT", f"/api/assets/{any_id()}", {"owner": f"team-{n % 50}"}),
+        "create_asset": lambda n: ("POST_FORM", "/assets", {"hostname": f"bench-{run_id}-{n}", "ip": str(ipaddress.IPv4Address(0x0B000000 + run_id * 10_000 + n))}),
+    }
+
+
+async def _run_scenario(client, make_request, numbers: range, concurrency: int) -> dict:
+    latencies, errors = [], 0
+    counter = iter(numbers)
+
+    async def worker():
+        nonlocal errors
+        for n in counter:
+            method, url, body = make_request(n)
+            started = time.perf_counter()
+            if method == "POST_FORM":
+                resp = await client.post(url, data=body)
+            elif body is not None:
+                resp = await client.request(method, url, json=body)
+            else:
+                resp = await client.request(method, url)
+            latencies.append(time.perf_counter() - started)
+            if resp.status_code >= 400 and resp.status_code != 404:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(pct(0.50), 3),
+        "p90_ms": round(pct(0.90), 3),
+        "p99_ms": round(pct(0.99), 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def _run(args) -> dict:
+    import httpx
+    import sqlalchemy
+    from sqlalchemy import func, select
+
+    from app.db import SessionLocal
+    from app.main import app
+    from app.models import Asset
+
+    with SessionLocal() as db:
+        size = db.scalar(select(func.count()).select_from(Asset))
+    selected = args.scenario or list(scenarios(size, random.Random(RANDOM_SEED)))
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", follow_redirects=False) as client:
+        await client.post("/login", data={"username": "admin", "password": "admin"})
+        for name in selected:
+            make_request = scenarios(size, random.Random(RANDOM_SEED))[name]
+            await _run_scenario(client, make_request, range(args.warmup), args.concurrency)
+            results[name] = await _run_scenario(client, make_request, range(args.warmup, args.warmup + args.requests), args.concurrency)
+            r = results[name]
+            print(f"{name:<22} {r['throughput_rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f} ms  p99 {r['p99_ms']:>8.2f} ms  errors {r['errors']}")
+    return {
+        "meta": {
+            "assets": size,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+
+
+def run(args):
+    if not Path(args.db).exists():
+        sys.exit(f"{args.db} not found, run `python -m benchmarks.suite seed --db {args.db}` first")
+    use_database(args.db)
+    report = asyncio.run(_run(args))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"results written to {args.out}")
+
+
+def compare(args) -> int:
+    base = json.loads(Path(args.base).read_text())
+    head = json.loads(Path(args.head).read_text())
+    regressions = 0
+    print(f"{'scenario':<22} {'metric':<15} {'base':>10} {'head':>10} {'change':>8}")
+    for name, before in base["results"].items():
+        after = head["results"].get(name)
+        if after is None:
+            continue
+        for metric, higher_is_better in (("p50_ms", False), ("p99_ms", False), ("throughput_rps", True)):
+            old, new = before[metric], after[metric]
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > args.threshold else ""
+            regressions += bool(flag)
+            print(f"{name:<22} {metric:<15} {old:>10.2f} {new:>10.2f} {change:>+8.1%}{flag}")
+    print(f"{regressions} regression(s) over {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="生成合成数据集")
+    seed_parser.add_argument("--size", type=parse_size, default="100k", help="资产数量：1k / 100k / 1m 或整数")
+    seed_parser.add_argument("--db", required=True)
+
+    run_parser = commands.add_parser("run", help="并发压测并输出结果")
+    run_parser.add_argument("--db", required=True)
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--requests", type=int, default=500, help="每个场景的请求数")
+    run_parser.add_argument("--warmup", type=int, default=50)
+    run_parser.add_argument("--scenario", action="append", choices=list(scenarios(1, random.Random())), help="只运行指定场景，可重复")
+    run_parser.add_argument("--out", help="结果 JSON 路径")
+
+    compare_parser = commands.add_parser("compare", help="对比两次结果")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="允许的变化比例，默认 0.1")
+
+    args = parser.parse_args()
+    if args.command == "seed":
+        seed(args.size, args.db)
+    elif args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,24 @@
+import json
 import os
+import time
+from datetime import datetime
 from pathlib import Path
 
 os.environ["DATABASE_URL"] = "sqlite:///./test_cmdb.db"
 
 from fastapi.testclient import TestClient
 
+from app.db import engine
 from app.main import app
+from app.migrations import upgrade
 
+upgrade(engine)
 
 client = TestClient(app)
 
 
 def teardown_module():
-    test_db = Path("test_cmdb.db")
-    if test_db.exists():
+    for test_db in Path(".").glob("test_cmdb.db*"):
         test_db.unlink()
 
 
@@ -104,3 +109,802 @@ def test_login_redirect_respects_root_path():
 
     assert resp.status_code == 303
     assert resp.headers["location"].endswith("/cmdb/")
+
+
+def test_list_assets_keyset_pagination_and_filters():
+    login_as_admin(client)
+    for i in range(5):
+        resp = client.post(
+            "/assets",
+            data={"hostname": f"page-{i}", "ip": f"10.9.0.{i}", "environment": "staging", "owner": "pager"},
+            follow_redirects=False,
+        )
+        assert resp.status_code == 303
+
+    first = client.get("/api/assets", params={"owner": "pager", "limit": 2})
+    assert first.status_code == 200
+    assert [a["hostname"] for a in first.json()] == ["page-4", "page-3"]
+    cursor = first.headers["x-next-cursor"]
+    assert 'rel="next"' in first.headers["link"]
+
+    seen = [a["hostname"] for a in first.json()]
+    while cursor:
+        page = client.get("/api/assets", params={"owner": "pager", "limit": 2, "cursor": cursor})
+        seen += [a["hostname"] for a in page.json()]
+        cursor = page.headers.get("x-next-cursor")
+    assert seen == [f"page-{i}" for i in range(4, -1, -1)]
+
+    asc = client.get("/api/assets", params={"owner": "pager", "order": "asc", "limit": 10})
+    assert [a["hostname"] for a in asc.json()] == [f"page-{i}" for i in range(5)]
+    assert "x-next-cursor" not in asc.headers
+
+    assert client.get("/api/assets", params={"environment": "staging", "status": "inactive"}).json() == []
+    assert client.get("/api/assets", params={"cursor": "not-a-cursor"}).status_code == 400
+    mismatched = client.get("/api/assets", params={"cursor": cursor or first.headers["x-next-cursor"], "order": "asc"})
+    assert mismatched.status_code == 400
+
+
+def test_list_fields_selects_sparse_columns():
+    login_as_admin(client)
+    client.post("/assets", data={"hostname": "sparse-1", "ip": "10.8.1.1", "owner": "sparse"}, follow_redirects=False)
+
+    resp = client.get("/api/assets", params={"owner": "sparse", "fields": "hostname,ip"})
+    assert resp.status_code == 200
+    assert resp.json() == [{"id": resp.json()[0]["id"], "hostname": "sparse-1", "ip": "10.8.1.1"}]
+
+    full = client.get("/api/assets", params={"owner": "sparse"}).json()[0]
+    assert set(full) == {"id", "hostname", "ip", "environment", "os", "owner", "status", "note"}
+
+    assert client.get("/api/assets", params={"fields": "hostname,password"}).status_code == 400
+    assert client.get("/api/services", params={"fields": "name"}).status_code == 200
+
+
+def test_batch_update_and_delete_cascade():
+    login_as_admin(client)
+    for i in range(3):
+        client.post("/assets", data={"hostname": f"rack-{i}", "ip": f"10.77.0.{i}", "owner": "rack"}, follow_redirects=False)
+    rack = {a["hostname"]: a["id"] for a in client.get("/api/assets", params={"owner": "rack"}).json()}
+    client.post("/services", data={"name": "rack-svc", "asset_id": rack["rack-0"]}, follow_redirects=False)
+    service_id = client.get("/api/services", params={"asset_id": rack["rack-0"]}).json()[0]["id"]
+    client.post("/changes", data={"title": "rack change", "service_id": service_id}, follow_redirects=False)
+    before = client.get("/api/overview").json()
+
+    resp = client.patch("/api/assets", json={"filter": {"owner": "rack"}, "values": {"status": "retired"}})
+    assert resp.json() == {"updated": 3}
+    assert {a["status"] for a in client.get("/api/assets", params={"owner": "rack"}).json()} == {"retired"}
+    assert client.get("/api/overview").json()["assets_by_status"]["retired"] >= 3
+
+    assert client.patch("/api/services", json={"ids": [service_id], "values": {"asset_id": 999999}}).status_code == 404
+    assert client.patch("/api/assets", json={"values": {"status": "x"}}).status_code == 400
+    assert client.patch("/api/assets", json={"ids": [1], "values": {"hostname": "same"}}).status_code == 422
+    assert client.post("/api/assets/batch-delete", json={"filter": {"ownr": "rack"}}).status_code == 422
+
+    resp = client.post("/api/assets/batch-delete", json={"ids": [rack["rack-0"], rack["rack-1"]], "filter": {"owner": "rack"}})
+    assert resp.json()["deleted"] == {"changes": 1, "services": 1, "assets": 2}
+    assert [a["hostname"] for a in client.get("/api/assets", params={"owner": "rack"}).json()] == ["rack-2"]
+    assert client.get("/api/services", params={"asset_id": rack["rack-0"]}).json() == []
+    after = client.get("/api/overview").json()
+    assert after["asset_count"] == before["asset_count"] - 2
+    assert after["change_count"] == before["change_count"] - 1
+
+
+def test_history_time_travel_and_trash_restore():
+    login_as_admin(client)
+    resp = client.post("/api/assets/bulk", json=[{"hostname": "hist-1", "ip": "10.58.0.1", "owner": "hist"}])
+    asset_id = resp.json()["results"][0]["id"]
+    client.post("/services", data={"name": "hist-svc", "asset_id": asset_id}, follow_redirects=False)
+    service_id = client.get("/api/services", params={"asset_id": asset_id}).json()[0]["id"]
+    moment = datetime.utcnow()
+    time.sleep(0.01)
+    client.put(f"/api/assets/{asset_id}", json={"owner": "hist-ops"})
+    client.patch("/api/assets", json={"ids": [asset_id], "values": {"status": "retired"}})
+
+    entries = client.get(f"/api/history/assets/{asset_id}").json()
+    assert [e["action"] for e in entries] == ["update", "update", "create"]
+    assert entries[0]["data"] == {"status": ["active", "retired"]}
+    assert entries[1]["data"] == {"owner": ["hist", "hist-ops"]}
+    old = client.get(f"/api/history/assets/{asset_id}/as-of", params={"at": moment.isoformat()}).json()
+    assert (old["owner"], old["status"]) == ("hist", "active")
+    assert client.get(f"/api/history/assets/{asset_id}/as-of", params={"at": "2000-01-01T00:00:00"}).status_code == 404
+    assert client.get("/api/history/jobs/1").status_code == 404
+
+    client.delete(f"/api/assets/{asset_id}")
+    trash = [e for e in client.get("/api/trash", params={"entity": "assets"}).json() if e["ref_id"] == asset_id]
+    assert trash[0]["data"]["hostname"] == "hist-1"
+    assert any(e["ref_id"] == service_id for e in client.get("/api/trash", params={"entity": "services"}).json())
+    service_trash = [e for e in client.get("/api/trash", params={"entity": "services"}).json() if e["ref_id"] == service_id]
+    assert client.post(f"/api/trash/{service_trash[0]['id']}/restore").status_code == 409
+
+    assert client.post(f"/api/trash/{trash[0]['id']}/restore").json() == {"restored": {"assets": 1, "services": 1, "changes": 0}}
+    assert client.get("/api/assets", params={"owner": "hist-ops"}).json()[0]["status"] == "retired"
+    assert client.get("/api/services", params={"asset_id": asset_id}).json()[0]["name"] == "hist-svc"
+    assert client.post(f"/api/trash/{trash[0]['id']}/restore").status_code == 409
+    assert not [e for e in client.get("/api/trash", params={"entity": "assets"}).json() if e["ref_id"] == asset_id]
+    assert client.get(f"/api/history/assets/{asset_id}").json()[0]["action"] == "restore"
+
+
+def test_heartbeats_coalesce_transitions_and_mark_stale_hosts():
+    from sqlalchemy import update
+
+    from app.heartbeat import heartbeat_buffer
+    from app.models import Asset
+
+    login_as_admin(client)
+    client.post("/assets", data={"hostname": "hb-1", "ip": "10.59.0.1", "owner": "hb"}, follow_redirects=False)
+    client.post("/assets", data={"hostname": "hb-2", "ip": "10.59.0.2", "owner": "hb", "status": "retired"}, follow_redirects=False)
+    asset_id = client.get("/api/assets", params={"owner": "hb", "order": "asc"}).json()[0]["id"]
+    client.post("/services", data={"name": "hb-svc", "asset_id": asset_id}, follow_redirects=False)
+
+    reports = [
+        {"hostname": "hb-1", "services": {"hb-svc": "stopped", "not-on-this-host": "stopped"}},
+        {"hostname": "hb-2"},
+        {"hostname": "hb-ghost"},
+        {"hostname": "hb-1", "status": "degraded"},
+    ]
+    assert client.post("/api/heartbeats", json=reports).json() == {"accepted": 4}
+    assert client.post("/api/heartbeats", json=[{"status": "up"}]).status_code == 422
+    assert heartbeat_buffer.flush() == {"status": 1, "service_status": 1, "last_seen": 2, "unknown_host": 1}
+    statuses = {a["hostname"]: a["status"] for a in client.get("/api/assets", params={"owner": "hb"}).json()}
+    assert (statuses["hb-1"], statuses["hb-2"]) == ("degraded", "retired")
+    assert client.get("/api/services", params={"asset_id": asset_id}).json()[0]["status"] == "stopped"
+
+    # 重复上报相同状态不产生写入
+    client.post("/api/heartbeats", json=reports[3:])
+    assert heartbeat_buffer.flush() == {"status": 0, "service_status": 0, "last_seen": 0, "unknown_host": 0}
+
+    with engine.begin() as conn:
+        conn.execute(update(Asset).where(Asset.id == asset_id).values(last_seen_at=datetime(2000, 1, 1)))
+    assert heartbeat_buffer.sweep() == 1
+    assert heartbeat_buffer.sweep() == 0
+    assert client.get(f"/api/history/assets/{asset_id}").json()[0]["data"] == {"status": ["degraded", "unreachable"]}
+    assert [h["hostname"] for h in client.get("/api/heartbeats/stale").json()] == ["hb-1"]
+
+    client.post("/api/heartbeats", json=[{"hostname": "hb-1"}])
+    assert heartbeat_buffer.flush()["status"] == 1
+    assert client.get("/api/heartbeats/stale").json() == []
+    assert heartbeat_buffer.sweep() == 0
+
+    text = client.get("/metrics").text
+    assert 'cmdb_heartbeat_reports_total{outcome="coalesced"} 1' in text
+    assert 'cmdb_heartbeat_rows_written_total{kind="unreachable"} 1' in text
+    assert "cmdb_heartbeat_flush_duration_seconds_count" in text
+    assert "cmdb_heartbeat_buffered_hosts 0" in text
+
+
+def test_event_stream_filters_and_resumes():
+    import asyncio
+
+    from app.events import event_hub, stream_events
+
+    login_as_admin(client)
+    assert client.get("/api/events", params={"entity": "hosts"}).status_code == 400
+    start = event_hub.seq
+
+    async def scenario():
+        live = stream_events({"changes"}, status="pending")
+        assert await live.__anext__() == b"retry: 3000\n\n"
+        client.post("/assets", data={"hostname": "sse-1", "ip": "10.66.0.1"}, follow_redirects=False)
+        asset_id = client.get("/api/assets", params={"fields": "hostname", "limit": 1}).json()[0]["id"]
+        client.post("/services", data={"name": "sse-svc", "asset_id": asset_id}, follow_redirects=False)
+        service_id = client.get("/api/services", params={"asset_id": asset_id}).json()[0]["id"]
+        client.post("/changes", data={"title": "sse change", "service_id": service_id}, follow_redirects=False)
+        change = json.loads((await live.__anext__()).split(b"data: ")[1])
+        assert (change["entity"], change["action"], change["row"]["title"]) == ("changes", "create", "sse change")
+        await live.aclose()
+
+        replay = stream_events({"assets", "services"}, since=start)
+        await replay.__anext__()
+        backlog = [json.loads((await replay.__anext__()).split(b"data: ")[1]) for _ in range(2)]
+        assert [(e["entity"], e["seq"]) for e in backlog] == [("assets", start + 1), ("services", start + 2)]
+        await replay.aclose()
+
+        stale = stream_events({"assets"}, since=event_hub.seq + 10)
+        await stale.__anext__()
+        assert (await stale.__anext__()).startswith(b"event: reset")
+        await stale.aclose()
+
+    asyncio.run(scenario())
+    assert event_hub.subscriber_count == 0
+
+
+def test_sync_returns_deltas_and_tombstones():
+    login_as_admin(client)
+    client.post("/assets", data={"hostname": "sync-keep", "ip": "10.55.0.1"}, follow_redirects=False)
+    client.post("/assets", data={"hostname": "sync-drop", "ip": "10.55.0.2"}, follow_redirects=False)
+    ids = {a["hostname"]: a["id"] for a in client.get("/api/assets", params={"limit": 2}).json()}
+
+    token, has_more = None, True
+    while has_more:
+        page = client.get("/api/sync", params={"since": token, "limit": 50} if token else {"limit": 50}).json()
+        token, has_more = page["next"], page["has_more"]
+    idle = client.get("/api/sync", params={"since": token}).json()
+    assert idle["items"] == [] and idle["next"] == token
+
+    client.put(f"/api/assets/{ids['sync-keep']}", json={"owner": "sync"})
+    client.delete(f"/api/assets/{ids['sync-drop']}")
+    client.post("/assets", data={"hostname": "sync-new", "ip": "10.55.0.3"}, follow_redirects=False)
+    client.patch("/api/assets", json={"ids": [ids["sync-keep"]], "values": {"status": "maintenance"}})
+
+    first = client.get("/api/sync", params={"since": token, "entity": "assets", "limit": 2}).json()
+    assert first["has_more"]
+    rest = client.get("/api/sync", params={"since": first["next"], "entity": "assets"}).json()
+    items = first["items"] + rest["items"]
+    assert [(i["op"], i["row"]["hostname"] if i["op"] == "upsert" else i["id"]) for i in items] == [
+        ("delete", ids["sync-drop"]),
+        ("upsert", "sync-new"),
+        ("upsert", "sync-keep"),
+    ]
+    assert items[-1]["row"]["status"] == "maintenance" and items[-1]["row"]["owner"] == "sync"
+    versions = [i["row_version"] for i in items]
+    assert versions == sorted(versions)
+    assert client.get("/api/sync", params={"since": "bogus"}).status_code == 400
+
+
+def test_inventory_endpoints_group_hosts_and_support_etag():
+    login_as_admin(client)
+    client.post("/assets", data={"hostname": "inv-web", "ip": "10.44.0.1", "environment": "inv-prod"}, follow_redirects=False)
+    asset_id = client.get("/api/assets", params={"environment": "inv-prod"}).json()[0]["id"]
+    client.post("/services", data={"name": "inv-api", "asset_id": asset_id, "deploy_method": "k8s"}, follow_redirects=False)
+
+    ansible = client.get("/api/inventory/ansible", params={"environment": "inv-prod"})
+    data = ansible.json()
+    assert data["env_inv_prod"]["hosts"] == ["inv-web"]
+    assert data["service_inv_api"]["hosts"] == ["inv-web"]
+    assert data["deploy_k8s"]["hosts"] == ["inv-web"]
+    assert data["_meta"]["hostvars"]["inv-web"]["ansible_host"] == "10.44.0.1"
+
+    prom = client.get("/api/inventory/prometheus", params={"environment": "inv-prod", "port": 9273})
+    assert prom.json() == [
+        {
+            "targets": ["10.44.0.1:9273"],
+            "labels": {
+                "environment": "inv-prod",
+                "hostname": "inv-web",
+                "os": "linux",
+                "owner": "",
+                "status": "active",
+                "services": "inv-api",
+                "deploy_methods": "k8s",
+            },
+        }
+    ]
+    etag = prom.headers["etag"]
+    assert client.get("/api/inventory/prometheus", params={"environment": "inv-prod", "port": 9273}, headers={"If-None-Match": etag}).status_code == 304
+
+    client.put(f"/api/assets/{asset_id}", json={"owner": "inv"})
+    changed = client.get("/api/inventory/prometheus", params={"environment": "inv-prod", "port": 9273}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()[0]["labels"]["owner"] == "inv"
+
+
+def test_metrics_record_routes_queries_and_slow_statements(caplog, monkeypatch):
+    import app.db as db_module
+
+    login_as_admin(client)
+    client.get("/")
+    client.get("/api/assets", params={"limit": 5})
+    client.put("/api/assets/999999", json={"owner": "nobody"})
+    monkeypatch.setattr(db_module, "SLOW_QUERY_MS", 0.000001)
+    with caplog.at_level("WARNING", logger="app.slow_query"):
+        client.get("/api/services", params={"limit": 1})
+    assert any("slow query" in r.message and "FROM services" in r.message for r in caplog.records)
+
+    text = client.get("/metrics").text
+    assert 'cmdb_http_requests_total{method="PUT",route="/api/assets/{asset_id}",status="404"} 1' in text
+    assert 'cmdb_http_request_duration_seconds_count{method="GET",route="/api/assets"}' in text
+    assert 'cmdb_db_queries_per_request_bucket{method="GET",route="/api/assets",le="+Inf"}' in text
+    assert 'cmdb_request_phase_seconds_total{method="GET",route="/",phase="template"}' in text
+    assert 'cmdb_request_phase_seconds_total{method="GET",route="/api/assets",phase="serialize"}' in text
+    assert 'route="/api/assets/999999"' not in text
+    assert "cmdb_db_slow_queries_total" in text
+
+
+def test_hot_list_queries_use_indexes():
+    from sqlalchemy import select
+
+    from app.models import Asset, ChangeRecord, Service
+    from app.pagination import apply_filters, keyset
+
+    # 请求内的查询都带 tenant_id 条件（由会话监听器追加），这里直接写在筛选条件里
+    queries = {
+        "ix_assets_tenant_environment_status": apply_filters(select(Asset.id), Asset, tenant_id=1, environment="prod", status="active"),
+        "ix_assets_tenant_owner": apply_filters(select(Asset.id), Asset, tenant_id=1, owner="ops"),
+        "ix_assets_tenant ": apply_filters(select(Asset.id), Asset, tenant_id=1),
+        "ix_services_tenant_status": apply_filters(select(Service.id), Service, tenant_id=1, status="running"),
+        "ix_changes_tenant_status": apply_filters(select(ChangeRecord.id), ChangeRecord, tenant_id=1, status="pending"),
+        "ix_changes_tenant_risk_level": apply_filters(select(ChangeRecord.id), ChangeRecord, tenant_id=1, risk_level="high"),
+    }
+    with engine.connect() as conn:
+        for index, stmt in queries.items():
+            compiled = keyset(stmt, stmt.selected_columns.id, 100, None, "desc").compile(engine)
+            params = tuple(compiled.params[name] for name in compiled.positiontup)
+            plan = " ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params))
+            assert index in plan, plan
+            assert "TEMP B-TREE" not in plan, plan
+
+
+def test_change_windows_detect_conflicts_and_query_ranges():
+    from app.windows import conflicts_query
+
+    login_as_admin(client)
+    for i in range(2):
+        client.post("/assets", data={"hostname": f"win-{i}", "ip": f"10.11.0.{i}", "owner": "win"}, follow_redirects=False)
+    hosts = {a["hostname"]: a["id"] for a in client.get("/api/assets", params={"owner": "win"}).json()}
+    for name, host in (("win-a", "win-0"), ("win-b", "win-0"), ("win-c", "win-1")):
+        client.post("/services", data={"name": name, "asset_id": hosts[host]}, follow_redirects=False)
+    services = {s["name"]: s["id"] for s in client.get("/api/services", params={"asset_id": hosts["win-0"]}).json()}
+    services.update({s["name"]: s["id"] for s in client.get("/api/services", params={"asset_id": hosts["win-1"]}).json()})
+
+    def create(title, service, start, end, status="pending"):
+        data = {"title": title, "service_id": services[service], "window_start": start, "window_end": end, "status": status}
+        return client.post("/changes", data=data, follow_redirects=False)
+
+    assert create("win upgrade", "win-a", "2031-05-01T10:00", "2031-05-01T12:00").status_code == 303
+    # 同一主机上的另一个服务：窗口重叠即冲突，首尾相接不算重叠
+    resp = create("win patch", "win-b", "2031-05-01T11:00", "2031-05-01T13:00")
+    assert resp.status_code == 409
+    assert [c["title"] for c in resp.json()["detail"]["conflicts"]] == ["win upgrade"]
+    assert create("win patch", "win-b", "2031-05-01T12:00", "2031-05-01T13:00").status_code == 303
+    assert create("win other host", "win-c", "2031-05-01T10:30", "2031-05-01T11:30").status_code == 303
+    assert create("win closed", "win-a", "2031-05-01T10:30", "2031-05-01T11:30", status="done").status_code == 303
+    assert create("win too long", "win-a", "2031-05-10T00:00", "2031-05-20T00:00").status_code == 400
+    assert create("win reversed", "win-a", "2031-05-11T12:00", "2031-05-11T10:00").status_code == 400
+
+    resp = client.get("/api/changes/scheduled", params={"start": "2031-05-01T11:30:00Z", "end": "2031-05-01T12:30:00Z", "limit": 1})
+    assert [c["title"] for c in resp.json()] == ["win upgrade"]
+    resp = client.get("/api/changes/scheduled", params={"start": "2031-05-01T11:30:00Z", "end": "2031-05-01T12:30:00Z", "cursor": resp.headers["x-next-cursor"]})
+    assert [c["title"] for c in resp.json()] == ["win patch"]
+
+    patch_id = client.get("/api/changes", params={"service_id": services["win-b"]}).json()[0]["id"]
+    assert client.put(f"/api/changes/{patch_id}", json={"window_start": "2031-05-01T11:59:00"}).status_code == 409
+    assert client.put(f"/api/changes/{patch_id}", json={"service_id": services["win-c"], "window_start": "2031-05-01T11:00:00", "window_end": "2031-05-01T11:45:00"}).status_code == 409
+    resp = client.put(f"/api/changes/{patch_id}", json={"window_start": "2031-05-01T12:30:00", "window_end": "2031-05-01T14:00:00"})
+    assert resp.status_code == 200 and resp.json()["window_start"] == "2031-05-01T12:30:00"
+    assert client.put(f"/api/changes/{patch_id}", json={"window_end": None}).status_code == 400
+
+    # 批量修改状态或服务同样做冲突检测，冲突时整批回滚
+    closed_id = client.get("/api/changes", params={"service_id": services["win-a"], "status": "done"}).json()[0]["id"]
+    other_id = client.get("/api/changes", params={"service_id": services["win-c"]}).json()[0]["id"]
+    resp = client.patch("/api/changes", json={"ids": [closed_id], "values": {"status": "pending"}})
+    assert resp.status_code == 409
+    assert [c["title"] for c in resp.json()["detail"]["conflicts"]] == ["win upgrade"]
+    assert client.get("/api/changes", params={"service_id": services["win-a"], "status": "done"}).json()[0]["id"] == closed_id
+    assert client.patch("/api/changes", json={"ids": [other_id, patch_id], "values": {"service_id": services["win-a"]}}).status_code == 409
+    assert [c["id"] for c in client.get("/api/changes", params={"service_id": services["win-c"]}).json()] == [other_id]
+    assert client.patch("/api/changes", json={"ids": [closed_id], "values": {"change_window": "周六 02:00"}}).status_code == 422
+
+    stmt = conflicts_query(services["win-a"], datetime(2031, 5, 1, 10), datetime(2031, 5, 1, 12))
+    compiled = stmt.compile(engine, compile_kwargs={"render_postcompile": True})
+    with engine.connect() as conn:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        plan = " ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params))
+    assert "ix_changes_service_window" in plan, plan
+
+
+def test_background_jobs_run_and_report_progress(tmp_path, monkeypatch):
+    import app.jobs
+    import app.main
+
+    monkeypatch.setattr(app.jobs, "JOB_EXPORT_DIR", tmp_path)
+    monkeypatch.setattr(app.main, "JOB_EXPORT_DIR", tmp_path)
+    login_as_admin(client)
+
+    def wait(job_id):
+        for _ in range(200):
+            job = client.get(f"/api/jobs/{job_id}").json()
+            if job["status"] in ("succeeded", "failed"):
+                return job
+            time.sleep(0.05)
+        raise AssertionError(f"job {job_id} did not finish")
+
+    rows = [{"hostname": f"job-{i}", "ip": f"10.33.0.{i}", "owner": "jobs"} for i in range(3)] + [{"hostname": "job-bad"}]
+    resp = client.post("/api/jobs", json={"kind": "import_assets", "params": {"rows": rows}})
+    assert resp.status_code == 202
+    assert resp.headers["location"] == f"/api/jobs/{resp.json()['id']}"
+    job = wait(resp.json()["id"])
+    assert job["status"] == "succeeded" and job["progress"] == 100.0
+    assert job["result"]["summary"]["created"] == 3 and len(job["result"]["errors"]) == 1
+
+    resp = client.post("/api/jobs", json={"kind": "batch_update", "params": {"entity": "assets", "filter": {"owner": "jobs"}, "values": {"status": "retired"}}})
+    assert wait(resp.json()["id"])["result"] == {"updated": 3}
+    assert {a["status"] for a in client.get("/api/assets", params={"owner": "jobs"}).json()} == {"retired"}
+
+    resp = client.post("/api/jobs", json={"kind": "export", "params": {"entity": "assets", "format": "csv"}})
+    job = wait(resp.json()["id"])
+    download = client.get(f"/api/jobs/{job['id']}/download")
+    assert download.status_code == 200
+    assert "job-1" in download.text and len(download.content) == job["result"]["bytes"]
+    assert job["id"] in [j["id"] for j in client.get("/api/jobs", params={"kind": "export"}).json()]
+
+    assert client.post("/api/jobs", json={"kind": "reboot", "params": {}}).status_code == 422
+    assert client.post("/api/jobs", json={"kind": "batch_delete", "params": {"entity": "hosts", "ids": [1]}}).status_code == 422
+    assert client.post("/api/jobs", json={"kind": "batch_delete", "params": {"entity": "assets"}}).status_code == 400
+    assert client.get("/api/jobs/999999").status_code == 404
+
+
+def test_reads_use_replica_until_it_catches_up_with_own_writes(tmp_path, monkeypatch):
+    import app.replicas
+
+    router = app.replicas.ReplicaRouter([f"sqlite:///{tmp_path / 'replica.db'}"])
+    upgrade(router.engines[0])
+    monkeypatch.setattr(app.replicas, "replica_router", router)
+    login_as_admin(client)
+    client.cookies.delete("cmdb_rv")
+
+    resp = client.post("/assets", data={"hostname": "replica-1", "ip": "10.22.0.1", "owner": "replica"}, follow_redirects=False)
+    assert resp.status_code == 303
+    assert int(resp.cookies["cmdb_rv"]) > 0
+    # 带着写入版本号：副本落后，回退主库读到自己的写入
+    assert [a["hostname"] for a in client.get("/api/assets", params={"owner": "replica"}).json()] == ["replica-1"]
+    # 不带版本号的读请求走副本（测试中的副本没有同步）
+    client.cookies.delete("cmdb_rv")
+    assert client.get("/api/assets", params={"owner": "replica"}).json() == []
+    assert client.get("/api/export/assets").text == ""
+    assert client.get("/api/overview").json()["asset_count"] > 0
+
+
+def test_export_streams_ndjson_csv_and_gzip():
+    import csv
+    import gzip
+    import io
+
+    login_as_admin(client)
+    client.post("/assets", data={"hostname": "export-01", "ip": "10.8.0.1", "owner": "exporter"}, follow_redirects=False)
+    total = client.get("/api/overview").json()["asset_count"]
+
+    ndjson = client.get("/api/export/assets")
+    assert ndjson.status_code == 200
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert len(rows) == total
+    assert [r["id"] for r in rows] == sorted(r["id"] for r in rows)
+    assert any(r["hostname"] == "export-01" and r["owner"] == "exporter" for r in rows)
+
+    as_csv = client.get("/api/export/assets", params={"format": "csv"})
+    records = list(csv.DictReader(io.StringIO(as_csv.text)))
+    assert len(records) == total
+    assert records[0].keys() >= {"id", "hostname", "ip", "created_at"}
+
+    packed = client.get("/api/export/assets", params={"gzip": "true"})
+    assert packed.headers["content-type"] == "application/gzip"
+    assert gzip.decompress(packed.content).decode() == ndjson.text
+
+    assert client.get("/api/export/unknown").status_code == 404
+    assert client.get("/api/export/services", params={"format": "xml"}).status_code == 422
+
+
+def test_bulk_import_assets_json_and_ndjson():
+    login_as_admin(client)
+    client.post("/assets", data={"hostname": "bulk-existing", "ip": "10.7.0.1", "environment": "dev", "owner": "keep"}, follow_redirects=False)
+
+    client.post("/assets", data={"hostname": "bulk-owner", "ip": "10.7.9.8"}, follow_redirects=False)
+
+    rows = [{"ip": f"10.7.1.{i}", "hostname": f"bulk-{i}"} for i in range(3)]
+    rows += [
+        {"ip": "10.7.0.1", "hostname": "bulk-existing"},
+        {"ip": "10.7.9.8", "hostname": "bulk-thief"},
+        {"ip": "10.7.1.0", "hostname": "bulk-0"},
+        {"hostname": "bulk-no-ip"},
+    ]
+    resp = client.post("/api/assets/bulk", json=rows)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["summary"] == {"created": 3, "updated": 1, "skipped": 0, "error": 3}
+    statuses = [r["status"] for r in body["results"]]
+    assert statuses == ["created", "created", "created", "updated", "error", "error", "error"]
+    assert body["results"][4]["error"] == "ip already used by bulk-owner"
+    assert body["results"][5]["error"] == "duplicate hostname or ip in payload"
+
+    existing = client.get("/api/assets", params={"owner": "keep"}).json()
+    assert existing[0]["hostname"] == "bulk-existing" and existing[0]["environment"] == "dev"
+
+    ndjson = "\n".join(json.dumps({"ip": f"10.7.2.{i}", "hostname": f"bulk-nd-{i}", "owner": "nd"}) for i in range(4))
+    ndjson += "\n" + json.dumps({"ip": "10.7.1.1", "hostname": "bulk-1", "owner": "nd"})
+    resp = client.post(
+        "/api/assets/bulk",
+        params={"on_conflict": "skip", "report": "errors"},
+        content=ndjson,
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert resp.json() == {"summary": {"created": 4, "updated": 0, "skipped": 1, "error": 0}, "results": []}
+    assert len(client.get("/api/assets", params={"owner": "nd"}).json()) == 4
+
+    # 第一批提交之后出现坏行：记为该行的错误，后续行照常导入
+    from app.bulk import IMPORT_BATCH_SIZE
+
+    lines = [json.dumps({"ip": f"10.69.{i // 256}.{i % 256}", "hostname": f"bulk-bad-{i}", "owner": "bad-line"}) for i in range(IMPORT_BATCH_SIZE + 2)]
+    lines.insert(IMPORT_BATCH_SIZE + 1, '{"hostname": ')
+    resp = client.post("/api/assets/bulk", params={"report": "errors"}, content="\n".join(lines), headers={"content-type": "application/x-ndjson"})
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "summary": {"created": IMPORT_BATCH_SIZE + 2, "updated": 0, "skipped": 0, "error": 1},
+        "results": [{"index": IMPORT_BATCH_SIZE + 1, "status": "error", "hostname": None, "line": IMPORT_BATCH_SIZE + 2, "error": "invalid JSON"}],
+    }
+
+    assert client.post("/api/assets/bulk", json={"hostname": "x"}).status_code == 400
+
+
+def test_dashboard_renders_bounded_pages():
+    login_as_admin(client)
+    client.post("/api/assets/bulk", json=[{"hostname": f"dash-{i}", "ip": f"10.6.0.{i}", "owner": "dash"} for i in range(60)])
+
+    first = client.get("/")
+    assert first.status_code == 200
+    assert first.text.count('action="/assets/') <= 50
+    assert "dash-59" in first.text
+    assert "下一页" in first.text
+
+    next_href = [part for part in first.text.split('href="') if "asset_cursor=" in part][0].split('"')[0]
+    second = client.get(next_href.replace("&amp;", "&"))
+    assert second.status_code == 200
+    assert "dash-59" not in second.text
+    assert "回到第一页" in second.text
+
+    searched = client.get("/", params={"q": "dash-1"})
+    assert "dash-12" in searched.text and "dash-59" not in searched.text
+
+
+def test_overview_cache_tracks_writes_and_supports_etag():
+    login_as_admin(client)
+    before = client.get("/api/overview")
+    assert before.status_code == 200
+    etag = before.headers["etag"]
+    assert client.get("/api/overview", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/assets", data={"hostname": "ov-01", "ip": "10.5.0.1", "environment": "edge", "status": "active"}, follow_redirects=False)
+    after = client.get("/api/overview", headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    data = after.json()
+    assert data["asset_count"] == before.json()["asset_count"] + 1
+    assert data["assets_by_environment"]["edge"] == 1
+
+    asset_id = client.get("/api/assets", params={"environment": "edge"}).json()[0]["id"]
+    client.put(f"/api/assets/{asset_id}", json={"status": "inactive"})
+    moved = client.get("/api/overview").json()
+    assert moved["assets_by_status"]["inactive"] == before.json()["assets_by_status"].get("inactive", 0) + 1
+
+    client.post("/api/assets/bulk", json=[{"hostname": "ov-02", "ip": "10.5.0.2"}])
+    client.delete(f"/api/assets/{asset_id}")
+    final = client.get("/api/overview").json()
+    assert final["asset_count"] == data["asset_count"]
+    assert "edge" not in final["assets_by_environment"]
+
+    asset_id = client.get("/api/assets", params={"owner": "platform"}).json()[-1]["id"]
+    client.post(f"/assets/{asset_id}/delete", follow_redirects=False)
+    incremental = client.get("/api/overview").json()
+    from app.stats import overview_cache
+
+    overview_cache.invalidate()
+    assert client.get("/api/overview").json() == incremental
+
+
+def test_search_ranks_across_entities_and_stays_in_sync():
+    login_as_admin(client)
+    client.post("/assets", data={"hostname": "srch-gateway-01", "ip": "10.4.0.1", "note": "edge gateway"}, follow_redirects=False)
+    asset_id = client.get("/api/assets", params={"limit": 1}).json()[0]["id"]
+    client.post("/services", data={"name": "srch-payments", "asset_id": asset_id, "repo_url": "https://git.example/gateway"}, follow_redirects=False)
+    service_id = client.get("/api/services", params={"limit": 1}).json()[0]["id"]
+    client.post("/changes", data={"title": "upgrade srch gateway", "service_id": service_id, "rollback_plan": "redeploy"}, follow_redirects=False)
+
+    hits = client.get("/api/search", params={"q": "gateway"}).json()
+    assert {h["kind"] for h in hits} == {"asset", "service", "change"}
+    assert [h["score"] for h in hits] == sorted((h["score"] for h in hits), reverse=True)
+    assert next(h for h in hits if h["kind"] == "asset")["record"]["hostname"] == "srch-gateway-01"
+
+    only_services = client.get("/api/search", params={"q": "gateway", "kind": "service"}).json()
+    assert [h["record"]["name"] for h in only_services] == ["srch-payments"]
+
+    client.put(f"/api/assets/{asset_id}", json={"hostname": "srch-proxy-01"})
+    assert client.get("/api/search", params={"q": "srch-gateway", "kind": "asset"}).json() == []
+    assert client.get("/api/search", params={"q": "proxy", "kind": "asset"}).json()[0]["id"] == asset_id
+
+    page = client.get("/api/search", params={"q": "srch", "limit": 1})
+    rest = client.get("/api/search", params={"q": "srch", "limit": 5, "cursor": page.headers["x-next-cursor"]}).json()
+    assert len(page.json()) + len(rest) == 3
+
+    assert client.get("/api/search", params={"q": "10"}).status_code == 200
+    assert client.get("/api/search", params={"q": "x", "kind": "host"}).status_code == 400
+
+    client.post(f"/assets/{asset_id}/delete", follow_redirects=False)
+    assert client.get("/api/search", params={"q": "srch"}).json() == []
+    assert "dash-12" in client.get("/", params={"q": "dash-12"}).text
+
+
+def test_network_queries_use_numeric_ip_ranges():
+    login_as_admin(client)
+    rows = [{"hostname": f"net-{i}", "ip": f"172.29.206.{i}", "owner": "net"} for i in (5, 6, 130, 255)]
+    rows += [{"hostname": "net-next", "ip": "172.29.207.1"}, {"hostname": "net-v6", "ip": "2001:db8::10"}]
+    client.post("/api/assets/bulk", json=rows)
+
+    in_24 = client.get("/api/assets/by-network", params={"cidr": "172.29.206.0/24"}).json()
+    assert [a["ip"] for a in in_24] == ["172.29.206.5", "172.29.206.6", "172.29.206.130", "172.29.206.255"]
+
+    upper_half = client.get("/api/assets/by-network", params={"cidr": "172.29.206.128/25"}).json()
+    assert [a["hostname"] for a in upper_half] == ["net-130", "net-255"]
+
+    several = client.get("/api/assets/by-network", params={"cidr": ["172.29.207.0/24", "2001:db8::/64"], "limit": 1})
+    assert [a["hostname"] for a in several.json()] == ["net-next"]
+    rest = client.get("/api/assets/by-network", params={"cidr": ["172.29.207.0/24", "2001:db8::/64"], "cursor": several.headers["x-next-cursor"]})
+    assert [a["hostname"] for a in rest.json()] == ["net-v6"]
+
+    ranged = client.get("/api/assets/by-network", params={"start": "172.29.206.6", "end": "172.29.207.0"}).json()
+    assert [a["hostname"] for a in ranged] == ["net-6", "net-130", "net-255"]
+
+    asset_id = in_24[0]["id"]
+    client.put(f"/api/assets/{asset_id}", json={"ip": "172.29.208.5"})
+    assert len(client.get("/api/assets/by-network", params={"cidr": "172.29.206.0/24"}).json()) == 3
+
+    usage = client.get("/api/subnets/usage", params={"cidr": "172.29.206.0/23", "split": 25}).json()[0]
+    assert usage["size"] == 512 and usage["used"] == 4
+    assert [(s["cidr"], s["used"]) for s in usage["subnets"]] == [
+        ("172.29.206.0/25", 1),
+        ("172.29.206.128/25", 2),
+        ("172.29.207.0/25", 1),
+    ]
+
+    assert client.get("/api/assets/by-network", params={"cidr": "not-a-net"}).status_code == 400
+    assert client.get("/api/assets/by-network").status_code == 400
+    assert client.get("/api/subnets/usage", params={"cidr": "10.0.0.0/24", "split": 8}).status_code == 400
+
+
+def test_topology_graph_filters_and_invalidation():
+    login_as_admin(client)
+    client.post("/api/assets/bulk", json=[{"hostname": "topo-host", "ip": "10.3.0.1", "environment": "topo"}])
+    asset_id = client.get("/api/assets", params={"environment": "topo"}).json()[0]["id"]
+    client.post("/services", data={"name": "topo-api", "asset_id": asset_id, "owner": "topo-team"}, follow_redirects=False)
+    client.post("/services", data={"name": "topo-worker", "asset_id": asset_id}, follow_redirects=False)
+    api_id = client.get("/api/services", params={"owner": "topo-team"}).json()[0]["id"]
+    client.post("/changes", data={"title": "topo rollout", "service_id": api_id}, follow_redirects=False)
+
+    graph = client.get("/api/topology", params={"environment": "topo"}).json()
+    assert {n["id"] for n in graph["nodes"]} >= {f"asset:{asset_id}", f"service:{api_id}"}
+    assert len([n for n in graph["nodes"] if n["type"] == "service"]) == 2
+    assert {"source": f"asset:{asset_id}", "target": f"service:{api_id}", "type": "hosts"} in graph["edges"]
+
+    owned = client.get("/api/topology", params={"owner": "topo-team"}).json()
+    assert [n["type"] for n in owned["nodes"]] == ["asset", "change", "service"]
+
+    rooted = client.get("/api/topology", params={"root": f"service:{api_id}", "depth": 1, "include_changes": "false"}).json()
+    assert [n["id"] for n in rooted["nodes"]] == [f"asset:{asset_id}", f"service:{api_id}"]
+
+    client.put(f"/api/services/{api_id}", json={"owner": "topo-moved"})
+    assert client.get("/api/topology", params={"owner": "topo-team"}).json() == {"nodes": [], "edges": []}
+
+    assert client.get("/api/topology", params={"root": "asset:999999"}).status_code == 404
+    assert client.get("/api/topology", params={"root": "rack:1"}).status_code == 422
+
+
+def test_sqlite_pragmas_and_pool_status():
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+    login_as_admin(client)
+    status = client.get("/api/pool").json()
+    assert status["pool"] == "QueuePool"
+    assert status["size"] == 5 and status["max_overflow"] == 10
+    assert status["checkouts"] >= 1
+    assert 0 <= status["saturation"] <= 1
+
+
+def test_async_api_handlers():
+    from fastapi import FastAPI
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from app.api_async import router
+    from app.auth import SessionMiddleware
+    from app.db import get_async_db, make_async_engine
+
+    async_engine = make_async_engine(os.environ["DATABASE_URL"])
+    sessions = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with sessions() as db:
+            yield db
+
+    async_app = FastAPI()
+    async_app.add_middleware(SessionMiddleware)
+    async_app.include_router(router)
+    async_app.dependency_overrides[get_async_db] = override_get_async_db
+
+    login_as_admin(client)
+    client.post("/assets", data={"hostname": "async-01", "ip": "10.2.0.1", "owner": "async"}, follow_redirects=False)
+    asset_id = client.get("/api/assets", params={"owner": "async"}).json()[0]["id"]
+    client.post("/services", data={"name": "async-svc", "asset_id": asset_id}, follow_redirects=False)
+
+    with TestClient(async_app, cookies=client.cookies) as async_client:
+        assert async_client.get("/api/assets", params={"owner": "async"}).json()[0]["hostname"] == "async-01"
+        assert async_client.get("/api/services", params={"asset_id": asset_id}).json()[0]["name"] == "async-svc"
+
+        updated = async_client.put(f"/api/assets/{asset_id}", json={"status": "inactive"})
+        assert updated.json()["status"] == "inactive"
+        assert async_client.put("/api/changes/999999", json={"status": "done"}).status_code == 404
+
+        overview = async_client.get("/api/overview")
+        assert overview.json() == client.get("/api/overview").json()
+        assert async_client.get("/api/overview", headers={"If-None-Match": overview.headers["etag"]}).status_code == 304
+
+        assert async_client.delete(f"/api/assets/{asset_id}").json() == {"deleted": True}
+        assert async_client.get("/api/services", params={"asset_id": asset_id}).json() == []
+        async_client.portal.call(async_engine.dispose)
+
+
+def test_tenants_are_isolated_and_role_changes_apply_immediately():
+    from app.auth import decode_token
+
+    login_as_admin(client)
+    tenant_id = client.post("/api/tenants", json={"name": "tenant-b"}).json()["id"]
+    created = client.post("/api/users", json={"username": "b-admin", "password": "b-secret-1", "role": "admin", "tenant_id": tenant_id})
+    assert created.status_code == 201
+    viewer_id = client.post("/api/users", json={"username": "t1-viewer", "password": "v-secret-1"}).json()["id"]
+
+    def token_client(username: str, password: str) -> TestClient:
+        token = client.post("/api/token", json={"username": username, "password": password}).json()["access_token"]
+        return TestClient(app, headers={"Authorization": f"Bearer {token}"})
+
+    other = token_client("b-admin", "b-secret-1")
+    viewer = token_client("t1-viewer", "v-secret-1")
+    assert other.get("/api/me").json()["tenant_id"] == tenant_id
+
+    client.post("/assets", data={"hostname": "t1-host", "ip": "10.67.0.1", "owner": "tenancy"}, follow_redirects=False)
+    other.post("/assets", data={"hostname": "tb-host", "ip": "10.67.0.2", "owner": "tenancy"}, follow_redirects=False)
+    t1_host = client.get("/api/assets", params={"owner": "tenancy"}).json()
+    assert [a["hostname"] for a in t1_host] == ["t1-host"]
+    assert [a["hostname"] for a in other.get("/api/assets", params={"owner": "tenancy"}).json()] == ["tb-host"]
+    assert other.get("/api/overview").json()["asset_count"] == 1
+    assert other.get("/api/search", params={"q": "t1-host"}).json() == []
+    assert other.put(f"/api/assets/{t1_host[0]['id']}", json={"owner": "stolen"}).status_code == 404
+    assert other.patch("/api/assets", json={"filter": {"owner": "tenancy"}, "values": {"status": "retired"}}).json() == {"updated": 1}
+    assert client.get("/api/assets", params={"owner": "tenancy"}).json()[0]["status"] == "active"
+    # hostname / ip 全局唯一
+    assert other.post("/assets", data={"hostname": "t1-host", "ip": "10.67.0.3"}, follow_redirects=False).status_code == 400
+    bulk = other.post("/api/assets/bulk", json=[{"hostname": "t1-host", "ip": "10.67.0.3"}]).json()
+    assert bulk["results"][0]["error"] == "hostname is used by another tenant"
+
+    # 查看者只能读；改角色后权限缓存随提交失效，下一个请求即生效
+    assert viewer.get("/api/assets", params={"owner": "tenancy"}).status_code == 200
+    assert viewer.put(f"/api/assets/{t1_host[0]['id']}", json={"note": "x"}).status_code == 403
+    assert other.put(f"/api/users/{viewer_id}", json={"role": "editor"}).status_code == 404
+    assert client.put(f"/api/users/{viewer_id}", json={"role": "editor"}).status_code == 200
+    assert viewer.put(f"/api/assets/{t1_host[0]['id']}", json={"note": "x"}).status_code == 200
+    assert other.post("/api/users", json={"username": "b-root", "password": "b-secret-2", "role": "superadmin"}).status_code == 403
+
+    client.put(f"/api/users/{viewer_id}", json={"active": False})
+    assert viewer.get("/api/assets").status_code == 401
+    assert TestClient(app, headers={"Authorization": "Bearer forged.token"}).get("/api/assets").status_code == 401
+    assert TestClient(app, headers={"Authorization": b"Bearer \xe9\xe9.\xe9"}).get("/api/assets").status_code == 401
+    assert decode_token("\u4e2d.\u6587") is None
+
+
+def test_compression_etags_and_hashed_static_assets():
+    login_as_admin(client)
+    for i in range(30):
+        client.post("/assets", data={"hostname": f"web-{i}", "ip": f"10.68.0.{i + 1}", "owner": "web-cache"}, follow_redirects=False)
+
+    page = client.get("/")
+    assert page.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in page.headers["vary"]
+    assert "VEOPS" in page.text
+    # 页面引用的样式表带内容哈希，长期强缓存
+    css_url = next(part.split('"')[0] for part in page.text.split('href="') if part.startswith("/static/style."))
+    css = client.get(css_url)
+    assert css.status_code == 200
+    assert css.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert client.get("/static/style.css").headers["cache-control"] == "no-cache"
+    assert client.get("/static/style.000000000000.css").headers["cache-control"] == "no-cache"
+
+    listing = client.get("/api/assets", params={"owner": "web-cache", "limit": 30})
+    assert listing.headers["etag"].startswith('W/"')
+    assert client.get("/api/assets", params={"owner": "web-cache", "limit": 30}, headers={"If-None-Match": listing.headers["etag"]}).status_code == 304
+    identity = client.get("/api/assets", params={"owner": "web-cache", "limit": 30}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert int(identity.headers["content-length"]) > int(listing.headers["content-length"])
+    assert client.get("/api/assets", params={"owner": "web-cache", "limit": 30}, headers={"Accept-Encoding": "identity", "If-None-Match": listing.headers["etag"]}).status_code == 304
+
+    client.put(f"/api/assets/{identity.json()[0]['id']}", json={"note": "changed"})
+    assert client.get("/api/assets", params={"owner": "web-cache", "limit": 30}, headers={"If-None-Match": listing.headers["etag"]}).status_code == 200
+    # 小响应不压缩
+    assert "content-encoding" not in client.get("/healthz").headers